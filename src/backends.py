@@ -0,0 +1,193 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class CompletionBackend:
+
+    """
+    Interfaz de los clientes que envían las solicitudes de chat al modelo.
+    `complete` devuelve el cuerpo de la respuesta con las llaves "choices" y
+    "usage" y, ante un error, lanza la excepción equivalente de
+    `openai.error` para que los reintentos funcionen igual con cualquier
+    cliente.
+    """
+
+    def complete(self, messages: list, model: str, temperature: float) -> dict:
+        """
+        Envía una solicitud de chat.
+
+        Args:
+            messages (list): Mensajes de la conversación.
+            model (str): LLM a utilizar.
+            temperature (float): Temperatura de la solicitud.
+
+        Returns:
+            dict: Respuesta de la API.
+        """
+        raise NotImplementedError
+
+    async def acomplete(self, messages: list, model: str, temperature: float) -> dict:
+        """
+        Versión asíncrona de `complete`.
+
+        Args:
+            messages (list): Mensajes de la conversación.
+            model (str): LLM a utilizar.
+            temperature (float): Temperatura de la solicitud.
+
+        Returns:
+            dict: Respuesta de la API.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """
+        Libera las conexiones del cliente.
+
+        Returns:
+            None.
+        """
+
+
+class OpenAIBackend(CompletionBackend):
+
+    """
+    Cliente basado en la librería `openai`. La llave y la URL base se pasan en
+    cada solicitud, sin modificar la configuración global de la librería.
+    """
+
+    def __init__(self, api_key: str, api_base: str = None):
+        """
+        Args:
+            api_key (str): Llave de la API de OpenAI.
+            api_base (str): URL base de la API. None para la de OpenAI.
+        """
+        self.api_key = api_key
+        self.api_base = api_base
+
+    def complete(self, messages: list, model: str, temperature: float) -> dict:
+        return openai.ChatCompletion.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            api_key=self.api_key,
+            api_base=self.api_base,
+        )
+
+    async def acomplete(self, messages: list, model: str, temperature: float) -> dict:
+        return await openai.ChatCompletion.acreate(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            api_key=self.api_key,
+            api_base=self.api_base,
+        )
+
+
+class HTTPBackend(CompletionBackend):
+
+    """
+    Cliente HTTP propio con un pool de conexiones persistentes (keep-alive)
+    por instancia. Las solicitudes asíncronas se ejecutan en un pool de hilos
+    del mismo tamaño que el de conexiones, de modo que `max_concurrency` de
+    `Codificacion` no debe superar `pool_size`.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        api_base: str = "https://api.openai.com/v1",
+        pool_size: int = 10,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 120.0,
+        organization: str = None,
+    ):
+        """
+        Args:
+            api_key (str): Llave de la API.
+            api_base (str): URL base de una API compatible con la de OpenAI.
+            pool_size (int): Conexiones que se mantienen abiertas con el servidor.
+            connect_timeout (float): Segundos máximos para abrir una conexión.
+            read_timeout (float): Segundos máximos de espera de la respuesta.
+            organization (str): Organización de OpenAI, si aplica.
+        """
+        self.url = api_base.rstrip("/") + "/chat/completions"
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+
+        self.session = requests.Session()
+        # Los reintentos los maneja Codificacion, no el adaptador
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            }
+        )
+        if organization:
+            self.session.headers["OpenAI-Organization"] = organization
+        self._executor = None
+
+    def complete(self, messages: list, model: str, temperature: float) -> dict:
+        try:
+            response = self.session.post(
+                self.url,
+                json={"model": model, "messages": messages, "temperature": temperature},
+                timeout=self.timeout,
+            )
+        except requests.exceptions.Timeout as e:
+            raise openai.error.Timeout(str(e)) from e
+        except requests.exceptions.RequestException as e:
+            raise openai.error.APIConnectionError(str(e)) from e
+
+        if response.status_code != 200:
+            raise api_error(response)
+        return response.json()
+
+    async def acomplete(self, messages: list, model: str, temperature: float) -> dict:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.pool_size)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self.complete, messages, model, temperature
+        )
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self.session.close()
+
+
+def api_error(response: requests.Response) -> openai.error.OpenAIError:
+    """
+    Convierte una respuesta HTTP con error en la excepción de `openai.error`
+    correspondiente a su código de estado.
+
+    Args:
+        response (requests.Response): Respuesta con código distinto de 200.
+
+    Returns:
+        openai.error.OpenAIError: Excepción a lanzar.
+    """
+    try:
+        message = response.json()["error"]["message"]
+    except (ValueError, KeyError, TypeError):
+        message = response.text
+    kwargs = dict(http_status=response.status_code, headers=dict(response.headers))
+
+    if response.status_code == 429:
+        return openai.error.RateLimitError(message, **kwargs)
+    if response.status_code == 503:
+        return openai.error.ServiceUnavailableError(message, **kwargs)
+    if response.status_code >= 500:
+        return openai.error.APIError(message, **kwargs)
+    if response.status_code in (401, 403):
+        return openai.error.AuthenticationError(message, **kwargs)
+    return openai.error.InvalidRequestError(message, None, **kwargs)
@@ -0,0 +1,414 @@
+"""
+Trabajos de la API de lotes (Batch API) de OpenAI para codificaciones
+grandes sin requisitos de latencia: las solicitudes de chat se escriben en
+archivos JSONL, se suben, el servidor las procesa en segundo plano (en un
+plazo de hasta 24 horas y a menor costo) y los resultados se descargan como
+otro archivo JSONL.
+
+`Codificacion.codificate_batch` usa este módulo; el estado de los trabajos
+enviados se guarda en disco, de modo que el proceso puede terminar y volver
+a consultarlos más tarde.
+"""
+
+import os
+import json
+import time
+
+import openai
+import requests
+
+from backends import api_error
+from concurrency import backoff_delay
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+# Límites de un archivo de entrada de la API de lotes
+MAX_REQUESTS_PER_FILE = 50000
+MAX_FILE_BYTES = 190 * 2**20
+# Estados en que un trabajo ya no cambia
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+# Fracción del precio normal que se cobra por los tokens de un trabajo
+BATCH_PRICE_FACTOR = 0.5
+
+
+def custom_id(task: str, ids_batch: list, round_i: int = 0) -> str:
+    """
+    Identificador de la solicitud de un lote dentro de un trabajo, derivado
+    de los ids de sus frases. En cada ronda un id está en un solo lote, así
+    que el primero basta para que sea único.
+
+    Args:
+        task (str): Nombre de la tarea.
+        ids_batch (list): Ids de las frases del lote.
+        round_i (int): Ronda de envío (0 para el primer envío, luego una por
+            cada reencolado).
+
+    Returns:
+        str: Identificador "{task}-{ronda}-{primer id}-{frases}".
+    """
+    return f"{task}-{round_i}-{ids_batch[0]}-{len(ids_batch)}"
+
+
+def request_line(custom_id: str, body: dict) -> str:
+    """
+    Línea del archivo de entrada con una solicitud de chat.
+
+    Args:
+        custom_id (str): Identificador de la solicitud.
+        body (dict): Cuerpo de la solicitud (model, messages, temperature).
+
+    Returns:
+        str: Línea JSON terminada en salto de línea.
+    """
+    return (
+        json.dumps(
+            {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": body,
+            },
+            ensure_ascii=False,
+        )
+        + "\n"
+    )
+
+
+def write_request_files(
+    prefix: str,
+    lines,
+    max_requests: int = MAX_REQUESTS_PER_FILE,
+    max_bytes: int = MAX_FILE_BYTES,
+) -> list:
+    """
+    Escribe las solicitudes en uno o más archivos JSONL que respetan los
+    límites de solicitudes y de tamaño de un archivo de entrada.
+
+    Args:
+        prefix (str): Ruta base; los archivos son "{prefix}_{n}.jsonl".
+        lines: Iterable de líneas de `request_line`.
+        max_requests (int): Solicitudes máximas por archivo.
+        max_bytes (int): Bytes máximos por archivo.
+
+    Returns:
+        list: Rutas de los archivos escritos.
+    """
+    paths, file = [], None
+    requests_in_file, bytes_in_file = 0, 0
+    try:
+        for line in lines:
+            data = line.encode("utf-8")
+            if file is None or (
+                requests_in_file >= max_requests
+                or bytes_in_file + len(data) > max_bytes
+            ):
+                if file is not None:
+                    file.close()
+                paths.append(f"{prefix}_{len(paths) + 1}.jsonl")
+                file = open(paths[-1], "wb")
+                requests_in_file, bytes_in_file = 0, 0
+            file.write(data)
+            requests_in_file += 1
+            bytes_in_file += len(data)
+    finally:
+        if file is not None:
+            file.close()
+    return paths
+
+
+def read_output(path: str):
+    """
+    Recorre un archivo de salida o de errores de un trabajo.
+
+    Args:
+        path (str): Archivo JSONL descargado.
+
+    Returns:
+        Generador de tuplas (custom_id, respuesta, error): la respuesta es el
+        cuerpo de la respuesta de chat, o None si la solicitud falló, en cuyo
+        caso el error describe la falla.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            body = response.get("body")
+            if record.get("error") or response.get("status_code") != 200:
+                error = record.get("error") or (body or {}).get("error") or {}
+                yield record["custom_id"], None, error.get("message", str(error))
+            else:
+                yield record["custom_id"], body, None
+
+
+class BatchClient:
+
+    """
+    Cliente HTTP de los endpoints de archivos y de lotes de una API compatible
+    con la de OpenAI. Los errores transitorios (429, 5xx, conexión) se
+    reintentan con espera exponencial; los demás lanzan la excepción de
+    `openai.error` que corresponde a su código.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        api_base: str = "https://api.openai.com/v1",
+        timeout: float = 300.0,
+        max_retries: int = 5,
+    ):
+        """
+        Args:
+            api_key (str): Llave de la API.
+            api_base (str): URL base de la API.
+            timeout (float): Segundos máximos de cada solicitud, incluidas las
+                subidas y descargas de archivos.
+            max_retries (int): Reintentos ante errores transitorios.
+        """
+        self.api_base = api_base.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """
+        Envía una solicitud a la API.
+
+        Args:
+            method (str): Método HTTP.
+            path (str): Ruta relativa a la URL base, por ejemplo "/batches".
+            **kwargs: Argumentos de `requests.Session.request`.
+
+        Returns:
+            requests.Response: Respuesta con código 200.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.request(
+                    method, self.api_base + path, timeout=self.timeout, **kwargs
+                )
+                if response.status_code == 200:
+                    return response
+                error = api_error(response)
+                transient = response.status_code == 429 or response.status_code >= 500
+            except requests.exceptions.RequestException as e:
+                error = openai.error.APIConnectionError(str(e))
+                transient = True
+            if not transient or attempt == self.max_retries:
+                raise error
+            delay = backoff_delay(attempt)
+            print(f"{type(error).__name__}: reintento en {delay:.1f} s")
+            time.sleep(delay)
+
+    def upload_file(self, path: str) -> str:
+        """
+        Sube un archivo de entrada de un trabajo.
+
+        Args:
+            path (str): Archivo JSONL de solicitudes.
+
+        Returns:
+            str: Id del archivo subido.
+        """
+        # Se lee completo para poder reenviarlo en los reintentos
+        with open(path, "rb") as file:
+            content = file.read()
+        response = self.request(
+            "POST",
+            "/files",
+            data={"purpose": "batch"},
+            files={"file": (os.path.basename(path), content)},
+        )
+        return response.json()["id"]
+
+    def create_batch(self, input_file_id: str, metadata: dict = None) -> dict:
+        """
+        Crea un trabajo a partir de un archivo subido.
+
+        Args:
+            input_file_id (str): Id del archivo de entrada.
+            metadata (dict): Metadatos del trabajo.
+
+        Returns:
+            dict: Trabajo creado, con las llaves "id" y "status".
+        """
+        return self.request(
+            "POST",
+            "/batches",
+            json={
+                "input_file_id": input_file_id,
+                "endpoint": BATCH_ENDPOINT,
+                "completion_window": COMPLETION_WINDOW,
+                "metadata": metadata or {},
+            },
+        ).json()
+
+    def retrieve_batch(self, batch_id: str) -> dict:
+        """
+        Consulta el estado de un trabajo.
+
+        Args:
+            batch_id (str): Id del trabajo.
+
+        Returns:
+            dict: Trabajo, con "status", "request_counts", "output_file_id" y
+            "error_file_id".
+        """
+        return self.request("GET", f"/batches/{batch_id}").json()
+
+    def cancel_batch(self, batch_id: str) -> dict:
+        """
+        Cancela un trabajo. Los resultados ya producidos quedan en su archivo
+        de salida.
+
+        Args:
+            batch_id (str): Id del trabajo.
+
+        Returns:
+            dict: Trabajo.
+        """
+        return self.request("POST", f"/batches/{batch_id}/cancel").json()
+
+    def download_file(self, file_id: str, path: str) -> str:
+        """
+        Descarga el contenido de un archivo sin cargarlo completo en memoria.
+
+        Args:
+            file_id (str): Id del archivo.
+            path (str): Ruta donde guardarlo.
+
+        Returns:
+            str: La ruta del archivo descargado.
+        """
+        response = self.request("GET", f"/files/{file_id}/content", stream=True)
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as file:
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                file.write(chunk)
+        os.replace(temporary_path, path)
+        return path
+
+    def close(self) -> None:
+        """
+        Libera las conexiones del cliente.
+
+        Returns:
+            None.
+        """
+        self.session.close()
+
+
+class BatchJobState:
+
+    """
+    Estado de los trabajos de una tarea en una codificación por lotes. El
+    archivo "{task}.state.json" guarda solo la ronda actual y los trabajos
+    enviados (con su archivo y si ya se ingirieron), de modo que cada
+    escritura es pequeña. Los ids de las frases de cada solicitud y, con
+    deduplicación, las frases a las que se extiende el resultado de cada
+    representante se escriben una sola vez al enviar cada ronda, en el índice
+    JSONL "{task}.index_{ronda}.jsonl".
+    """
+
+    def __init__(self, job_dir: str, task: str):
+        """
+        Args:
+            job_dir (str): Directorio de los trabajos. Se crea si no existe.
+            task (str): Nombre de la tarea.
+        """
+        if not os.path.exists(job_dir):
+            os.makedirs(job_dir)
+        self.job_dir = job_dir
+        self.task = task
+        self.path = os.path.join(job_dir, f"{task}.state.json")
+        self.round = 0
+        self.jobs = []
+        self._index = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as file:
+                state = json.load(file)
+            self.round = state["round"]
+            self.jobs = state["jobs"]
+
+    def index_path(self, round_i: int) -> str:
+        """
+        Ruta del índice de solicitudes de una ronda.
+
+        Args:
+            round_i (int): Ronda de envío.
+
+        Returns:
+            str: Ruta del archivo JSONL.
+        """
+        return os.path.join(self.job_dir, f"{self.task}.index_{round_i}.jsonl")
+
+    def write_index(self, entries) -> None:
+        """
+        Escribe el índice de la ronda actual, reemplazando el de un envío
+        anterior de la misma ronda que no alcanzó a registrarse.
+
+        Args:
+            entries: Iterable de tuplas (custom_id, ids, members): ids de las
+                frases de la solicitud y diccionario representante -> frases
+                de su grupo.
+
+        Returns:
+            None.
+        """
+        with open(self.index_path(self.round), "w", encoding="utf-8") as file:
+            for key, ids, members in entries:
+                record = {"custom_id": key, "ids": ids, "members": members}
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._index.pop(self.round, None)
+
+    def request(self, round_i: int, key: str) -> tuple:
+        """
+        Ids y grupos de una solicitud. El índice de la ronda se lee una vez y
+        queda en memoria mientras tenga trabajos sin ingerir.
+
+        Args:
+            round_i (int): Ronda de la solicitud.
+            key (str): `custom_id` de la solicitud.
+
+        Returns:
+            tuple: (ids, members) como los recibe `write_index`.
+        """
+        if round_i not in self._index:
+            index = {}
+            with open(self.index_path(round_i), "r", encoding="utf-8") as file:
+                for line in file:
+                    record = json.loads(line)
+                    index[record["custom_id"]] = (record["ids"], record["members"])
+            self._index[round_i] = index
+        return self._index[round_i][key]
+
+    def active(self) -> list:
+        """
+        Trabajos enviados cuyos resultados aún no se ingirieron.
+
+        Returns:
+            list: Trabajos, cada uno un diccionario.
+        """
+        return [job for job in self.jobs if not job["ingested"]]
+
+    def save(self) -> None:
+        """
+        Escribe el estado reemplazando el anterior de forma atómica. Los
+        índices de las rondas ya ingeridas se liberan de la memoria.
+
+        Returns:
+            None.
+        """
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"round": self.round, "jobs": self.jobs}, file, ensure_ascii=False
+            )
+        os.replace(temporary_path, self.path)
+
+        active_rounds = {job["round"] for job in self.active()}
+        for round_i in list(self._index):
+            if round_i not in active_rounds and round_i != self.round:
+                del self._index[round_i]
@@ -0,0 +1,151 @@
+from concurrency import estimate_tokens
+
+# Ventana de contexto (prompt + respuesta) de cada modelo, en tokens
+MODEL_CONTEXT_TOKENS = {
+    "gpt-3.5-turbo": 4096,
+    "gpt-3.5-turbo-16k": 16384,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+}
+
+# Tokens de respuesta esperados por frase: (fijos, proporción del texto de entrada)
+TASK_OUTPUT_TOKENS = {
+    "topics": (24, 0.0),
+    "cluster_topics": (24, 0.0),
+    "sentiment": (8, 0.0),
+    "translation": (8, 1.3),
+    "spelling_correction": (8, 1.1),
+}
+
+# Lo mismo para el formato compacto: sin comillas ni llaves JSON y con
+# códigos de una letra para el sentimiento
+COMPACT_OUTPUT_TOKENS = {
+    "topics": (12, 0.0),
+    "cluster_topics": (12, 0.0),
+    "sentiment": (2, 0.0),
+    "translation": (2, 1.3),
+    "spelling_correction": (2, 1.1),
+}
+
+
+class BatchPlanner:
+
+    """
+    Agrupa las frases en lotes según su número estimado de tokens, de forma
+    que el prompt más la respuesta esperada de cada lote quepan en la ventana
+    de contexto del modelo.
+    """
+
+    def __init__(
+        self,
+        model: str = "gpt-3.5-turbo",
+        context_tokens: int = None,
+        safety_margin: float = 0.9,
+        compact: bool = False,
+    ):
+        """
+        Args:
+            model (str): LLM a utilizar.
+            context_tokens (int): Ventana de contexto del modelo. Si no se indica
+                se toma de MODEL_CONTEXT_TOKENS (4096 para modelos desconocidos).
+            safety_margin (float): Fracción de la ventana que se puede usar,
+                para absorber el error de la estimación de tokens.
+            compact (bool): Si es True, se estiman los tokens del formato
+                compacto de `Codificacion` (llaves numéricas y respuesta TSV).
+        """
+        self.model = model
+        self.context_tokens = context_tokens or MODEL_CONTEXT_TOKENS.get(model, 4096)
+        self.safety_margin = safety_margin
+        self.compact = compact
+        self.output_tokens = COMPACT_OUTPUT_TOKENS if compact else TASK_OUTPUT_TOKENS
+        self.planned_requests = 0
+        self.oversized_phrases = 0
+
+    def phrase_tokens(self, task: str, id_i, text: str) -> int:
+        """
+        Estima los tokens de entrada más los de salida esperados de una frase.
+
+        Args:
+            task (str | list): Nombre de la tarea, o lista de tareas si se
+                resuelven varias en la misma solicitud.
+            id_i: Identificador de la frase.
+            text (str): Texto de la frase.
+
+        Returns:
+            int: Número estimado de tokens.
+        """
+        tasks = [task] if isinstance(task, str) else task
+        fixed, ratio = 0, 0.0
+        for task_i in tasks:
+            fixed_i, ratio_i = self.output_tokens.get(task_i, (16, 1.0))
+            fixed, ratio = fixed + fixed_i, ratio + ratio_i
+        if self.compact:
+            # Las llaves son la posición en el lote, a lo sumo de tres cifras
+            input_tokens = estimate_tokens(f"999\t{text}\n")
+            key_tokens = estimate_tokens("999\t\n")
+        else:
+            input_tokens = estimate_tokens(f"Frase{id_i}: {text}\n")
+            key_tokens = estimate_tokens(f'"Frase{id_i}": ,')
+        return input_tokens + key_tokens + fixed + int(ratio * estimate_tokens(text))
+
+    def plan(
+        self,
+        task: str,
+        ids: list,
+        texts: list,
+        prompt_tokens: int,
+        max_batch_size: int = None,
+    ) -> list:
+        """
+        Divide las frases en lotes que respetan el presupuesto de tokens y,
+        opcionalmente, un número máximo de frases por lote.
+
+        Args:
+            task (str | list): Nombre de la tarea o lista de tareas.
+            ids (list): Identificadores de las frases.
+            texts (list): Textos de las frases.
+            prompt_tokens (int): Tokens de las instrucciones del prompt sin frases.
+            max_batch_size (int): Número máximo de frases por lote. None para
+                limitar solo por tokens.
+
+        Returns:
+            list: Lista de lotes, cada uno una tupla (ids_batch, text_batch).
+        """
+        budget = int(self.context_tokens * self.safety_margin) - prompt_tokens
+        batches = []
+        ids_batch, text_batch, batch_tokens = [], [], 0
+        self.oversized_phrases = 0
+
+        for id_i, text in zip(ids, texts):
+            tokens = self.phrase_tokens(task, id_i, text)
+            full = max_batch_size is not None and len(ids_batch) >= max_batch_size
+            if ids_batch and (full or batch_tokens + tokens > budget):
+                batches.append((ids_batch, text_batch))
+                ids_batch, text_batch, batch_tokens = [], [], 0
+            if tokens > budget:
+                # Una frase que no cabe sola se envía en su propio lote
+                self.oversized_phrases += 1
+            ids_batch.append(id_i)
+            text_batch.append(text)
+            batch_tokens += tokens
+
+        if ids_batch:
+            batches.append((ids_batch, text_batch))
+
+        self.planned_requests = len(batches)
+        return batches
+
+    def report(self) -> dict:
+        """
+        Resumen del último plan.
+
+        Returns:
+            dict: Número de solicitudes planeadas y de frases que exceden el
+            presupuesto por sí solas.
+        """
+        return {
+            "model": self.model,
+            "context_tokens": self.context_tokens,
+            "planned_requests": self.planned_requests,
+            "oversized_phrases": self.oversized_phrases,
+        }
@@ -0,0 +1,881 @@
+"""
+Benchmarks de las rutas críticas del proyecto. No requieren red.
+
+Uso:
+    python benchmark.py parsing --phrases 1000000
+    python benchmark.py cleaning --rows 100000 --n_jobs 4
+    python benchmark.py cleaning --rows 200000 --duplicates 0.6
+    python benchmark.py collector --tweets 50000 --rate 2000
+    python benchmark.py topics --rows 1000000 --clusters 100
+    python benchmark.py encoding --phrases 5000 --task multitask --tasks sentiment topics
+    python benchmark.py store --responses 1000000
+    python benchmark.py suite --rows 20000 --output results.json --baseline baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import platform
+import contextlib
+import pickle
+import tracemalloc
+
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from backends import HTTPBackend
+from codification import Codificacion
+from data.utils import (
+    clean_text,
+    iter_responses,
+    migrate_pickle,
+    read_social_listening_data,
+    read_table,
+    save_pandas_object,
+    tokenizador,
+)
+from mock_server import MockBackend, start_server
+from parsing import responses_to_series
+from topics import TopicClusterer
+
+SENTIMENTS = ["positivo", "negativo", "neutro"]
+
+# Etapas de la suite, en el orden en que se ejecutan
+SUITE_STAGES = [
+    "collection",
+    "reading",
+    "cleaning",
+    "batching",
+    "completion",
+    "parsing",
+]
+
+# Caída de throughput o aumento de memoria frente a la línea base a partir
+# del cual una etapa se reporta como regresión
+REGRESSION_TOLERANCE = 0.2
+# Aumento de la latencia p99 tolerado; es más alto porque la cola varía más
+# entre corridas que el throughput
+P99_TOLERANCE = 0.5
+
+WORDS = [
+    "hola", "mundo", "café", "sostenibilidad", "energía", "verde", "ñandú",
+    "gooooool", "increíble", "2023", "reciclaje", "¡Qué", "bien!", ":)", "😀",
+    "#medioambiente", "#café", "@usuario_1", "https://t.co/abc123", "x_y",
+    "#niñoFeliz", "#año2023x", "#Ñandú", "#caféabc",
+]  # fmt: skip
+
+
+def synthetic_tweets(n_rows: int, duplicates: float = 0.0, seed: int = 0) -> list:
+    """
+    Genera tweets sintéticos con hashtags, menciones, enlaces, emojis y
+    alargamientos. Una fracción `duplicates` son copias de tweets anteriores.
+
+    Args:
+        n_rows (int): Número de tweets.
+        duplicates (float): Fracción de tweets duplicados.
+        seed (int): Semilla aleatoria.
+
+    Returns:
+        list: Lista de tweets.
+    """
+    rng = random.Random(seed)
+    tweets = []
+    for _ in range(n_rows):
+        if tweets and rng.random() < duplicates:
+            tweets.append(rng.choice(tweets))
+        else:
+            tweets.append(
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 30)))
+            )
+    return tweets
+
+
+def synthetic_responses(
+    n_phrases: int, batch_size: int = 50, malformed: float = 0.2, seed: int = 0
+) -> tuple:
+    """
+    Genera respuestas sintéticas como las del modelo. Una fracción `malformed`
+    viene con bloques de código y texto adicional, en texto plano o cortada.
+
+    Args:
+        n_phrases (int): Número total de frases.
+        batch_size (int): Frases por respuesta.
+        malformed (float): Fracción de respuestas con defectos.
+        seed (int): Semilla aleatoria.
+
+    Returns:
+        tuple: (responses, expected_ids).
+    """
+    rng = random.Random(seed)
+    responses, expected_ids = [], []
+    for start in range(0, n_phrases, batch_size):
+        ids_batch = list(range(start, min(start + batch_size, n_phrases)))
+        entries = {f"Frase{i}": rng.choice(SENTIMENTS) for i in ids_batch}
+        response = json.dumps(entries, ensure_ascii=False, indent=1)
+        if rng.random() < malformed:
+            kind = rng.randrange(3)
+            if kind == 0:
+                response = f"```json\n{response}\n```\nEspero que sea útil."
+            elif kind == 1:
+                response = "\n".join(
+                    f"{key}: {value}" for key, value in entries.items()
+                )
+            else:
+                response = response[: int(len(response) * 0.9)]
+        responses.append(response)
+        expected_ids.append(ids_batch)
+    return responses, expected_ids
+
+
+def legacy_from_json_list_to_df(json_list: list) -> pd.Series:
+    # Implementación anterior de `from_json_list_to_df`, como referencia
+    new_dict = {}
+    for json_str in json_list:
+        dict_i = json.loads("".join(json_str.splitlines()))
+        new_dict.update({key.replace("Frase", ""): v for key, v in dict_i.items()})
+    return pd.Series(new_dict)
+
+
+def legacy_clean_text(df: pd.DataFrame, variable: str = "text") -> pd.Series:
+    # Cadena anterior de `clean_text`, como referencia
+    return (
+        df[variable]
+        .map(tokenizador.__wrapped__)
+        .map(lambda x: re.sub(r"#\w+\b", "", x))
+        .map(lambda x: re.sub(r"[^a-zA-Z0-9\s]", "", x))
+        .map(lambda x: x.lower())
+    )
+
+
+def bench_cleaning(n_rows: int, n_jobs: int = 1, duplicates: float = 0.0) -> dict:
+    """
+    Compara el throughput de `clean_text` con la cadena anterior y verifica
+    que ambas produzcan el mismo resultado. Con `duplicates` mide además la
+    limpieza de cada texto distinto una sola vez frente a limpiar cada fila.
+
+    Args:
+        n_rows (int): Número de tweets.
+        n_jobs (int): Procesos para `clean_text`.
+        duplicates (float): Fracción de tweets que son copias de otros.
+
+    Returns:
+        dict: Resultados del benchmark.
+    """
+    df = pd.DataFrame({"text": synthetic_tweets(n_rows, duplicates)})
+
+    start = time.perf_counter()
+    legacy = legacy_clean_text(df)
+    legacy_seconds = time.perf_counter() - start
+
+    # Cada modo empieza con el caché de `tokenizador` vacío; sin `deduplicate`
+    # las copias se resuelven solo con ese caché
+    tokenizador.cache_clear()
+    start = time.perf_counter()
+    per_row = clean_text(df, n_jobs=n_jobs, deduplicate=False)
+    per_row_seconds = time.perf_counter() - start
+
+    tokenizador.cache_clear()
+    start = time.perf_counter()
+    cleaned = clean_text(df, n_jobs=n_jobs)
+    seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    categorical = clean_text(df, n_jobs=n_jobs, as_category=True)
+    warm_seconds = time.perf_counter() - start
+
+    return {
+        "rows": n_rows,
+        "unique_rows": int(df["text"].nunique()),
+        "n_jobs": n_jobs,
+        "rows_per_sec": n_rows / seconds,
+        "lru_only_rows_per_sec": n_rows / per_row_seconds,
+        "warm_cache_category_rows_per_sec": n_rows / warm_seconds,
+        "legacy_rows_per_sec": n_rows / legacy_seconds,
+        "speedup": legacy_seconds / seconds,
+        "category_memory_ratio": float(
+            categorical.memory_usage(deep=True) / cleaned.memory_usage(deep=True)
+        ),
+        "equivalent": bool(
+            (legacy.astype(object) == cleaned.astype(object)).all()
+            and (per_row.astype(object) == cleaned.astype(object)).all()
+            and (categorical.astype(object) == cleaned.astype(object)).all()
+        ),
+    }
+
+
+def write_stream_payloads(path: str, n_tweets: int, seed: int = 0) -> None:
+    """
+    Escribe un archivo NDJSON con payloads crudos como los del stream de la API.
+
+    Args:
+        path (str): Ruta del archivo.
+        n_tweets (int): Número de payloads.
+        seed (int): Semilla aleatoria.
+
+    Returns:
+        None.
+    """
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as file:
+        for i, text in enumerate(synthetic_tweets(n_tweets, seed=seed)):
+            payload = {
+                "data": {
+                    "id": str(i),
+                    "text": text,
+                    "lang": "es" if rng.random() < 0.9 else "en",
+                    "created_at": "2023-06-01T12:00:00.000Z",
+                    "public_metrics": {"retweet_count": rng.randint(0, 50)},
+                    "entities": {"hashtags": [{"tag": "medioambiente"}]},
+                },
+                "matching_rules": [{"id": "1", "tag": ""}],
+            }
+            file.write(json.dumps(payload, ensure_ascii=False) + "\n")
+
+
+def bench_collector(
+    n_tweets: int, rate: float = None, tweets_per_part: int = 10000
+) -> dict:
+    """
+    Reproduce payloads sintéticos en `MyStream` sin conexión y mide el
+    throughput de recepción y de procesamiento completo, la latencia de
+    escritura de las partes y la memoria máxima.
+
+    Args:
+        n_tweets (int): Número de payloads.
+        rate (float): Tweets por segundo de la reproducción. None para no limitar.
+        tweets_per_part (int): Tweets por parte escrita.
+
+    Returns:
+        dict: Resultados del benchmark.
+    """
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+    from data_collection import MyStream, ReplaySource
+
+    with tempfile.TemporaryDirectory() as root_path:
+        path = os.path.join(root_path, "payloads.ndjson")
+        write_stream_payloads(path, n_tweets)
+
+        stream = MyStream(
+            "replay",
+            parts=n_tweets,
+            number_of_tweets=tweets_per_part,
+            folder_name="benchmark",
+            queue_size=n_tweets,
+            root_path=root_path,
+        )
+        tracemalloc.start()
+        start = time.perf_counter()
+        ReplaySource(path, rate).feed(stream)
+        receive_seconds = time.perf_counter() - start
+        stream.close()
+        total_seconds = time.perf_counter() - start
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        metrics = stream.metrics()
+
+    return {
+        "tweets": n_tweets,
+        "receive_tweets_per_sec": n_tweets / receive_seconds,
+        "end_to_end_tweets_per_sec": n_tweets / total_seconds,
+        "dropped": metrics["dropped"],
+        "written": metrics["written"],
+        "parts_written": metrics["parts_written"],
+        "max_queue_depth": metrics["max_queue_depth"],
+        "max_flush_seconds": metrics["max_flush_seconds"],
+        "peak_memory_mb": peak_memory / 1024**2,
+    }
+
+
+def bench_topics(n_rows: int, n_clusters: int = 100) -> dict:
+    """
+    Mide el tiempo del agrupamiento local de tópicos sobre tweets sintéticos
+    limpios.
+
+    Args:
+        n_rows (int): Número de tweets.
+        n_clusters (int): Número de grupos.
+
+    Returns:
+        dict: Resultados del benchmark.
+    """
+    df = pd.DataFrame({"text": synthetic_tweets(n_rows, duplicates=0.3)})
+    texts = clean_text(df).tolist()
+    clusterer = TopicClusterer(n_clusters=n_clusters, min_df=1, max_df=1.0)
+
+    start = time.perf_counter()
+    clusterer.fit_predict(texts)
+    clusterer.exemplars(texts)
+    seconds = time.perf_counter() - start
+
+    return {
+        **clusterer.report(),
+        "seconds": seconds,
+        "rows_per_sec": n_rows / seconds,
+    }
+
+
+def bench_encoding(
+    n_phrases: int, task: str = "sentiment", batch_size: int = 50, **params
+) -> dict:
+    """
+    Codifica las mismas frases contra el servidor local en el formato normal y
+    en el compacto, y compara los tokens por frase que reporta el servidor y
+    los resultados decodificados.
+
+    Args:
+        n_phrases (int): Número de frases.
+        task (str): Tarea a codificar.
+        batch_size (int): Frases por lote.
+        **params: Parámetros adicionales del prompt (num_topicos, lang, tasks).
+
+    Returns:
+        dict: Resultados del benchmark.
+    """
+    df = pd.DataFrame(
+        {"ID": range(n_phrases), "text": synthetic_tweets(n_phrases, seed=1)}
+    )
+    server = start_server()
+    api_base = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    result, series = {"phrases": n_phrases, "task": task}, {}
+    try:
+        for name, compact in (("verbose", False), ("compact", True)):
+            codificacion = Codificacion(
+                "mock",
+                max_concurrency=8,
+                backend=HTTPBackend("mock", api_base, pool_size=8),
+                compact=compact,
+            )
+            start = time.perf_counter()
+            responses = codificacion.codificate(
+                task, df, batch_size, "text", "ID", **params
+            )
+            seconds = time.perf_counter() - start
+            series[name] = codificacion.from_json_list_to_df(responses)
+            summary = codificacion.telemetry.summary()
+            codificacion.backend.close()
+            result[name] = {
+                "prompt_tokens_per_phrase": summary["prompt_tokens_per_phrase"],
+                "completion_tokens_per_phrase": summary["completion_tokens_per_phrase"],
+                "requests": summary["requests"],
+                "seconds": seconds,
+            }
+    finally:
+        server.shutdown()
+
+    verbose, compact = result["verbose"], result["compact"]
+    for kind in ("prompt", "completion"):
+        key = f"{kind}_tokens_per_phrase"
+        result[f"{kind}_reduction"] = 1 - compact[key] / verbose[key]
+    same = series["verbose"].index.intersection(series["compact"].index)
+    result["matching_results"] = float(
+        (
+            series["verbose"][same].map(json.dumps)
+            == series["compact"][same].map(json.dumps)
+        ).mean()
+    )
+    return result
+
+
+def measure(function) -> tuple:
+    """
+    Ejecuta una función midiendo su tiempo y, en una segunda ejecución (el
+    rastreo de tracemalloc distorsiona los tiempos), su memoria máxima. Las
+    columnas de texto de pandas viven en memoria de Arrow, que tracemalloc no
+    ve, así que se suma la memoria de Arrow que retiene el resultado.
+
+    Args:
+        function: Función sin argumentos.
+
+    Returns:
+        tuple: (resultado, segundos, memoria máxima en MB).
+    """
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    del result
+    arrow_start = pa.total_allocated_bytes()
+    tracemalloc.start()
+    result = function()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    peak_memory += max(0, pa.total_allocated_bytes() - arrow_start)
+    return result, seconds, peak_memory / 1024**2
+
+
+def bench_store(n_responses: int, batch_size: int = 20) -> dict:
+    """
+    Compara la recarga de una corrida guardada con pickle con la del
+    almacenamiento de resultados: respuestas en JSONL comprimido recorridas
+    de forma perezosa y resultados en Parquet mapeado en memoria.
+
+    Args:
+        n_responses (int): Número de respuestas.
+        batch_size (int): Frases por respuesta.
+
+    Returns:
+        dict: Resultados del benchmark.
+    """
+    responses, _ = synthetic_responses(n_responses * batch_size, batch_size, 0)
+    series, _ = responses_to_series(responses)
+
+    with tempfile.TemporaryDirectory() as folder:
+        responses_pickle = os.path.join(folder, "responses.pkl")
+        series_pickle = os.path.join(folder, "results.pkl")
+        with open(responses_pickle, "wb") as file:
+            pickle.dump(responses, file)
+        with open(series_pickle, "wb") as file:
+            pickle.dump(series, file)
+        del responses, series
+
+        start = time.perf_counter()
+        responses_path = migrate_pickle(responses_pickle)
+        migrate_seconds = time.perf_counter() - start
+        series_path = migrate_pickle(series_pickle)
+
+        def load_pickle(path):
+            with open(path, "rb") as file:
+                return pickle.load(file)
+
+        _, pickle_seconds, pickle_memory = measure(
+            lambda: load_pickle(responses_pickle)
+        )
+        _, lazy_seconds, lazy_memory = measure(
+            lambda: sum(1 for _ in iter_responses(responses_path))
+        )
+        _, series_pickle_seconds, series_pickle_memory = measure(
+            lambda: load_pickle(series_pickle)
+        )
+        _, table_seconds, table_memory = measure(lambda: read_table(series_path))
+        sizes = {
+            name: os.path.getsize(path) / 1024**2
+            for name, path in (
+                ("responses_pickle_mb", responses_pickle),
+                ("responses_jsonl_gz_mb", responses_path),
+                ("results_pickle_mb", series_pickle),
+                ("results_parquet_mb", series_path),
+            )
+        }
+
+    return {
+        "responses": n_responses,
+        "phrases": n_responses * batch_size,
+        **sizes,
+        "migrate_responses_seconds": migrate_seconds,
+        "pickle_load_seconds": pickle_seconds,
+        "pickle_load_peak_mb": pickle_memory,
+        "lazy_iteration_seconds": lazy_seconds,
+        "lazy_iteration_peak_mb": lazy_memory,
+        "results_pickle_seconds": series_pickle_seconds,
+        "results_pickle_peak_mb": series_pickle_memory,
+        "results_parquet_seconds": table_seconds,
+        "results_parquet_peak_mb": table_memory,
+    }
+
+
+def run_stage(setup, repeat: int = 3) -> dict:
+    """
+    Mide una etapa de la suite. `setup()` prepara una ejecución nueva y
+    devuelve (unidades, función, cierre): la función procesa una unidad y
+    devuelve el número de elementos procesados, y el cierre (o None) termina
+    la etapa, por ejemplo esperando al hilo escritor. La etapa se ejecuta
+    `repeat` veces para medir tiempos (se reporta la más rápida, la menos
+    afectada por el ruido de la máquina) y otra con tracemalloc para medir la
+    memoria máxima de Python (los buffers de Arrow no se incluyen).
+
+    Args:
+        setup: Función sin argumentos que prepara la etapa.
+        repeat (int): Ejecuciones cronometradas.
+
+    Returns:
+        dict: Elementos, segundos, elementos por segundo, latencias p50 y p99
+        por unidad y memoria máxima.
+    """
+    seconds, latencies = None, []
+    for _ in range(repeat):
+        units, function, finish = setup()
+        items = 0
+        start = time.perf_counter()
+        for unit in units:
+            unit_start = time.perf_counter()
+            items += function(unit)
+            latencies.append(time.perf_counter() - unit_start)
+        if finish is not None:
+            finish()
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+    units, function, finish = setup()
+    tracemalloc.start()
+    for unit in units:
+        function(unit)
+    if finish is not None:
+        finish()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "items": items,
+        "units": len(units),
+        "seconds": seconds,
+        "items_per_sec": items / seconds,
+        "latency_p50": float(np.percentile(latencies, 50)),
+        "latency_p99": float(np.percentile(latencies, 99)),
+        "peak_memory_mb": peak_memory / 1024**2,
+    }
+
+
+def suite_stages(
+    n_rows: int, folder: str, seed: int = 0, latency: float = 0.005
+) -> dict:
+    """
+    Prepara las etapas de la suite sobre un corpus sintético de `n_rows`
+    tweets con 30% de copias.
+
+    Args:
+        n_rows (int): Tamaño del corpus.
+        folder (str): Carpeta temporal para los archivos de la suite.
+        seed (int): Semilla del corpus.
+        latency (float): Latencia simulada de cada solicitud al modelo.
+
+    Returns:
+        dict: Nombre de cada etapa y su función `setup` (ver `run_stage`).
+    """
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+    from data_collection import MyStream
+
+    tweets = synthetic_tweets(n_rows, duplicates=0.3, seed=seed)
+    df = pd.DataFrame({"ID": range(n_rows), "text": tweets})
+
+    payloads_path = os.path.join(folder, "payloads.ndjson")
+    write_stream_payloads(payloads_path, n_rows, seed)
+    with open(payloads_path, "r", encoding="utf-8") as file:
+        payloads = file.read().splitlines()
+
+    part_size = max(1, n_rows // 10)
+    for n, start in enumerate(range(0, n_rows, part_size), 1):
+        save_pandas_object(
+            df[start : (start + part_size)], folder, "client", f"data_{n}.csv"
+        )
+
+    responses, _ = synthetic_responses(n_rows, 50, seed=seed)
+
+    def chunks(items, size):
+        return [items[i : (i + size)] for i in range(0, len(items), size)]
+
+    def collection():
+        stream = MyStream(
+            "suite",
+            parts=n_rows,
+            number_of_tweets=part_size,
+            folder_name="collection",
+            queue_size=n_rows,
+            root_path=folder,
+        )
+
+        def feed(raw_data):
+            stream.on_data(raw_data)
+            return 1
+
+        return payloads, feed, stream.close
+
+    def reading():
+        def read(_):
+            return len(read_social_listening_data("client", root_path=folder))
+
+        return list(range(5)), read, None
+
+    def cleaning():
+        tokenizador.cache_clear()
+        return chunks(df, 500), lambda chunk: len(clean_text(chunk)), None
+
+    def batching():
+        codificacion = Codificacion("suite", backend=MockBackend())
+
+        def plan(chunk):
+            ids, texts = chunk["ID"].tolist(), chunk["text"].tolist()
+            for ids_batch, text_batch in codificacion.plan_batches(
+                "sentiment", ids, texts, 50
+            ):
+                codificacion.batch_prompt("sentiment", ids_batch, text_batch)
+            return len(ids)
+
+        return chunks(df, 500), plan, None
+
+    def completion():
+        codificacion = Codificacion(
+            "suite", max_concurrency=8, backend=MockBackend(latency)
+        )
+
+        def code(chunk):
+            codificacion.codificate("sentiment", chunk, 50, "text", "ID")
+            return len(chunk)
+
+        return chunks(df, 1000), code, None
+
+    def parsing():
+        codificacion = Codificacion("suite", backend=MockBackend())
+        return (
+            chunks(responses, 10),
+            lambda chunk: len(codificacion.from_json_list_to_df(chunk)),
+            None,
+        )
+
+    return {
+        "collection": collection,
+        "reading": reading,
+        "cleaning": cleaning,
+        "batching": batching,
+        "completion": completion,
+        "parsing": parsing,
+    }
+
+
+def compare_to_baseline(
+    result: dict,
+    baseline: dict,
+    tolerance: float = REGRESSION_TOLERANCE,
+    p99_tolerance: float = P99_TOLERANCE,
+) -> dict:
+    """
+    Compara cada etapa con la misma etapa de una corrida anterior. Una etapa
+    es una regresión si su throughput cae más de `tolerance`, su memoria
+    máxima crece más de `tolerance` o su latencia p99 crece más de
+    `p99_tolerance`.
+
+    Args:
+        result (dict): Resultado de `bench_suite`.
+        baseline (dict): Resultado guardado de una corrida anterior.
+        tolerance (float): Variación relativa tolerada del throughput y la
+            memoria.
+        p99_tolerance (float): Aumento relativo tolerado de la latencia p99.
+
+    Returns:
+        dict: Razones frente a la línea base y regresión de cada etapa.
+    """
+    if baseline["suite"]["rows"] != result["suite"]["rows"]:
+        print("La línea base usa otro tamaño de corpus", file=sys.stderr)
+
+    comparison = {}
+    for name, stage in result["stages"].items():
+        base = baseline["stages"].get(name)
+        if base is None:
+            continue
+        throughput = stage["items_per_sec"] / base["items_per_sec"]
+        memory = (stage["peak_memory_mb"] + 1) / (base["peak_memory_mb"] + 1)
+        p99 = stage["latency_p99"] / base["latency_p99"] if base["latency_p99"] else 1.0
+        comparison[name] = {
+            "throughput_ratio": throughput,
+            "latency_p99_ratio": p99,
+            "peak_memory_ratio": memory,
+            "regression": (
+                throughput < 1 - tolerance
+                or memory > 1 + tolerance
+                or p99 > 1 + p99_tolerance
+            ),
+        }
+    return comparison
+
+
+def bench_suite(
+    n_rows: int,
+    stages: list = None,
+    seed: int = 0,
+    latency: float = 0.005,
+    baseline: dict = None,
+    tolerance: float = REGRESSION_TOLERANCE,
+    repeat: int = 3,
+    p99_tolerance: float = P99_TOLERANCE,
+) -> dict:
+    """
+    Ejecuta la suite completa sin red: escucha (`MyStream.on_data`), lectura
+    de una carpeta de cliente, limpieza, planeación de lotes y construcción de
+    prompts, codificación contra un cliente falso determinista y parseo de
+    respuestas.
+
+    Args:
+        n_rows (int): Tamaño del corpus sintético.
+        stages (list): Etapas a ejecutar. Por defecto todas (SUITE_STAGES).
+        seed (int): Semilla del corpus.
+        latency (float): Latencia simulada de cada solicitud al modelo.
+        baseline (dict): Resultado de una corrida anterior para comparar.
+        tolerance (float): Variación relativa tolerada del throughput y la
+            memoria frente a la línea base.
+        repeat (int): Ejecuciones cronometradas de cada etapa.
+        p99_tolerance (float): Aumento relativo tolerado de la latencia p99.
+
+    Returns:
+        dict: Configuración, resultados por etapa y, si hay línea base, la
+        comparación y la lista de regresiones.
+    """
+    result = {
+        "suite": {
+            "rows": n_rows,
+            "seed": seed,
+            "latency": latency,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "stages": {},
+    }
+    # Los mensajes de avance de cada etapa no se mezclan con el JSON
+    with tempfile.TemporaryDirectory() as folder, contextlib.redirect_stdout(
+        sys.stderr
+    ):
+        setups = suite_stages(n_rows, folder, seed, latency)
+        for name in stages or SUITE_STAGES:
+            result["stages"][name] = run_stage(setups[name], repeat)
+
+    if baseline is not None:
+        result["comparison"] = compare_to_baseline(
+            result, baseline, tolerance, p99_tolerance
+        )
+        result["regressions"] = [
+            name for name, stage in result["comparison"].items() if stage["regression"]
+        ]
+    return result
+
+
+def bench_parsing(n_phrases: int, batch_size: int = 50) -> dict:
+    """
+    Mide el throughput del parser tolerante sobre respuestas con defectos y,
+    sobre respuestas limpias, lo compara con la implementación anterior.
+
+    Args:
+        n_phrases (int): Número total de frases.
+        batch_size (int): Frases por respuesta.
+
+    Returns:
+        dict: Resultados del benchmark.
+    """
+    responses, expected_ids = synthetic_responses(n_phrases, batch_size)
+    start = time.perf_counter()
+    series, lost_ids = responses_to_series(responses, expected_ids)
+    seconds = time.perf_counter() - start
+
+    clean, _ = synthetic_responses(n_phrases, batch_size, malformed=0)
+    start = time.perf_counter()
+    responses_to_series(clean)
+    clean_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    legacy_from_json_list_to_df(clean)
+    legacy_seconds = time.perf_counter() - start
+
+    return {
+        "phrases": n_phrases,
+        "recovered": len(series),
+        "lost": len(lost_ids),
+        "phrases_per_sec": n_phrases / seconds,
+        "clean_phrases_per_sec": n_phrases / clean_seconds,
+        "legacy_clean_phrases_per_sec": n_phrases / legacy_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    parsing = subparsers.add_parser("parsing", help="Parser de respuestas")
+    parsing.add_argument("--phrases", type=int, default=100000)
+    parsing.add_argument("--batch_size", type=int, default=50)
+
+    cleaning = subparsers.add_parser("cleaning", help="Limpieza de texto")
+    cleaning.add_argument("--rows", type=int, default=20000)
+    cleaning.add_argument("--n_jobs", type=int, default=1)
+    cleaning.add_argument("--duplicates", type=float, default=0.0)
+
+    collector = subparsers.add_parser("collector", help="Escucha (MyStream)")
+    collector.add_argument("--tweets", type=int, default=20000)
+    collector.add_argument("--rate", type=float, default=None)
+    collector.add_argument("--tweets_per_part", type=int, default=10000)
+
+    topics = subparsers.add_parser("topics", help="Agrupamiento de tópicos")
+    topics.add_argument("--rows", type=int, default=100000)
+    topics.add_argument("--clusters", type=int, default=100)
+
+    encoding = subparsers.add_parser("encoding", help="Formato normal vs compacto")
+    encoding.add_argument("--phrases", type=int, default=5000)
+    encoding.add_argument("--task", type=str, default="sentiment")
+    encoding.add_argument("--tasks", type=str, nargs="+", default=None)
+    encoding.add_argument("--batch_size", type=int, default=50)
+    encoding.add_argument("--num_topicos", type=int, default=3)
+    encoding.add_argument("--lang", type=str, default="inglés")
+
+    store = subparsers.add_parser(
+        "store", help="Pickle vs almacenamiento de resultados"
+    )
+    store.add_argument("--responses", type=int, default=100000)
+    store.add_argument("--batch_size", type=int, default=20)
+
+    suite = subparsers.add_parser("suite", help="Suite completa con línea base")
+    suite.add_argument("--rows", type=int, default=20000)
+    suite.add_argument("--stages", type=str, nargs="+", default=None)
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--latency", type=float, default=0.005)
+    suite.add_argument("--output", type=str, default=None)
+    suite.add_argument("--baseline", type=str, default=None)
+    suite.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    suite.add_argument("--repeat", type=int, default=3)
+    suite.add_argument("--p99_tolerance", type=float, default=P99_TOLERANCE)
+
+    args = parser.parse_args()
+    if args.benchmark == "parsing":
+        result = bench_parsing(args.phrases, args.batch_size)
+    elif args.benchmark == "cleaning":
+        result = bench_cleaning(args.rows, args.n_jobs, args.duplicates)
+    elif args.benchmark == "collector":
+        result = bench_collector(args.tweets, args.rate, args.tweets_per_part)
+    elif args.benchmark == "topics":
+        result = bench_topics(args.rows, args.clusters)
+    elif args.benchmark == "suite":
+        baseline = None
+        if args.baseline is not None:
+            with open(args.baseline, "r", encoding="utf-8") as file:
+                baseline = json.load(file)
+        result = bench_suite(
+            args.rows,
+            args.stages,
+            args.seed,
+            args.latency,
+            baseline,
+            args.tolerance,
+            args.repeat,
+            args.p99_tolerance,
+        )
+        if args.output is not None:
+            with open(args.output, "w", encoding="utf-8") as file:
+                json.dump(result, file, indent=2)
+    elif args.benchmark == "store":
+        result = bench_store(args.responses, args.batch_size)
+    elif args.benchmark == "encoding":
+        params = {
+            "sentiment": {},
+            "spelling_correction": {},
+            "topics": {"num_topicos": args.num_topicos},
+            "cluster_topics": {"num_topicos": args.num_topicos},
+            "translation": {"lang": args.lang},
+        }
+        if args.task == "multitask":
+            task_params = {"tasks": args.tasks}
+            for task in args.tasks:
+                task_params.update(params[task])
+        else:
+            task_params = params[args.task]
+        result = bench_encoding(args.phrases, args.task, args.batch_size, **task_params)
+
+    print(json.dumps(result, indent=2))
+    if result.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
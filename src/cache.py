@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normaliza un texto para usarlo como parte de la llave del caché:
+    forma unicode NFC, espacios colapsados y sin espacios en los extremos.
+
+    Args:
+        text (str): Texto a normalizar.
+
+    Returns:
+        str: Texto normalizado.
+    """
+    return " ".join(unicodedata.normalize("NFC", str(text)).split())
+
+
+def make_key(model: str, temperature: float, task: str, text: str) -> str:
+    """
+    Calcula la llave de caché de una frase a partir del modelo, la temperatura,
+    la tarea y el texto normalizado.
+
+    Args:
+        model (str): LLM utilizado.
+        temperature (float): Temperatura de la solicitud.
+        task (str): Identificador de la tarea incluyendo sus parámetros.
+        text (str): Texto de la frase.
+
+    Returns:
+        str: Hash sha256 en hexadecimal.
+    """
+    payload = json.dumps(
+        [model, temperature, task, normalize_text(text)], ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+
+    """
+    Caché persistente en disco del resultado de cada frase codificada. Usa
+    SQLite en modo WAL para que varios procesos puedan leer y escribir el
+    mismo archivo, y desaloja las entradas usadas hace más tiempo cuando el
+    tamaño total supera `max_size_bytes`.
+    """
+
+    def __init__(self, path: str, max_size_bytes: int = 512 * 1024 * 1024):
+        """
+        Args:
+            path (str): Ruta al archivo SQLite. Se crea si no existe.
+            max_size_bytes (int): Tamaño máximo de los valores almacenados.
+        """
+        folder_path = os.path.dirname(path)
+        if folder_path and not os.path.exists(folder_path):
+            os.makedirs(folder_path)
+
+        self.path = path
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        connection = self._connection()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """)
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)"
+        )
+        connection.commit()
+        # Tamaño total de los valores, mantenido por triggers para que
+        # `evict` no tenga que sumar la tabla en cada escritura. Los cachés
+        # creados antes de este contador lo inicializan con la suma actual.
+        connection.executescript("""
+            BEGIN IMMEDIATE;
+            CREATE TABLE IF NOT EXISTS totals (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                size INTEGER NOT NULL
+            );
+            CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries
+            BEGIN
+                UPDATE totals SET size = size + NEW.size WHERE id = 0;
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries
+            BEGIN
+                UPDATE totals SET size = size - OLD.size + NEW.size WHERE id = 0;
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries
+            BEGIN
+                UPDATE totals SET size = size - OLD.size WHERE id = 0;
+            END;
+            INSERT OR IGNORE INTO totals
+            SELECT 0, COALESCE(SUM(size), 0) FROM entries;
+            COMMIT;
+            """)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Una conexión por hilo; SQLite serializa las escrituras entre procesos
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=30000")
+            self._local.connection = connection
+        return connection
+
+    def get_many(self, keys: list) -> dict:
+        """
+        Busca varias llaves en el caché y actualiza su último acceso.
+
+        Args:
+            keys (list): Llaves a buscar.
+
+        Returns:
+            dict: Diccionario llave -> valor con las llaves encontradas.
+        """
+        connection = self._connection()
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        # SQLite limita el número de parámetros por consulta
+        for i in range(0, len(unique_keys), 500):
+            chunk = unique_keys[i : (i + 500)]
+            placeholders = ",".join("?" * len(chunk))
+            rows = connection.execute(
+                f"SELECT key, value FROM entries WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            found.update({key: json.loads(value) for key, value in rows})
+
+        if found:
+            now = time.time()
+            with connection:
+                connection.executemany(
+                    "UPDATE entries SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+
+        with self._lock:
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+
+        return found
+
+    def set_many(self, items: dict) -> None:
+        """
+        Guarda varias entradas en el caché y desaloja las más antiguas si se
+        supera el tamaño máximo.
+
+        Args:
+            items (dict): Diccionario llave -> valor serializable en JSON.
+
+        Returns:
+            None.
+        """
+        if not items:
+            return
+
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            value_json = json.dumps(value, ensure_ascii=False)
+            rows.append((key, value_json, len(value_json.encode("utf-8")), now))
+
+        connection = self._connection()
+        with connection:
+            # Un upsert en lugar de INSERT OR REPLACE, cuyo borrado implícito no
+            # dispara el trigger que descuenta el tamaño anterior
+            connection.executemany(
+                "INSERT INTO entries (key, value, size, last_access) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                "value = excluded.value, size = excluded.size, "
+                "last_access = excluded.last_access",
+                rows,
+            )
+        self.evict()
+
+    def size(self) -> int:
+        """
+        Tamaño total de los valores almacenados, sin recorrer la tabla.
+
+        Returns:
+            int: Tamaño en bytes.
+        """
+        return (
+            self._connection()
+            .execute("SELECT size FROM totals WHERE id = 0")
+            .fetchone()[0]
+        )
+
+    def evict(self) -> None:
+        """
+        Elimina las entradas usadas hace más tiempo hasta que el tamaño total
+        quede por debajo de `max_size_bytes`.
+
+        Returns:
+            None.
+        """
+        if self.size() <= self.max_size_bytes:
+            return
+        connection = self._connection()
+        with connection:
+            total_size = self.size()
+            while total_size > self.max_size_bytes:
+                rows = connection.execute(
+                    "SELECT key, size FROM entries ORDER BY last_access LIMIT 1000"
+                ).fetchall()
+                if not rows:
+                    break
+                to_delete = []
+                for key, size in rows:
+                    to_delete.append((key,))
+                    total_size -= size
+                    if total_size <= self.max_size_bytes:
+                        break
+                connection.executemany("DELETE FROM entries WHERE key = ?", to_delete)
+
+    def stats(self) -> dict:
+        """
+        Devuelve los contadores del caché.
+
+        Returns:
+            dict: Aciertos, fallos, número de entradas y tamaño en bytes.
+        """
+        entries = self._connection().execute("SELECT COUNT(*) FROM entries").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries[0],
+            "size_bytes": self.size(),
+        }
+
+    def close(self) -> None:
+        """
+        Cierra la conexión del hilo actual.
+
+        Returns:
+            None.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
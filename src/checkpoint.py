@@ -0,0 +1,107 @@
+import os
+import json
+
+
+class Checkpoint:
+
+    """
+    Archivo JSONL de solo escritura al final donde se guarda cada lote
+    codificado apenas llega su respuesta. Permite reanudar una codificación
+    interrumpida saltando los ids que ya tienen resultado.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Ruta al archivo JSONL. Se crea si no existe.
+        """
+        folder_path = os.path.dirname(path)
+        if folder_path and not os.path.exists(folder_path):
+            os.makedirs(folder_path)
+        self.path = path
+        self._repaired = False
+
+    def __iter__(self):
+        """
+        Recorre los registros del checkpoint sin cargarlos todos en memoria.
+        Una última línea incompleta (por una interrupción durante la escritura)
+        se ignora.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def coded_ids(self) -> set:
+        """
+        Ids que ya tienen resultado en el checkpoint.
+
+        Returns:
+            set: Conjunto de ids como strings.
+        """
+        ids = set()
+        for record in self:
+            ids.update(record["results"].keys())
+        return ids
+
+    def _repair_tail(self, file, chunk_size: int = 1 << 16) -> None:
+        # Una interrupción durante la escritura puede dejar una última línea
+        # sin salto de línea; se recorta para que el siguiente registro no
+        # quede pegado a ella y se pierda al leer
+        end = file.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        file.seek(end - 1)
+        if file.read(1) == b"\n":
+            return
+        position = end
+        while position > 0:
+            start = max(0, position - chunk_size)
+            file.seek(start)
+            newline = file.read(position - start).rfind(b"\n")
+            if newline >= 0:
+                file.truncate(start + newline + 1)
+                return
+            position = start
+        file.truncate(0)
+
+    def append(self, ids_batch: list, response: str, results: dict) -> None:
+        """
+        Agrega un lote al checkpoint y fuerza su escritura a disco. Antes de
+        la primera escritura se recorta una última línea incompleta.
+
+        Args:
+            ids_batch (list): Ids de las frases enviadas en el lote.
+            response (str): Respuesta del modelo.
+            results (dict): Resultados interpretados, id -> valor.
+
+        Returns:
+            None.
+        """
+        record = {
+            "ids": [str(id_i) for id_i in ids_batch],
+            "response": response,
+            "results": results,
+        }
+        with open(self.path, "ab+") as file:
+            if not self._repaired:
+                self._repair_tail(file)
+                self._repaired = True
+            file.seek(0, os.SEEK_END)
+            file.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+            file.flush()
+            os.fsync(file.fileno())
+
+    def iter_responses(self):
+        """
+        Recorre las respuestas guardadas en el checkpoint.
+
+        Returns:
+            Generador de respuestas del modelo.
+        """
+        for record in self:
+            yield record["response"]
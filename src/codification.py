@@ -1,10 +1,164 @@
 import os
 import json
-import pickle
 import time
+import pickle
+import asyncio
+import numpy as np
 import pandas as pd
 import openai
 
+from backends import CompletionBackend, OpenAIBackend
+from cache import make_key
+from checkpoint import Checkpoint
+from dedup import Deduplicator, group_members
+from topics import TopicClusterer
+from sentiment import SentimentClassifier, normalize_label
+from telemetry import Telemetry
+from parsing import extract_entries, responses_to_series
+from compact import compact_system_message, decode_compact, join_compact
+from batching import BatchPlanner
+from batch_jobs import (
+    BATCH_PRICE_FACTOR,
+    TERMINAL_STATUSES,
+    BatchClient,
+    BatchJobState,
+    custom_id,
+    read_output,
+    request_line,
+    write_request_files,
+)
+from concurrency import (
+    RateLimiter,
+    backoff_delay,
+    estimate_tokens,
+    iter_as_completed,
+    run_coroutine,
+)
+from data.utils import (
+    STORAGE_FORMATS,
+    is_response_list,
+    load_object,
+    read_frame,
+    save_object,
+    write_frame,
+)
+
+PROMPTS = {
+    "topics": """
+                Determine máximo {num_topicos} tópicos para \
+                cada una de las frases a continuación: \
+
+                {str_text_batch}
+
+                Cada tópico debe ser de máximo tres palabras.
+                El resultado debe ser un JSON con cada frase y su lista de tópicos.
+
+                """,
+    "sentiment": """
+                Clasifica cada una de las frases a continuación
+                en sentimiento positivo, negativo o neutro. \
+
+                {str_text_batch}
+
+                El resultado debe ser un JSON con cada frase y su sentimiento.
+
+                """,
+    "translation": """
+                Realice la traducción a {lang} de \
+                cada una de las frases a continuación: \
+
+                {str_text_batch}
+
+                El resultado debe ser un JSON con cada frase y su traducción.
+
+                """,
+    "spelling_correction": """
+                Realice la correción ortográfica de \
+                cada una de las frases a continuación: \
+
+                {str_text_batch}
+
+                El resultado debe ser un JSON con cada frase y su corrección ortográfica.
+
+                """,
+    "cluster_topics": """
+                Cada frase a continuación es un grupo de tweets similares \
+                separados por " | ", seguido de sus términos más frecuentes. \
+                Determine máximo {num_topicos} tópicos que describan cada grupo: \
+
+                {str_text_batch}
+
+                Cada tópico debe ser de máximo tres palabras.
+                El resultado debe ser un JSON con cada frase y su lista de tópicos.
+
+                """,
+    "multitask": """
+                Para cada una de las frases a continuación determine: \
+
+                {instructions}
+
+                {str_text_batch}
+
+                El resultado debe ser un JSON con cada frase y un objeto con las llaves {keys}.
+
+                """,
+}
+
+# Errores de la API que se reintentan con espera exponencial
+TRANSIENT_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.APIError,
+    openai.error.Timeout,
+    openai.error.TryAgain,
+    openai.error.ServiceUnavailableError,
+    openai.error.APIConnectionError,
+)
+
+# Errores que hacen fallar un lote sin detener la codificación
+BATCH_ERRORS = TRANSIENT_ERRORS + (openai.error.InvalidRequestError,)
+
+# Llave del JSON e instrucción de cada tarea dentro del prompt multitarea
+MULTITASK_FIELDS = {
+    "sentiment": ("sentimiento", "su sentimiento: positivo, negativo o neutro"),
+    "topics": (
+        "topicos",
+        "una lista de máximo {num_topicos} tópicos de máximo tres palabras",
+    ),
+    "translation": ("traduccion", "su traducción a {lang}"),
+    "spelling_correction": ("correccion", "su corrección ortográfica"),
+}
+
+# Tareas que asignan etiquetas, cuyo resultado se puede extender a las frases
+# casi duplicadas. Las demás devuelven un texto propio de cada frase.
+LABEL_TASKS = {"sentiment", "topics", "cluster_topics"}
+
+
+def valid_multitask_result(result, tasks: list) -> bool:
+    """
+    Indica si el resultado multitarea de una frase tiene la forma esperada:
+    un objeto con una lista de tópicos y un texto no vacío en las demás
+    tareas pedidas.
+
+    Args:
+        result: Valor de la frase en la respuesta del modelo.
+        tasks (list): Tareas pedidas en el prompt.
+
+    Returns:
+        bool: True si el resultado se puede aceptar.
+    """
+    if not isinstance(result, dict):
+        return False
+    for task in tasks:
+        value = result.get(MULTITASK_FIELDS[task][0])
+        if task == "topics":
+            if not isinstance(value, list) or not all(
+                isinstance(topic, str) for topic in value
+            ):
+                return False
+        elif not isinstance(value, str) or not value.strip():
+            return False
+    return True
+
 
 class Codificacion:
 
@@ -12,9 +166,114 @@ class Codificacion:
     Esta clase proporciona un mecanismo de codificación de texto utilizando chatGPT.
     """
 
-    def __init__(self, openai_api_key):
+    def __init__(
+        self,
+        openai_api_key,
+        max_concurrency: int = 1,
+        requests_per_minute: int = None,
+        tokens_per_minute: int = None,
+        api_base: str = None,
+        model: str = "gpt-3.5-turbo",
+        cache=None,
+        context_tokens: int = None,
+        max_retries: int = 5,
+        max_requeue: int = 2,
+        deduplicate: bool = False,
+        dedup_threshold: float = 0.8,
+        telemetry: Telemetry = None,
+        backend: CompletionBackend = None,
+        rate_limiter: RateLimiter = None,
+        compact: bool = False,
+        batch_client: BatchClient = None,
+    ):
+        """
+        Args:
+            openai_api_key (str): Llave de la API de OpenAI.
+            max_concurrency (int): Número máximo de lotes en vuelo al mismo tiempo.
+                Con un valor mayor a 1 los lotes se envían de forma asíncrona.
+            requests_per_minute (int): Presupuesto de solicitudes por minuto.
+                None para no limitar.
+            tokens_per_minute (int): Presupuesto de tokens por minuto. None para
+                no limitar.
+            api_base (str): URL base de la API. Permite apuntar a un servidor
+                compatible distinto al de OpenAI (por ejemplo un mock local).
+            model (str): LLM a utilizar en las tareas de codificación.
+            cache (CompletionCache): Caché persistente por frase. Si se indica,
+                solo se envían al modelo las frases que no están en el caché.
+            context_tokens (int): Ventana de contexto del modelo para planear los
+                lotes. Si no se indica se usa la conocida para `model`.
+            max_retries (int): Reintentos de una solicitud ante errores
+                transitorios de la API, con espera exponencial.
+            max_requeue (int): Rondas en que se vuelven a enviar las frases que
+                faltan en la respuesta de su lote o cuyo lote falló.
+            deduplicate (bool): Si es True, solo se codifica un representante
+                de cada grupo de frases duplicadas o casi duplicadas y su
+                resultado se extiende a las demás frases del grupo.
+            dedup_threshold (float): Similitud de Jaccard mínima para agrupar
+                frases casi duplicadas. None para agrupar solo copias exactas.
+                Solo se usa en las tareas de LABEL_TASKS; las demás agrupan
+                solo copias exactas.
+            telemetry (Telemetry): Registro de métricas por solicitud. Por
+                defecto se crea uno nuevo; sus hooks permiten recibir cada
+                registro apenas se produce.
+            backend (CompletionBackend): Cliente que envía las solicitudes. Por
+                defecto un `OpenAIBackend` con la llave y la URL base de esta
+                instancia; `HTTPBackend` permite controlar el pool de conexiones
+                y los timeouts.
+            rate_limiter (RateLimiter): Limitador a usar en lugar de uno propio
+                con `requests_per_minute` y `tokens_per_minute`, por ejemplo un
+                `SharedRateLimiter` compartido entre procesos.
+            compact (bool): Si es True, las frases se envían con llaves
+                numéricas cortas, las instrucciones van en un mensaje de
+                sistema y el modelo responde una línea "número<TAB>resultado"
+                por frase (con códigos p/n/u para el sentimiento). Los
+                resultados se convierten al mismo formato que el modo normal.
+            batch_client (BatchClient): Cliente de la API de lotes que usa
+                `codificate_batch`. Por defecto uno con la llave y la URL base
+                de esta instancia.
+        """
         self.openai_api_key = openai_api_key
-        openai.api_key = self.openai_api_key
+        self.max_concurrency = max_concurrency
+        self.api_base = api_base
+        self.compact = compact
+        self.rate_limiter = rate_limiter or RateLimiter(
+            requests_per_minute, tokens_per_minute
+        )
+        self.model = model
+        self.temperature = 0
+        self.cache = cache
+        self.batch_planner = BatchPlanner(model, context_tokens, compact=compact)
+        self.lost_ids = []
+        self.max_retries = max_retries
+        self.max_requeue = max_requeue
+        self.deduplicate = deduplicate
+        self.dedup_threshold = dedup_threshold
+        self.telemetry = telemetry or Telemetry()
+        self.backend = backend or OpenAIBackend(openai_api_key, api_base)
+        self.batch_client = batch_client
+        self.retries = 0
+        self.report = {}
+        self.clusters = None
+        self.cluster_topics = None
+
+    def task_dedup_threshold(self, task: str, **params) -> float:
+        """
+        Umbral de casi duplicados de una tarea. Una traducción o corrección
+        (también dentro de la multitarea) es propia de cada frase, por lo que
+        en esas tareas solo se agrupan copias exactas.
+
+        Args:
+            task (str): Nombre de la tarea.
+            **params: Parámetros de la tarea (tasks en la multitarea).
+
+        Returns:
+            float: `dedup_threshold` si todas las tareas son de LABEL_TASKS,
+            None si no.
+        """
+        tasks = (params.get("tasks") or []) if task == "multitask" else [task]
+        if all(t in LABEL_TASKS for t in tasks):
+            return self.dedup_threshold
+        return None
 
     def join_text_batch(self, text_batch: list, ids: list) -> str:
         """
@@ -45,28 +304,66 @@ class Codificacion:
         """
         return list(map(lambda x: x.replace("Frase", ""), list(dictionary_keys)))
 
-    def from_json_list_to_df(self, json_list: dict) -> pd.Series:
+    def from_json_list_to_df(
+        self, json_list: list, expected_ids: list = None
+    ) -> pd.Series:
         """
-        Convierte una lista de cadenas JSON en una serie de pandas.
+        Convierte una lista de cadenas JSON en una serie de pandas. Las
+        respuestas con bloques de código, texto adicional o entradas dañadas no
+        detienen la conversión: se recuperan todas las entradas "FraseN"
+        válidas.
 
         Args:
-            json_list (dict): Lista de cadenas JSON.
+            json_list (list): Lista de cadenas JSON.
+            expected_ids (list): Lista paralela con los ids enviados en cada
+                lote. Si se indica, los ids que no se pudieron recuperar quedan
+                en `self.lost_ids` para volver a encolarlos.
 
         Returns:
             pd.Series: Serie de pandas que contiene los datos convertidos.
         """
-        new_dict = {}
-        for json_str in json_list:
-            dict_i = json.loads("".join(json_str.splitlines()))
-            new_keys = self.replace_keys_values(dict_i.keys())
-            new_dict_i = {
-                new_key: value for new_key, value in zip(new_keys, dict_i.values())
-            }
-            new_dict.update(new_dict_i)
+        series, self.lost_ids = responses_to_series(json_list, expected_ids)
+        if self.lost_ids:
+            print(f"Frases sin resultado en la respuesta: {len(self.lost_ids)}")
+
+        return series
 
-        return pd.Series(new_dict)
+    def parse_response(self, json_str: str) -> dict:
+        """
+        Convierte una respuesta del modelo en un diccionario id -> valor,
+        recuperando las entradas válidas aunque la respuesta esté dañada.
+
+        Args:
+            json_str (str): Respuesta del modelo.
+
+        Returns:
+            dict: Diccionario con el id de cada frase (sin "Frase") y su valor.
+        """
+        return extract_entries(json_str)
+
+    def messages(self, prompt: str, system: str = None) -> list:
+        """
+        Mensajes de una solicitud de chat.
+
+        Args:
+            prompt (str): Prompt del usuario.
+            system (str): Mensaje de sistema opcional.
+
+        Returns:
+            list: Lista de mensajes.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        if system is not None:
+            messages.insert(0, {"role": "system", "content": system})
+        return messages
 
-    def get_completion(self, prompt: str, model: str = "gpt-3.5-turbo") -> str:
+    def get_completion(
+        self,
+        prompt: str,
+        model: str = "gpt-3.5-turbo",
+        batch_size: int = None,
+        system: str = None,
+    ) -> str:
         """
         Llama al modelo deseado e interactua con él dependiendo
         el prompt.
@@ -74,110 +371,1014 @@ class Codificacion:
         Args:
             prompt (str): Instrucciones que se le dan al modelo.
             model (str): LLM a utilizar.
+            batch_size (int): Frases incluidas en el prompt, para la telemetría.
+            system (str): Mensaje de sistema a enviar antes del prompt.
 
         Returns:
             str: Respuesta del modelo a la solicitud del usuario.
         """
-        messages = [{"role": "user", "content": prompt}]
-        response = openai.ChatCompletion.create(
+        messages = self.messages(prompt, system)
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        start, retries = time.perf_counter(), 0
+        try:
+            for attempt in range(self.max_retries + 1):
+                self.rate_limiter.acquire(prompt_tokens)
+                request_start = time.perf_counter()
+                try:
+                    response = self.backend.complete(
+                        messages,
+                        model,
+                        # this is the degree of randomness of the model's output
+                        self.temperature,
+                    )
+                    break
+                except TRANSIENT_ERRORS as e:
+                    if attempt == self.max_retries:
+                        raise
+                    self.retries += 1
+                    retries += 1
+                    delay = backoff_delay(attempt)
+                    print(f"{type(e).__name__}: reintento en {delay:.1f} s")
+                    time.sleep(delay)
+        except Exception as e:
+            self.record_request(model, batch_size, start, None, retries, None, e)
+            raise
+        usage = response.get("usage", {})
+        self.record_request(model, batch_size, start, request_start, retries, usage)
+        self.rate_limiter.record(usage.get("completion_tokens", 0))
+        return response["choices"][0]["message"]["content"]
+
+    async def aget_completion(
+        self,
+        prompt: str,
+        model: str = "gpt-3.5-turbo",
+        batch_size: int = None,
+        system: str = None,
+    ) -> str:
+        """
+        Versión asíncrona de `get_completion`.
+
+        Args:
+            prompt (str): Instrucciones que se le dan al modelo.
+            model (str): LLM a utilizar.
+            batch_size (int): Frases incluidas en el prompt, para la telemetría.
+            system (str): Mensaje de sistema a enviar antes del prompt.
+
+        Returns:
+            str: Respuesta del modelo a la solicitud del usuario.
+        """
+        messages = self.messages(prompt, system)
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        start, retries = time.perf_counter(), 0
+        try:
+            for attempt in range(self.max_retries + 1):
+                await self.rate_limiter.aacquire(prompt_tokens)
+                request_start = time.perf_counter()
+                try:
+                    response = await self.backend.acomplete(
+                        messages, model, self.temperature
+                    )
+                    break
+                except TRANSIENT_ERRORS as e:
+                    if attempt == self.max_retries:
+                        raise
+                    self.retries += 1
+                    retries += 1
+                    delay = backoff_delay(attempt)
+                    print(f"{type(e).__name__}: reintento en {delay:.1f} s")
+                    await asyncio.sleep(delay)
+        except Exception as e:
+            self.record_request(model, batch_size, start, None, retries, None, e)
+            raise
+        usage = response.get("usage", {})
+        self.record_request(model, batch_size, start, request_start, retries, usage)
+        self.rate_limiter.record(usage.get("completion_tokens", 0))
+        return response["choices"][0]["message"]["content"]
+
+    def record_request(
+        self,
+        model: str,
+        batch_size: int,
+        start: float,
+        request_start: float,
+        retries: int,
+        usage: dict = None,
+        error: Exception = None,
+    ) -> None:
+        """
+        Registra una solicitud en la telemetría.
+
+        Args:
+            model (str): LLM utilizado.
+            batch_size (int): Frases incluidas en el prompt.
+            start (float): Inicio de la llamada (`time.perf_counter`).
+            request_start (float): Inicio del intento que tuvo éxito. None si falló.
+            retries (int): Reintentos de la llamada.
+            usage (dict): Campo `usage` de la respuesta.
+            error (Exception): Error que hizo fallar la llamada.
+
+        Returns:
+            None.
+        """
+        end = time.perf_counter()
+        self.telemetry.record_request(
             model=model,
-            messages=messages,
-            temperature=0,  # this is the degree of randomness of the model's output
+            batch_size=batch_size,
+            latency=None if request_start is None else end - request_start,
+            elapsed=end - start,
+            retries=retries,
+            usage=usage,
+            error=None if error is None else type(error).__name__,
         )
-        return response.choices[0].message["content"]
 
-    def get_topics(
+    def build_prompt(self, task: str, str_text_batch: str, **params) -> str:
+        """
+        Construye el prompt de una tarea para un lote de frases.
+
+        Args:
+            task (str): Nombre de la tarea (una de las llaves de PROMPTS).
+            str_text_batch (str): Lote de frases resultado de `join_text_batch`.
+            **params: Parámetros adicionales de la plantilla (num_topicos, lang).
+
+        Returns:
+            str: Prompt resultante. En modo compacto, solo las frases; las
+            instrucciones van en `system_message`.
+        """
+        if self.compact:
+            return str_text_batch
+        if task == "multitask":
+            tasks = params["tasks"]
+            params = dict(
+                instructions="\n".join(
+                    f'- "{MULTITASK_FIELDS[t][0]}": '
+                    + MULTITASK_FIELDS[t][1].format(**params)
+                    for t in tasks
+                ),
+                keys=", ".join(f'"{MULTITASK_FIELDS[t][0]}"' for t in tasks),
+            )
+
+        return PROMPTS[task].format(str_text_batch=str_text_batch, **params)
+
+    def system_message(self, task: str, **params) -> str:
+        """
+        Mensaje de sistema de una tarea, compartido por todos sus lotes. Solo
+        se usa en modo compacto.
+
+        Args:
+            task (str): Nombre de la tarea.
+            **params: Parámetros adicionales de la tarea (num_topicos, lang, tasks).
+
+        Returns:
+            str: Mensaje de sistema, o None fuera del modo compacto.
+        """
+        if not self.compact:
+            return None
+        return compact_system_message(task, **params)
+
+    def batch_prompt(self, task: str, ids_batch: list, text_batch: list, **params):
+        """
+        Prompt de un lote de frases en el formato de la instancia.
+
+        Args:
+            task (str): Nombre de la tarea.
+            ids_batch (list): Ids de las frases del lote.
+            text_batch (list): Textos de las frases del lote.
+            **params: Parámetros adicionales del prompt.
+
+        Returns:
+            str: Prompt del lote.
+        """
+        if self.compact:
+            return join_compact(text_batch)
+        return self.build_prompt(
+            task, self.join_text_batch(text_batch, ids_batch), **params
+        )
+
+    def decode_response(
+        self, task: str, response: str, ids_batch: list, **params
+    ) -> dict:
+        """
+        Resultados id -> valor de la respuesta a un lote, en el formato del
+        modo normal sin importar el formato de la instancia. En la tarea
+        multitarea se descartan los resultados que no tienen la forma de
+        `valid_multitask_result`, de modo que esas frases cuentan como
+        faltantes y se vuelven a encolar.
+
+        Args:
+            task (str): Nombre de la tarea.
+            response (str): Respuesta del modelo.
+            ids_batch (list): Ids de las frases del lote, en el orden enviado.
+            **params: Parámetros adicionales del prompt.
+
+        Returns:
+            dict: Diccionario con el id de cada frase y su valor.
+        """
+        if not self.compact:
+            results = self.parse_response(response)
+            if task == "multitask":
+                results = {
+                    id_i: value
+                    for id_i, value in results.items()
+                    if valid_multitask_result(value, params["tasks"])
+                }
+            return results
+        tasks = params.get("tasks")
+        fields = [MULTITASK_FIELDS[t][0] for t in tasks] if tasks else None
+        return decode_compact(task, response, ids_batch, tasks, fields)
+
+    def run_prompts(
+        self,
+        prompts: list,
+        offset: int = 0,
+        batch_sizes: list = None,
+        system: str = None,
+    ) -> list:
+        """
+        Envía una lista de prompts al modelo y devuelve las respuestas en el
+        mismo orden. Si `max_concurrency` es mayor a 1 mantiene hasta ese
+        número de solicitudes en vuelo; en ambos casos respeta los
+        presupuestos de solicitudes y tokens por minuto.
+
+        Args:
+            prompts (list): Lista de prompts.
+            offset (int): Número del primer prompt, usado para reportar el avance.
+            batch_sizes (list): Frases de cada prompt, para la telemetría.
+            system (str): Mensaje de sistema común a todos los prompts.
+
+        Returns:
+            list: Lista de respuestas del modelo, con None en los prompts cuya
+            solicitud falló después de los reintentos.
+        """
+        if self.max_concurrency > 1:
+            return run_coroutine(
+                self.arun_prompts(prompts, offset, batch_sizes, system)
+            )
+
+        batch_sizes = batch_sizes or [None] * len(prompts)
+        response = []
+        for n, (prompt, size) in enumerate(zip(prompts, batch_sizes), offset):
+            try:
+                response.append(self.get_completion(prompt, self.model, size, system))
+            except BATCH_ERRORS as e:
+                print(f"Falló el lote {n}: {e}")
+                response.append(None)
+            if n % 100 == 0:
+                print("Iteración:", n)
+
+        return response
+
+    async def arun_prompts(
         self,
+        prompts: list,
+        offset: int = 0,
+        batch_sizes: list = None,
+        system: str = None,
+    ) -> list:
+        """
+        Versión asíncrona de `run_prompts`. Mantiene hasta `max_concurrency`
+        solicitudes en vuelo y devuelve las respuestas en el orden de los prompts.
+
+        Args:
+            prompts (list): Lista de prompts.
+            offset (int): Número del primer prompt, usado para reportar el avance.
+            batch_sizes (list): Frases de cada prompt, para la telemetría.
+            system (str): Mensaje de sistema común a todos los prompts.
+
+        Returns:
+            list: Lista de respuestas del modelo.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        batch_sizes = batch_sizes or [None] * len(prompts)
+
+        async def run(n, prompt, size):
+            async with semaphore:
+                try:
+                    response_n = await self.aget_completion(
+                        prompt, self.model, size, system
+                    )
+                except BATCH_ERRORS as e:
+                    print(f"Falló el lote {n}: {e}")
+                    response_n = None
+            if n % 100 == 0:
+                print("Iteración:", n)
+            return response_n
+
+        return await asyncio.gather(
+            *[
+                run(n, prompt, size)
+                for n, (prompt, size) in enumerate(zip(prompts, batch_sizes), offset)
+            ]
+        )
+
+    def iter_completions(self, items, system: str = None):
+        """
+        Envía los prompts de un iterable perezoso y entrega cada respuesta
+        apenas llega. Si `max_concurrency` es mayor a 1, toda la iteración usa
+        un único event loop con hasta ese número de solicitudes en vuelo, y el
+        siguiente prompt se toma del iterable cuando termina una solicitud.
+
+        Args:
+            items: Iterable de tuplas (item, prompt, batch_size), donde item es
+                cualquier valor que se devuelve junto a la respuesta.
+            system (str): Mensaje de sistema común a todos los prompts.
+
+        Returns:
+            Generador de pares (item, respuesta) en el orden en que llegan las
+            respuestas, con None como respuesta si la solicitud falló después
+            de los reintentos.
+        """
+        if self.max_concurrency <= 1:
+            for n, (item, prompt, size) in enumerate(items):
+                try:
+                    response = self.get_completion(prompt, self.model, size, system)
+                except BATCH_ERRORS as e:
+                    print(f"Falló el lote {n}: {e}")
+                    response = None
+                if n % 100 == 0:
+                    print("Iteración:", n)
+                yield item, response
+            return
+
+        pending = {}
+
+        async def run(n, prompt, size):
+            try:
+                return await self.aget_completion(prompt, self.model, size, system)
+            except BATCH_ERRORS as e:
+                print(f"Falló el lote {n}: {e}")
+                return None
+
+        def coroutines():
+            for n, (item, prompt, size) in enumerate(items):
+                pending[n] = item
+                yield run(n, prompt, size)
+
+        for n, response in iter_as_completed(coroutines(), self.max_concurrency):
+            if n % 100 == 0:
+                print("Iteración:", n)
+            yield pending.pop(n), response
+
+    def codificate(
+        self,
+        task: str,
         df_to_codificate: pd.DataFrame,
         batch_size: int,
         column_name: str,
         id_column: str,
-        num_topicos: int,
+        checkpoint_path: str = None,
+        **params,
     ) -> list:
         """
-        Obtiene los tópicos para cada frase en un DataFrame, utilizando un modelo de generación
-        de lenguaje.
+        Divide el DataFrame en lotes, construye el prompt de la tarea para cada
+        lote y obtiene las respuestas del modelo.
 
         Args:
+            task (str): Nombre de la tarea (una de las llaves de PROMPTS).
             df_to_codificate (pd.DataFrame): DataFrame que contiene las frases.
-            batch_size (int): Tamaño del lote de frases a procesar en cada iteración.
+            batch_size (int): Número máximo de frases por lote. None para agrupar
+                solo por el presupuesto de tokens del modelo.
             column_name (str): Nombre de la columna que contiene las frases.
             id_column (str): Nombre de la columna que contiene los identificadores de las frases.
-            num_topicos (int): Número máximo de tópicos a determinar para cada frase.
+            checkpoint_path (str): Archivo JSONL donde se guarda cada lote al
+                llegar su respuesta. Si ya existe, se saltan los ids codificados
+                y se devuelven también las respuestas guardadas.
+            **params: Parámetros adicionales del prompt.
 
         Returns:
-            list: Lista de respuestas en formato JSON que contiene cada frase y su lista de tópicos.
+            list: Lista de respuestas en formato JSON, una por lote. Con
+            `checkpoint_path` se leen del checkpoint al terminar; para
+            corpus grandes conviene recorrer `codificate_stream`, que no
+            acumula las respuestas en memoria.
         """
-        response = []
-        for i in range(0, len(df_to_codificate), batch_size):
-            text_batch = df_to_codificate[i : (i + batch_size)][column_name].tolist()
-            ids_batch = df_to_codificate[i : (i + batch_size)][id_column].tolist()
-            str_text_batch = self.join_text_batch(text_batch, ids_batch)
-
-            prompt = f"""
-                Determine máximo {num_topicos} tópicos para \
-                cada una de las frases a continuación: \
+        stream = self.codificate_stream(
+            task,
+            df_to_codificate,
+            batch_size,
+            column_name,
+            id_column,
+            checkpoint_path,
+            **params,
+        )
+        if checkpoint_path is None:
+            return [item["response"] for item in stream]
 
-                {str_text_batch}
+        # Las respuestas ya quedan en el checkpoint: no se guardan dos veces
+        for _ in stream:
+            pass
+        return list(Checkpoint(checkpoint_path).iter_responses())
 
-                Cada tópico debe ser de máximo tres palabras.
-                El resultado debe ser un JSON con cada frase y su lista de tópicos.
+    def codificate_stream(
+        self,
+        task: str,
+        df_to_codificate: pd.DataFrame,
+        batch_size: int,
+        column_name: str,
+        id_column: str,
+        checkpoint_path: str = None,
+        **params,
+    ):
+        """
+        Versión en streaming de `codificate`: entrega el resultado de cada lote
+        apenas llega y, si se indica `checkpoint_path`, lo agrega al checkpoint
+        antes de continuar. Al reanudar se saltan los ids que ya tienen
+        resultado en el checkpoint, de modo que una interrupción solo cuesta
+        los lotes en vuelo.
 
-                """
+        Si la instancia tiene caché, las frases encontradas en él se entregan
+        primero sin llamar al modelo, cada texto distinto se envía una sola vez
+        y las frases repetidas se entregan al final.
 
-            response_i = self.get_completion(prompt)
-            response.append(response_i)
+        Con `deduplicate` solo se envía el representante de cada grupo de
+        frases duplicadas o casi duplicadas, y cada resultado se entrega
+        también para las demás frases de su grupo.
 
-            if i % 100 == 0:
-                print("Iteración:", i)
-                time.sleep(10)
+        Args:
+            task (str): Nombre de la tarea (una de las llaves de PROMPTS).
+            df_to_codificate (pd.DataFrame): DataFrame que contiene las frases.
+            batch_size (int): Número máximo de frases por lote. None para agrupar
+                solo por el presupuesto de tokens del modelo.
+            column_name (str): Nombre de la columna que contiene las frases.
+            id_column (str): Nombre de la columna que contiene los identificadores de las frases.
+            checkpoint_path (str): Archivo JSONL del checkpoint.
+            **params: Parámetros adicionales del prompt.
 
-        return response
+        Returns:
+            Generador de diccionarios con las llaves "ids", "response" y "results".
+        """
+        checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+        self.telemetry.start_run(task)
+        ids = df_to_codificate[id_column].tolist()
+        texts = df_to_codificate[column_name].tolist()
+        all_ids = [str(id_i) for id_i in ids]
+        coded = set()
+        retries_start = self.retries
+        requests, requeued = 0, 0
+
+        if checkpoint is not None:
+            done = checkpoint.coded_ids()
+            coded.update(id_i for id_i in all_ids if id_i in done)
+            pending = [
+                (id_i, text) for id_i, text in zip(ids, texts) if str(id_i) not in done
+            ]
+            print(f"Frases ya codificadas en el checkpoint: {len(ids) - len(pending)}")
+            ids = [id_i for id_i, _ in pending]
+            texts = [text for _, text in pending]
+
+        members, dedup_report = {}, None
+        if self.deduplicate:
+            deduplicator = Deduplicator(self.task_dedup_threshold(task, **params))
+            representatives = deduplicator.assign(ids, texts)
+            members = group_members(ids, representatives)
+            pending = [
+                (id_i, text)
+                for id_i, text, representative in zip(ids, texts, representatives)
+                if id_i == representative
+            ]
+            ids = [id_i for id_i, _ in pending]
+            texts = [text for _, text in pending]
+            dedup_report = deduplicator.report()
+            print(
+                f"Frases únicas: {dedup_report['unique']} de {dedup_report['phrases']} "
+                f"({dedup_report['exact_duplicates']} copias exactas, "
+                f"{dedup_report['near_duplicates']} casi duplicadas)"
+            )
+
+        def emit(ids_batch, response_i, results):
+            if checkpoint is not None:
+                checkpoint.append(ids_batch, response_i, results)
+            coded.update(results)
+            yield {"ids": ids_batch, "response": response_i, "results": results}
+
+            # El resultado de cada representante se extiende a su grupo
+            fanned = {
+                member: value
+                for id_i, value in results.items()
+                for member in members.get(id_i, ())
+            }
+            if fanned:
+                yield from emit(list(fanned), self.dump_results(fanned), fanned)
+
+        keys, cached = None, {}
+        send_ids, send_texts = ids, texts
+        if self.cache is not None:
+            task_key = self.task_key(task, **params)
+            keys = [
+                make_key(self.model, self.temperature, task_key, text) for text in texts
+            ]
+            cached = self.cache.get_many(keys)
+            found = sum(1 for key in keys if key in cached)
+            self.telemetry.record_cache(found, len(keys) - found)
+            hits = {
+                str(id_i): cached[key] for id_i, key in zip(ids, keys) if key in cached
+            }
+            if hits:
+                yield from emit(list(hits), self.dump_results(hits), hits)
+
+            # Solo se envía la primera frase de cada llave que no está en caché
+            first = {}
+            for id_i, text, key in zip(ids, texts, keys):
+                if key not in cached and key not in first:
+                    first[key] = (id_i, text)
+            send_ids = [id_i for id_i, _ in first.values()]
+            send_texts = [text for _, text in first.values()]
+            key_by_id = {str(id_i): key for key, (id_i, _) in first.items()}
+
+        # Las frases que faltan en la respuesta de su lote, o cuyo lote falló,
+        # se vuelven a encolar en lotes posteriores
+        pending = list(zip(send_ids, send_texts))
+        system = self.system_message(task, **params)
+        for round_i in range(self.max_requeue + 1):
+            if round_i > 0:
+                print(f"Reencolando {len(pending)} frases sin resultado")
+                requeued += len(pending)
+            batches = self.plan_batches(
+                task,
+                [id_i for id_i, _ in pending],
+                [text for _, text in pending],
+                batch_size,
+                **params,
+            )
+            pending = []
+
+            # Los prompts se construyen a medida que se envían y cada lote se
+            # entrega apenas llega su respuesta, sin esperar a los demás
+            prompts = (
+                (
+                    (ids_batch, text_batch),
+                    self.batch_prompt(task, ids_batch, text_batch, **params),
+                    len(ids_batch),
+                )
+                for ids_batch, text_batch in batches
+            )
+            for (ids_batch, text_batch), response_i in self.iter_completions(
+                prompts, system
+            ):
+                requests += 1
+                results = self.decode_response(task, response_i, ids_batch, **params)
+                if self.compact and response_i is not None:
+                    # El checkpoint guarda los resultados en el formato normal
+                    # para que `from_json_list_to_df` los lea igual
+                    response_i = self.dump_results(results)
+                pending.extend(
+                    (id_i, text)
+                    for id_i, text in zip(ids_batch, text_batch)
+                    if str(id_i) not in results
+                )
+                if response_i is None:
+                    continue
+                if self.cache is not None:
+                    new_entries = {
+                        key_by_id[id_i]: value
+                        for id_i, value in results.items()
+                        if id_i in key_by_id
+                    }
+                    self.cache.set_many(new_entries)
+                    cached.update(new_entries)
+                yield from emit(ids_batch, response_i, results)
+
+            if not pending:
+                break
+
+        if self.cache is not None:
+            sent_ids = {str(id_i) for id_i in send_ids}
+            repeated = {
+                str(id_i): cached[key]
+                for id_i, key in zip(ids, keys)
+                if str(id_i) not in sent_ids and key in cached and str(id_i) not in hits
+            }
+            if repeated:
+                yield from emit(list(repeated), self.dump_results(repeated), repeated)
+
+            stats = self.cache.stats()
+            print(f"Caché: {stats['hits']} aciertos, {stats['misses']} fallos")
+
+        failed_ids = [id_i for id_i in all_ids if id_i not in coded]
+        self.report = {
+            "phrases": len(all_ids),
+            "coded": len(all_ids) - len(failed_ids),
+            "coverage": (len(all_ids) - len(failed_ids)) / max(1, len(all_ids)),
+            "requests": requests,
+            "retries": self.retries - retries_start,
+            "requeued": requeued,
+            "failed_ids": failed_ids,
+        }
+        if dedup_report is not None:
+            self.report["unique"] = dedup_report["unique"]
+        print(
+            f"Cobertura: {self.report['coverage']:.2%} "
+            f"({self.report['coded']} de {self.report['phrases']} frases), "
+            f"reintentos: {self.report['retries']}, "
+            f"reencoladas: {requeued}, fallidas: {len(failed_ids)}"
+        )
+        self.report["telemetry"] = self.telemetry.print_summary()
 
-    def get_sentiment(
+    def codificate_batch(
         self,
+        task: str,
         df_to_codificate: pd.DataFrame,
         batch_size: int,
         column_name: str,
         id_column: str,
+        job_dir: str,
+        poll_interval: float = 60.0,
+        wait: bool = True,
+        **params,
     ) -> list:
         """
-        Obtiene el sentimiento para cada frase en un DataFrame, utilizando un modelo de
-        generación de lenguaje.
+        Codifica las frases con la API de lotes, para backfills grandes donde
+        la latencia no importa: los lotes de frases se escriben como
+        solicitudes en archivos JSONL (con un `custom_id` derivado de los ids
+        de cada lote), se envían como trabajos, se consultan cada
+        `poll_interval` segundos y sus resultados se interpretan igual que las
+        respuestas de `codificate` y se guardan en el checkpoint
+        "{job_dir}/{task}.jsonl".
+
+        El estado de los trabajos de cada tarea queda en
+        "{job_dir}/{task}.state.json": con
+        `wait=False` cada llamada solo envía o consulta los trabajos e ingiere
+        los terminados, de modo que ningún proceso queda esperando y la misma
+        llamada puede repetirse más tarde (por ejemplo desde un cron). Las
+        frases sin resultado se reenvían en un nuevo trabajo, hasta
+        `max_requeue` veces. No se usa el caché ni el limitador de tasa.
 
         Args:
+            task (str): Nombre de la tarea (una de las llaves de PROMPTS).
             df_to_codificate (pd.DataFrame): DataFrame que contiene las frases.
-            batch_size (int): Tamaño del lote de frases a procesar en cada iteración.
+            batch_size (int): Número máximo de frases por lote. None para agrupar
+                solo por el presupuesto de tokens del modelo.
             column_name (str): Nombre de la columna que contiene las frases.
             id_column (str): Nombre de la columna que contiene los identificadores de las frases.
+            job_dir (str): Directorio de los archivos de solicitudes y
+                resultados, del estado y del checkpoint.
+            poll_interval (float): Segundos entre consultas de los trabajos.
+            wait (bool): Si es True, espera hasta que terminen todos los
+                trabajos y rondas de reenvío.
+            **params: Parámetros adicionales del prompt.
 
         Returns:
-            list: Lista de respuestas en formato JSON que contiene cada frase y su sentimiento.
+            list: Respuestas guardadas en el checkpoint, como las de
+            `codificate`. Con `wait=False` pueden faltar los lotes de los
+            trabajos en curso, que quedan en `self.report["active_batches"]`.
         """
-        response = []
-        for i in range(0, len(df_to_codificate), batch_size):
-            text_batch = df_to_codificate[i : (i + batch_size)][column_name].tolist()
-            ids_batch = df_to_codificate[i : (i + batch_size)][id_column].tolist()
-            str_text_batch = self.join_text_batch(text_batch, ids_batch)
+        if self.batch_client is None:
+            self.batch_client = BatchClient(
+                self.openai_api_key, self.api_base or "https://api.openai.com/v1"
+            )
+        state = BatchJobState(job_dir, task)
+        checkpoint = Checkpoint(os.path.join(job_dir, f"{task}.jsonl"))
+        self.telemetry.start_run(task)
+        ids = df_to_codificate[id_column].tolist()
+        texts = df_to_codificate[column_name].tolist()
+        all_ids = [str(id_i) for id_i in ids]
+        requeued = 0
+
+        while True:
+            for job in state.active():
+                self.ingest_batch_job(task, job, state, checkpoint, job_dir, **params)
+
+            if not state.active():
+                done = checkpoint.coded_ids()
+                pending = [
+                    (id_i, text)
+                    for id_i, text in zip(ids, texts)
+                    if str(id_i) not in done
+                ]
+                if not pending or state.round > self.max_requeue:
+                    break
+                if state.round > 0:
+                    print(f"Reencolando {len(pending)} frases sin resultado")
+                    requeued += len(pending)
+                self.submit_batch_jobs(
+                    task, pending, batch_size, state, job_dir, **params
+                )
+
+            if not wait:
+                break
+            time.sleep(poll_interval)
+
+        done = checkpoint.coded_ids()
+        failed_ids = [id_i for id_i in all_ids if id_i not in done]
+        active = [job["batch_id"] for job in state.active()]
+        self.report = {
+            "phrases": len(all_ids),
+            "coded": len(all_ids) - len(failed_ids),
+            "coverage": (len(all_ids) - len(failed_ids)) / max(1, len(all_ids)),
+            "batches": len(state.jobs),
+            "active_batches": active,
+            "rounds": state.round,
+            "requeued": requeued,
+            "failed_ids": failed_ids,
+        }
+        print(
+            f"Cobertura: {self.report['coverage']:.2%} "
+            f"({self.report['coded']} de {self.report['phrases']} frases), "
+            f"trabajos en curso: {len(active)} de {len(state.jobs)}"
+        )
+        self.report["telemetry"] = self.telemetry.print_summary()
 
-            prompt = f"""
-                Clasifica cada una de las frases a continuación
-                en sentimiento positivo, negativo o neutro. \
+        return list(checkpoint.iter_responses())
 
-                {str_text_batch}
+    def submit_batch_jobs(
+        self,
+        task: str,
+        pending: list,
+        batch_size: int,
+        state: BatchJobState,
+        job_dir: str,
+        **params,
+    ) -> None:
+        """
+        Escribe las solicitudes de una ronda de `codificate_batch` y las envía
+        como uno o más trabajos, según los límites de cada archivo.
 
-                El resultado debe ser un JSON con cada frase y su sentimiento.
+        Args:
+            task (str): Nombre de la tarea.
+            pending (list): Tuplas (id, texto) de las frases a enviar.
+            batch_size (int): Número máximo de frases por lote.
+            state (BatchJobState): Estado de los trabajos.
+            job_dir (str): Directorio de los archivos de solicitudes.
+            **params: Parámetros adicionales del prompt.
+
+        Returns:
+            None.
+        """
+        ids = [id_i for id_i, _ in pending]
+        texts = [text for _, text in pending]
+        members = {}
+        if self.deduplicate:
+            deduplicator = Deduplicator(self.task_dedup_threshold(task, **params))
+            representatives = deduplicator.assign(ids, texts)
+            members = group_members(ids, representatives)
+            pending = [
+                (id_i, text)
+                for id_i, text, representative in zip(ids, texts, representatives)
+                if id_i == representative
+            ]
+            ids = [id_i for id_i, _ in pending]
+            texts = [text for _, text in pending]
+
+        batches = self.plan_batches(task, ids, texts, batch_size, **params)
+        system = self.system_message(task, **params)
+        state.write_index(
+            (
+                custom_id(task, ids_batch, state.round),
+                [str(id_i) for id_i in ids_batch],
+                {
+                    str(id_i): members[str(id_i)]
+                    for id_i in ids_batch
+                    if str(id_i) in members
+                },
+            )
+            for ids_batch, _ in batches
+        )
 
-                """
+        def lines():
+            for ids_batch, text_batch in batches:
+                key = custom_id(task, ids_batch, state.round)
+                prompt = self.batch_prompt(task, ids_batch, text_batch, **params)
+                yield request_line(
+                    key,
+                    {
+                        "model": self.model,
+                        "messages": self.messages(prompt, system),
+                        "temperature": self.temperature,
+                    },
+                )
+
+        paths = write_request_files(
+            os.path.join(job_dir, f"{task}_requests_{state.round}"), lines()
+        )
+        for path in paths:
+            file_id = self.batch_client.upload_file(path)
+            batch = self.batch_client.create_batch(
+                file_id, {"task": task, "round": str(state.round)}
+            )
+            state.jobs.append(
+                {
+                    "batch_id": batch["id"],
+                    "input_file": path,
+                    "input_file_id": file_id,
+                    "round": state.round,
+                    "status": batch["status"],
+                    "ingested": False,
+                }
+            )
+            state.save()
+            print(f"Trabajo enviado: {batch['id']} ({path})")
+        state.round += 1
+        state.save()
+
+    def ingest_batch_job(
+        self,
+        task: str,
+        job: dict,
+        state: BatchJobState,
+        checkpoint: Checkpoint,
+        job_dir: str,
+        **params,
+    ) -> bool:
+        """
+        Consulta un trabajo y, si terminó, descarga sus archivos de salida y de
+        errores y agrega al checkpoint los resultados de cada solicitud. Los
+        trabajos vencidos o cancelados también se ingieren con los resultados
+        que alcanzaron a producir.
 
-            response_i = self.get_completion(prompt)
-            response.append(response_i)
+        Args:
+            task (str): Nombre de la tarea.
+            job (dict): Trabajo del estado.
+            state (BatchJobState): Estado de los trabajos.
+            checkpoint (Checkpoint): Checkpoint de la codificación.
+            job_dir (str): Directorio donde se descargan los archivos.
+            **params: Parámetros adicionales del prompt.
+
+        Returns:
+            bool: True si el trabajo terminó y se ingirió.
+        """
+        batch = self.batch_client.retrieve_batch(job["batch_id"])
+        job["status"] = batch["status"]
+        if batch["status"] not in TERMINAL_STATUSES:
+            counts = batch.get("request_counts") or {}
+            print(
+                f"Trabajo {job['batch_id']}: {batch['status']} "
+                f"({counts.get('completed', 0)} de {counts.get('total', '?')})"
+            )
+            return False
+
+        for key in ("output_file_id", "error_file_id"):
+            if not batch.get(key):
+                continue
+            path = self.batch_client.download_file(
+                batch[key], os.path.join(job_dir, f"{batch[key]}.jsonl")
+            )
+            for request_id, body, error in read_output(path):
+                ids_batch, members = state.request(job["round"], request_id)
+                if body is None:
+                    print(f"Falló el lote {request_id}: {error}")
+                    self.telemetry.record_request(
+                        self.model, len(ids_batch), None, None, 0, error="BatchError"
+                    )
+                    continue
+                response_i = body["choices"][0]["message"]["content"]
+                self.telemetry.record_request(
+                    self.model,
+                    len(ids_batch),
+                    None,
+                    None,
+                    0,
+                    body.get("usage"),
+                    price_factor=BATCH_PRICE_FACTOR,
+                )
+                results = self.decode_response(task, response_i, ids_batch, **params)
+                if self.compact:
+                    response_i = self.dump_results(results)
+                checkpoint.append(ids_batch, response_i, results)
+
+                # El resultado de cada representante se extiende a su grupo
+                fanned = {
+                    member: value
+                    for id_i, value in results.items()
+                    for member in members.get(id_i, ())
+                }
+                if fanned:
+                    checkpoint.append(list(fanned), self.dump_results(fanned), fanned)
+
+        job["ingested"] = True
+        state.save()
+        print(f"Trabajo {job['batch_id']} ingerido: {batch['status']}")
+        return True
+
+    def dump_results(self, results: dict) -> str:
+        """
+        Serializa resultados id -> valor en el mismo formato JSON que devuelve
+        el modelo, para que puedan leerse con `from_json_list_to_df`.
 
-            if i % 100 == 0:
-                print("Iteración:", i)
-                time.sleep(15)
+        Args:
+            results (dict): Resultados por id.
 
-        return response
+        Returns:
+            str: Cadena JSON con llaves "Frase{id}".
+        """
+        return json.dumps(
+            {f"Frase{id_i}": value for id_i, value in results.items()},
+            ensure_ascii=False,
+        )
+
+    def plan_batches(
+        self, task: str, ids: list, texts: list, batch_size: int, **params
+    ) -> list:
+        """
+        Agrupa las frases en lotes según su número estimado de tokens (prompt
+        y respuesta esperada) para que cada solicitud quepa en la ventana de
+        contexto del modelo, sin superar `batch_size` frases por lote.
+
+        Args:
+            task (str): Nombre de la tarea (una de las llaves de PROMPTS).
+            ids (list): Identificadores de las frases.
+            texts (list): Textos de las frases.
+            batch_size (int): Número máximo de frases por lote. None para
+                agrupar solo por tokens.
+            **params: Parámetros adicionales del prompt.
+
+        Returns:
+            list: Lista de lotes, cada uno una tupla (ids_batch, text_batch).
+        """
+        prompt_tokens = estimate_tokens(self.build_prompt(task, "", **params))
+        if self.compact:
+            prompt_tokens += estimate_tokens(self.system_message(task, **params))
+        output_task = params["tasks"] if task == "multitask" else task
+        batches = self.batch_planner.plan(
+            output_task, ids, texts, prompt_tokens, batch_size
+        )
+        report = self.batch_planner.report()
+        print(f"Solicitudes planeadas: {report['planned_requests']}")
+        if report["oversized_phrases"]:
+            print(
+                f"Frases que exceden la ventana de contexto: {report['oversized_phrases']}"
+            )
+
+        return batches
+
+    def task_key(self, task: str, **params) -> str:
+        """
+        Identificador de una tarea con sus parámetros, usado en la llave del caché.
+
+        Args:
+            task (str): Nombre de la tarea.
+            **params: Parámetros del prompt.
+
+        Returns:
+            str: Identificador de la tarea.
+        """
+        return "|".join([task] + [f"{k}={params[k]}" for k in sorted(params)])
+
+    def get_topics(
+        self,
+        df_to_codificate: pd.DataFrame,
+        batch_size: int,
+        column_name: str,
+        id_column: str,
+        num_topicos: int,
+        checkpoint_path: str = None,
+    ) -> list:
+        """
+        Obtiene los tópicos para cada frase en un DataFrame, utilizando un modelo de generación
+        de lenguaje.
+
+        Args:
+            df_to_codificate (pd.DataFrame): DataFrame que contiene las frases.
+            batch_size (int): Número máximo de frases por lote. None para agrupar
+                solo por el presupuesto de tokens del modelo.
+            column_name (str): Nombre de la columna que contiene las frases.
+            id_column (str): Nombre de la columna que contiene los identificadores de las frases.
+            num_topicos (int): Número máximo de tópicos a determinar para cada frase.
+            checkpoint_path (str): Archivo JSONL donde se guarda cada lote al llegar
+                su respuesta, para poder reanudar la codificación.
+
+        Returns:
+            list: Lista de respuestas en formato JSON que contiene cada frase y su lista de tópicos.
+        """
+        return self.codificate(
+            "topics",
+            df_to_codificate,
+            batch_size,
+            column_name,
+            id_column,
+            checkpoint_path,
+            num_topicos=num_topicos,
+        )
+
+    def get_sentiment(
+        self,
+        df_to_codificate: pd.DataFrame,
+        batch_size: int,
+        column_name: str,
+        id_column: str,
+        checkpoint_path: str = None,
+    ) -> list:
+        """
+        Obtiene el sentimiento para cada frase en un DataFrame, utilizando un modelo de
+        generación de lenguaje.
+
+        Args:
+            df_to_codificate (pd.DataFrame): DataFrame que contiene las frases.
+            batch_size (int): Número máximo de frases por lote. None para agrupar
+                solo por el presupuesto de tokens del modelo.
+            column_name (str): Nombre de la columna que contiene las frases.
+            id_column (str): Nombre de la columna que contiene los identificadores de las frases.
+            checkpoint_path (str): Archivo JSONL donde se guarda cada lote al llegar
+                su respuesta, para poder reanudar la codificación.
+
+        Returns:
+            list: Lista de respuestas en formato JSON que contiene cada frase y su sentimiento.
+        """
+        return self.codificate(
+            "sentiment",
+            df_to_codificate,
+            batch_size,
+            column_name,
+            id_column,
+            checkpoint_path,
+        )
 
     def get_translation(
         self,
@@ -186,6 +1387,7 @@ class Codificacion:
         column_name: str,
         id_column: str,
         lang: str = "inglés",
+        checkpoint_path: str = None,
     ) -> list:
         """
         Realiza la traducción al inglés de cada frase en un DataFrame, utilizando un modelo de
@@ -193,88 +1395,353 @@ class Codificacion:
 
         Args:
             df_to_codificate (pd.DataFrame): DataFrame que contiene las frases.
-            batch_size (int): Tamaño del lote de frases a procesar en cada iteración.
+            batch_size (int): Número máximo de frases por lote. None para agrupar
+                solo por el presupuesto de tokens del modelo.
             column_name (str): Nombre de la columna que contiene las frases.
             id_column (str): Nombre de la columna que contiene los identificadores de las frases.
             lang (str): Lengüaje objetivo a traducir
+            checkpoint_path (str): Archivo JSONL donde se guarda cada lote al llegar
+                su respuesta, para poder reanudar la codificación.
 
         Returns:
             list: Lista de respuestas en formato JSON que contiene cada frase y su traducción al
             lengüaje indicado.
         """
-        response = []
-        for i in range(0, len(df_to_codificate), batch_size):
-            text_batch = df_to_codificate[i : (i + batch_size)][column_name].tolist()
-            ids_batch = df_to_codificate[i : (i + batch_size)][id_column].tolist()
-            str_text_batch = self.join_text_batch(text_batch, ids_batch)
+        return self.codificate(
+            "translation",
+            df_to_codificate,
+            batch_size,
+            column_name,
+            id_column,
+            checkpoint_path,
+            lang=lang,
+        )
 
-            prompt = f"""
-                Realice la traducción a {lang} de \
-                cada una de las frases a continuación: \
+    def get_spelling_correction(
+        self,
+        df_to_codificate: pd.DataFrame,
+        batch_size: int,
+        column_name: str,
+        id_column: str,
+        checkpoint_path: str = None,
+    ) -> list:
+        """
+        Realiza la corrección ortográfica de cada frase en un DataFrame, utilizando un modelo de
+        generación de lenguaje.
 
-                {str_text_batch}
+        Args:
+            df_to_codificate (pd.DataFrame): DataFrame que contiene las frases.
+            batch_size (int): Número máximo de frases por lote. None para agrupar
+                solo por el presupuesto de tokens del modelo.
+            column_name (str): Nombre de la columna que contiene las frases.
+            id_column (str): Nombre de la columna que contiene los identificadores de las frases.
+            checkpoint_path (str): Archivo JSONL donde se guarda cada lote al llegar
+                su respuesta, para poder reanudar la codificación.
 
-                El resultado debe ser un JSON con cada frase y su traducción.
+        Returns:
+            list: Lista de respuestas en formato JSON que contiene cada frase y su corrección
+            ortográfica.
+        """
+        return self.codificate(
+            "spelling_correction",
+            df_to_codificate,
+            batch_size,
+            column_name,
+            id_column,
+            checkpoint_path,
+        )
+
+    def get_cluster_topics(
+        self,
+        df_to_codificate: pd.DataFrame,
+        batch_size: int,
+        column_name: str,
+        id_column: str,
+        num_topicos: int,
+        clusterer: TopicClusterer = None,
+        n_exemplars: int = 5,
+        checkpoint_path: str = None,
+    ) -> list:
+        """
+        Obtiene los tópicos de cada frase agrupando primero las frases de forma
+        local (ver `TopicClusterer`). Solo los ejemplares de cada grupo se
+        envían al modelo y los tópicos del grupo se asignan a todas sus frases,
+        de modo que el número de solicitudes depende del número de grupos y no
+        del número de frases. Si hay menos frases que grupos, o ninguna tiene
+        términos frecuentes, cada frase se codifica como su propio grupo.
 
-                """
+        Args:
+            df_to_codificate (pd.DataFrame): DataFrame que contiene las frases,
+                idealmente limpias con `clean_text`.
+            batch_size (int): Número máximo de grupos por lote. None para agrupar
+                solo por el presupuesto de tokens del modelo.
+            column_name (str): Nombre de la columna que contiene las frases.
+            id_column (str): Nombre de la columna que contiene los identificadores de las frases.
+            num_topicos (int): Número máximo de tópicos a determinar para cada grupo.
+            clusterer (TopicClusterer): Agrupador a utilizar. Por defecto uno
+                con 100 grupos.
+            n_exemplars (int): Frases de cada grupo que se envían al modelo.
+            checkpoint_path (str): Archivo JSONL donde se guarda cada lote de
+                grupos al llegar su respuesta, para poder reanudar la codificación.
 
-            response_i = self.get_completion(prompt)
-            response.append(response_i)
+        Returns:
+            list: Lista de respuestas en formato JSON que contiene cada frase y su
+            lista de tópicos, como la de `get_topics`. El grupo de cada frase
+            queda en `self.clusters` y los tópicos de cada grupo en
+            `self.cluster_topics`.
+        """
+        clusterer = clusterer or TopicClusterer()
+        texts = df_to_codificate[column_name].tolist()
+        labels = None
+        if len(texts) > clusterer.n_clusters:
+            try:
+                labels = clusterer.fit_predict(texts)
+            except ValueError as e:
+                print(f"No se pudo agrupar: {e}")
+
+        if labels is None:
+            # Con pocas frases (o sin términos frecuentes) agrupar no ahorra
+            # solicitudes: cada frase se codifica como su propio grupo
+            labels = np.arange(len(texts))
+            exemplars = {cluster: [text] for cluster, text in enumerate(texts)}
+            top_terms = {cluster: [] for cluster in exemplars}
+        else:
+            exemplars = clusterer.exemplars(texts, n_exemplars)
+            top_terms = clusterer.top_terms()
+        print(
+            f"Grupos: {len(exemplars)} para {len(texts)} frases "
+            f"({int((labels < 0).sum())} sin grupo)"
+        )
 
-            if i % 100 == 0:
-                print("Iteración:", i)
-                time.sleep(15)
+        df_clusters = pd.DataFrame(
+            {
+                "cluster": list(exemplars),
+                "text": [
+                    " | ".join(exemplars[cluster])
+                    + (
+                        f" (términos: {', '.join(top_terms[cluster])})"
+                        if top_terms[cluster]
+                        else ""
+                    )
+                    for cluster in exemplars
+                ],
+            }
+        )
+        responses = self.codificate(
+            "cluster_topics",
+            df_clusters,
+            batch_size,
+            "text",
+            "cluster",
+            checkpoint_path,
+            num_topicos=num_topicos,
+        )
+        self.cluster_topics = self.from_json_list_to_df(responses)
 
-        return response
+        self.clusters = pd.Series(
+            labels, index=df_to_codificate[id_column].astype(str).tolist()
+        )
+        topics = self.clusters.astype(str).map(self.cluster_topics).dropna()
+        return self.series_to_responses(topics)
 
-    def get_spelling_correction(
+    def get_tiered_sentiment(
         self,
         df_to_codificate: pd.DataFrame,
         batch_size: int,
         column_name: str,
         id_column: str,
+        classifier: SentimentClassifier = None,
+        threshold: float = 0.8,
+        audit_fraction: float = 0.02,
+        checkpoint_path: str = None,
     ) -> list:
         """
-        Realiza la corrección ortográfica de cada frase en un DataFrame, utilizando un modelo de
-        generación de lenguaje.
+        Obtiene el sentimiento de cada frase en dos niveles: un clasificador
+        local etiqueta las frases en que tiene confianza de al menos
+        `threshold` y solo las demás se envían al modelo con `get_sentiment`.
+        Una muestra de las frases resueltas localmente también se envía al
+        modelo para medir la concordancia entre ambos.
 
         Args:
             df_to_codificate (pd.DataFrame): DataFrame que contiene las frases.
-            batch_size (int): Tamaño del lote de frases a procesar en cada iteración.
+            batch_size (int): Número máximo de frases por lote. None para agrupar
+                solo por el presupuesto de tokens del modelo.
             column_name (str): Nombre de la columna que contiene las frases.
             id_column (str): Nombre de la columna que contiene los identificadores de las frases.
+            classifier (SentimentClassifier): Clasificador local, idealmente
+                entrenado con respuestas anteriores del modelo (ver
+                `sentiment.training_data`). Por defecto uno basado solo en el léxico.
+            threshold (float): Probabilidad mínima para aceptar la etiqueta local.
+            audit_fraction (float): Fracción de las frases resueltas localmente
+                que también se envía al modelo para medir la concordancia.
+            checkpoint_path (str): Archivo JSONL donde se guarda cada lote al llegar
+                su respuesta, para poder reanudar la codificación.
 
         Returns:
-            list: Lista de respuestas en formato JSON que contiene cada frase y su corrección
-            ortográfica.
+            list: Lista de respuestas en formato JSON que contiene cada frase y su
+            sentimiento, como la de `get_sentiment`. La tasa de escalamiento y
+            la concordancia quedan en `self.report`.
         """
-        response = []
-        for i in range(0, len(df_to_codificate), batch_size):
-            text_batch = df_to_codificate[i : (i + batch_size)][column_name].tolist()
-            ids_batch = df_to_codificate[i : (i + batch_size)][id_column].tolist()
-            str_text_batch = self.join_text_batch(text_batch, ids_batch)
+        classifier = classifier or SentimentClassifier()
+        ids = df_to_codificate[id_column].astype(str).to_numpy()
+        local_labels, confidence = classifier.predict(
+            df_to_codificate[column_name].tolist()
+        )
 
-            prompt = f"""
-                Realice la correción ortográfica de \
-                cada una de las frases a continuación: \
+        escalate = confidence < threshold
+        rng = np.random.default_rng(0)
+        audit = ~escalate & (rng.random(len(ids)) < audit_fraction)
+        print(
+            f"Frases resueltas localmente: {(~escalate).sum()} de {len(ids)}, "
+            f"enviadas al modelo: {escalate.sum()} (+{audit.sum()} de auditoría)"
+        )
 
-                {str_text_batch}
+        responses = self.get_sentiment(
+            df_to_codificate[escalate | audit],
+            batch_size,
+            column_name,
+            id_column,
+            checkpoint_path,
+        )
+        llm_labels = self.from_json_list_to_df(responses).map(normalize_label).dropna()
+
+        labels = pd.Series(local_labels, index=ids, dtype=object)
+        llm_aligned = llm_labels.reindex(ids).to_numpy()
+        answered = pd.notna(llm_aligned)
+        labels[answered] = llm_aligned[answered]
+
+        def agreement(mask):
+            mask = mask & answered
+            return (
+                float((local_labels[mask] == llm_aligned[mask]).mean())
+                if mask.any()
+                else None
+            )
+
+        self.report.update(
+            {
+                "escalation_rate": float(escalate.mean()) if len(ids) else 0.0,
+                "audited": int(audit.sum()),
+                "agreement_local": agreement(audit),
+                "agreement_escalated": agreement(escalate),
+            }
+        )
+        print(f"Escalamiento: {self.report['escalation_rate']:.2%}")
+        if self.report["agreement_local"] is not None:
+            print(
+                "Concordancia de las etiquetas locales con el modelo: "
+                f"{self.report['agreement_local']:.2%}"
+            )
+        return self.series_to_responses(labels)
+
+    def series_to_responses(self, series: pd.Series, chunk_size: int = 10000) -> list:
+        """
+        Serializa resultados por frase en respuestas JSON como las del modelo,
+        en trozos para no crear una única cadena enorme.
 
-                El resultado debe ser un JSON con cada frase y su corrección ortográfica.
+        Args:
+            series (pd.Series): Resultados indexados por el id de cada frase.
+            chunk_size (int): Frases por respuesta.
 
-                """
+        Returns:
+            list: Lista de cadenas JSON con llaves "Frase{id}".
+        """
+        return [
+            self.dump_results(series.iloc[start : (start + chunk_size)].to_dict())
+            for start in range(0, len(series), chunk_size)
+        ]
 
-            response_i = self.get_completion(prompt)
-            response.append(response_i)
+    def get_multitask(
+        self,
+        df_to_codificate: pd.DataFrame,
+        batch_size: int,
+        column_name: str,
+        id_column: str,
+        tasks: list,
+        num_topicos: int = 3,
+        lang: str = "inglés",
+        checkpoint_path: str = None,
+    ) -> list:
+        """
+        Resuelve varias tareas (sentimiento, tópicos, traducción y corrección
+        ortográfica) en una sola pasada sobre el DataFrame: cada lote se envía
+        una única vez con un prompt que pide todas las tareas.
 
-            if i % 100 == 0:
-                print("Iteración:", i)
-                time.sleep(15)
+        Args:
+            df_to_codificate (pd.DataFrame): DataFrame que contiene las frases.
+            batch_size (int): Número máximo de frases por lote. None para agrupar
+                solo por el presupuesto de tokens del modelo.
+            column_name (str): Nombre de la columna que contiene las frases.
+            id_column (str): Nombre de la columna que contiene los identificadores de las frases.
+            tasks (list): Tareas a resolver, entre "sentiment", "topics",
+                "translation" y "spelling_correction".
+            num_topicos (int): Número máximo de tópicos a determinar para cada frase.
+            lang (str): Lengüaje objetivo a traducir
+            checkpoint_path (str): Archivo JSONL donde se guarda cada lote al llegar
+                su respuesta, para poder reanudar la codificación.
 
-        return response
+        Returns:
+            list: Lista de respuestas en formato JSON que contiene cada frase y un
+            objeto con el resultado de cada tarea. Usar
+            `from_multitask_json_list_to_df` para convertirla en un DataFrame.
+        """
+        unknown = [task for task in tasks if task not in MULTITASK_FIELDS]
+        if unknown:
+            raise ValueError(f"Tareas no soportadas: {unknown}")
+
+        params = {"tasks": list(tasks)}
+        if "topics" in tasks:
+            params["num_topicos"] = num_topicos
+        if "translation" in tasks:
+            params["lang"] = lang
+
+        return self.codificate(
+            "multitask",
+            df_to_codificate,
+            batch_size,
+            column_name,
+            id_column,
+            checkpoint_path,
+            **params,
+        )
+
+    def from_multitask_json_list_to_df(
+        self, json_list: list, tasks: list = None
+    ) -> pd.DataFrame:
+        """
+        Convierte las respuestas de `get_multitask` en un DataFrame con una
+        columna por tarea, indexado por el id de cada frase.
+
+        Args:
+            json_list (list): Lista de cadenas JSON.
+            tasks (list): Tareas a extraer. Por defecto todas las conocidas.
+
+        Returns:
+            pd.DataFrame: DataFrame con una columna por tarea.
+        """
+        tasks = tasks or list(MULTITASK_FIELDS)
+        columns = {MULTITASK_FIELDS[task][0]: task for task in tasks}
+
+        ids = []
+        values = {task: [] for task in tasks}
+        for json_str in json_list:
+            for id_i, result in self.parse_response(json_str).items():
+                if not isinstance(result, dict):
+                    continue
+                ids.append(id_i)
+                for field, task in columns.items():
+                    values[task].append(result.get(field))
+
+        return pd.DataFrame(values, index=ids)
 
     def save_pandas_object(
-        self, codificated_df: pd.DataFrame, root_path: str, subfolder: str, name: str
+        self,
+        codificated_df: pd.DataFrame,
+        root_path: str,
+        subfolder: str,
+        name: str,
+        file_format: str = "csv",
+        partition_cols: list = None,
     ) -> None:
         """
         Guardar los resultados de la escucha en la carpeta "data.
@@ -284,6 +1751,9 @@ class Codificacion:
             codificated_df (pd.DataFrame): Archivo a guardar.
             subfolder (str): Subfolder en data donde se guardarán los datos.
             name (str): Nombre que se quiere para los archivos.
+            file_format (str): "csv", "parquet" o "feather".
+            partition_cols (list): Columnas por las que se particiona el dataset
+                Parquet.
 
         Returns:
             None.
@@ -298,23 +1768,41 @@ class Codificacion:
             print(f"Root directory already exists at {folder_path}")
 
         # Proceed with saving the file in the root directory
-        file_path = os.path.join(folder_path, f"{name}.csv")
-        codificated_df.to_csv(file_path, index=False)
+        extension = "" if partition_cols else STORAGE_FORMATS[file_format]
+        file_path = os.path.join(folder_path, f"{name}{extension}")
+        write_frame(codificated_df, file_path, file_format, partition_cols)
 
-    def save_pickle_object(
-        self, obj, root_path: str, subfolder: str, name: str
-    ) -> None:
+    def load_pandas_object(
+        self, file_path: str, columns: list = None, filters: list = None
+    ) -> pd.DataFrame:
         """
-        Guarda un archivo como un archivo pickle en el directorio especificado.
+        Cargar un archivo guardado con `save_pandas_object`.
+
+        Args:
+            file_path (str): Ruta al archivo (o carpeta del dataset particionado).
+            columns (list): Columnas a leer. None para leer todas.
+            filters (list): Filtros de Parquet que se aplican al leer.
+
+        Returns:
+            pd.DataFrame: El DataFrame leído.
+        """
+        return read_frame(file_path, columns, filters)
+
+    def save_pickle_object(self, obj, root_path: str, subfolder: str, name: str) -> str:
+        """
+        Guarda respuestas o resultados en el directorio especificado. A pesar
+        del nombre, las listas de respuestas se guardan como JSONL comprimido
+        y los DataFrames o Series como Parquet (ver `save_object`); solo los
+        demás objetos se siguen guardando con pickle.
 
         Args:
             obj : Objeto que se va a guardar.
             root_path (str): Ruta del directorio raíz donde se guardará el archivo.
             subfolder (str): Subcarpeta en el directorio raíz donde se guardará el archivo.
-            name (str): Nombre para el archivo.
+            name (str): Nombre para el archivo, sin extensión.
 
         Returns:
-            None.
+            str: Ruta del archivo guardado.
         """
         folder_path = os.path.join(root_path, subfolder)
         # Check if the root directory exists
@@ -326,21 +1814,27 @@ class Codificacion:
             print(f"Root directory already exists at {folder_path}")
 
         # Proceed with saving the file in the root directory
-        file_path = os.path.join(folder_path, f"{name}.pkl")
+        file_path = os.path.join(folder_path, name)
+        if isinstance(obj, (pd.DataFrame, pd.Series)) or is_response_list(obj):
+            return save_object(obj, file_path)
+
+        file_path += ".pkl"
         with open(file_path, "wb") as file:
             pickle.dump(obj, file)
+        return file_path
 
-    def load_pickle_object(self, file_path: str):
+    def load_pickle_object(self, file_path: str, lazy: bool = False):
         """
-        Cargar un archivo pickle.
+        Cargar un archivo guardado con `save_pickle_object`: respuestas en
+        ".jsonl.gz", resultados en ".parquet" o ".arrow" (mapeados en memoria)
+        o un ".pkl" anterior, que solo debe abrirse si es propio.
 
         Args:
-            file_path (str): Ruta al archivo pickle.
+            file_path (str): Ruta al archivo.
+            lazy (bool): Si es True, las respuestas y las tablas se recorren
+                por partes en lugar de cargarse completas.
 
         Returns:
             El objeto cargado.
         """
-        with open(file_path, "rb") as file:
-            obj = pickle.load(file)
-
-        return obj
+        return load_object(file_path, lazy)
@@ -0,0 +1,176 @@
+import re
+import json
+
+from sentiment import normalize_label
+
+# Códigos de sentimiento del formato compacto
+SENTIMENT_CODES = {"p": "positivo", "n": "negativo", "u": "neutro"}
+
+# Instrucción de cada tarea en el mensaje de sistema del formato compacto
+COMPACT_INSTRUCTIONS = {
+    "sentiment": (
+        "Clasifica el sentimiento de cada frase: p (positivo), n (negativo) "
+        "o u (neutro)."
+    ),
+    "topics": (
+        "Determina máximo {num_topicos} tópicos de máximo tres palabras para "
+        "cada frase, separados por punto y coma."
+    ),
+    "cluster_topics": (
+        'Cada frase es un grupo de tweets similares separados por " | ", con '
+        "sus términos más frecuentes. Determina máximo {num_topicos} tópicos de "
+        "máximo tres palabras para cada grupo, separados por punto y coma."
+    ),
+    "translation": "Traduce cada frase a {lang}.",
+    "spelling_correction": "Corrige la ortografía de cada frase.",
+    "multitask": (
+        "Para cada frase determina, en columnas separadas por tabulador y en "
+        "este orden: {instructions}."
+    ),
+}
+
+# Columna de cada tarea en el formato compacto multitarea
+COMPACT_MULTITASK = {
+    "sentiment": "sentimiento (p, n o u)",
+    "topics": "tópicos (máximo {num_topicos}, separados por punto y coma)",
+    "translation": "traducción a {lang}",
+    "spelling_correction": "corrección ortográfica",
+}
+
+RESPONSE_FORMAT = (
+    "Cada línea de la entrada es: número<TAB>frase. Responde solo una línea por "
+    "frase con: número<TAB>resultado, sin texto adicional."
+)
+
+WHITESPACE = re.compile(r"\s+")
+COMPACT_LINE = re.compile(r"^\s*(\d+)(?:\t| *[:|] *)(.*?)\s*$")
+
+
+def join_compact(text_batch: list) -> str:
+    """
+    Une las frases de un lote con llaves numéricas cortas (1, 2, ...) en
+    lugar de "Frase{id}". Los saltos de línea y tabuladores de cada frase se
+    reemplazan por espacios.
+
+    Args:
+        text_batch (list): Textos del lote.
+
+    Returns:
+        str: Una línea "número<TAB>frase" por frase.
+    """
+    return "\n".join(
+        f"{n}\t{WHITESPACE.sub(' ', str(text)).strip()}"
+        for n, text in enumerate(text_batch, 1)
+    )
+
+
+def compact_system_message(task: str, tasks: list = None, **params) -> str:
+    """
+    Mensaje de sistema del formato compacto, igual para todos los lotes de
+    una tarea.
+
+    Args:
+        task (str): Nombre de la tarea.
+        tasks (list): Tareas de un prompt multitarea.
+        **params: Parámetros de la tarea (num_topicos, lang).
+
+    Returns:
+        str: Mensaje de sistema.
+    """
+    if task == "multitask":
+        params["instructions"] = "; ".join(
+            COMPACT_MULTITASK[t].format(**params) for t in tasks
+        )
+    return COMPACT_INSTRUCTIONS[task].format(**params) + " " + RESPONSE_FORMAT
+
+
+def decode_value(task: str, value: str):
+    """
+    Convierte un resultado compacto al valor que produce el formato normal.
+
+    Args:
+        task (str): Nombre de la tarea.
+        value (str): Resultado en formato compacto.
+
+    Returns:
+        Valor en el formato normal (etiqueta, lista de tópicos o texto).
+    """
+    value = value.strip()
+    if task == "sentiment":
+        return SENTIMENT_CODES.get(value.lower()) or normalize_label(value) or value
+    if task in ("topics", "cluster_topics"):
+        return [topic.strip() for topic in value.split(";") if topic.strip()]
+    return value
+
+
+def _lines(response: str) -> list:
+    # Pares (número, resultado); acepta también un arreglo JSON
+    text = response.strip()
+    if text.startswith("["):
+        try:
+            items = json.loads(text)
+            return [
+                (
+                    (str(item[0]), "\t".join(map(str, item[1:])))
+                    if isinstance(item, list)
+                    else (str(n), str(item))
+                )
+                for n, item in enumerate(items, 1)
+            ]
+        except (json.JSONDecodeError, IndexError):
+            pass
+    pairs = []
+    for line in text.splitlines():
+        match = COMPACT_LINE.match(line)
+        if match:
+            pairs.append(match.groups())
+    return pairs
+
+
+def decode_compact(
+    task: str, response: str, ids_batch: list, tasks: list = None, fields: list = None
+) -> dict:
+    """
+    Interpreta una respuesta compacta y la lleva a los ids reales del lote y
+    a los valores del formato normal. Las líneas con un número no entero o
+    fuera del lote, sin resultado o, en multitarea, con alguna columna vacía
+    o faltante se ignoran, de modo que esas frases cuentan como faltantes y
+    se vuelven a encolar.
+
+    Args:
+        task (str): Nombre de la tarea.
+        response (str): Respuesta del modelo.
+        ids_batch (list): Ids de las frases del lote, en el orden enviado.
+        tasks (list): Tareas de un prompt multitarea, en el orden de las columnas.
+        fields (list): Llave JSON de cada tarea multitarea.
+
+    Returns:
+        dict: Diccionario id -> valor, como el de `extract_entries`.
+    """
+    if not isinstance(response, str):
+        return {}
+
+    results = {}
+    for n, value in _lines(response):
+        try:
+            position = int(n) - 1
+        except ValueError:
+            continue
+        if not 0 <= position < len(ids_batch):
+            continue
+        if task == "multitask":
+            columns = value.split("\t")
+            if len(columns) < len(tasks) or not all(
+                column.strip() for column in columns[: len(tasks)]
+            ):
+                continue
+            value = {
+                field: decode_value(t, column)
+                for t, field, column in zip(tasks, fields, columns)
+            }
+        else:
+            value = decode_value(task, value)
+        if value in ("", []):
+            continue
+        results[str(ids_batch[position])] = value
+    return results
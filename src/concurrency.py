@@ -0,0 +1,318 @@
+import os
+import math
+import time
+import random
+import asyncio
+import sqlite3
+import threading
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estima el número de tokens de un texto con la regla aproximada de
+    cuatro caracteres por token.
+
+    Args:
+        text (str): Texto a evaluar.
+
+    Returns:
+        int: Número estimado de tokens.
+    """
+    return max(1, math.ceil(len(text) / 4))
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """
+    Tiempo de espera antes de un reintento, exponencial en el número de
+    intento, acotado por `cap` y con una parte aleatoria para que varias
+    solicitudes no reintenten al mismo tiempo.
+
+    Args:
+        attempt (int): Número de intento, empezando en 0.
+        base (float): Espera del primer intento en segundos.
+        cap (float): Espera máxima en segundos.
+
+    Returns:
+        float: Segundos a esperar.
+    """
+    delay = min(cap, base * 2**attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def run_coroutine(coroutine):
+    """
+    Ejecuta una corrutina hasta completarla desde código síncrono. Si ya hay
+    un event loop corriendo (por ejemplo dentro de un notebook), la corrutina
+    se ejecuta en un hilo aparte con su propio loop.
+
+    Args:
+        coroutine: Corrutina a ejecutar.
+
+    Returns:
+        El resultado de la corrutina.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+def iter_as_completed(coroutines, limit: int):
+    """
+    Ejecuta las corrutinas de un iterable perezoso en un único event loop,
+    con hasta `limit` en vuelo, y entrega cada resultado apenas termina. La
+    siguiente corrutina se toma del iterable solo cuando termina una, de modo
+    que una solicitud lenta no detiene a las demás y los prompts se construyen
+    a medida que se necesitan. El loop corre en un hilo propio, por lo que
+    también funciona si ya hay un loop corriendo (por ejemplo en un notebook).
+
+    Args:
+        coroutines: Iterable de corrutinas.
+        limit (int): Número máximo de corrutinas en vuelo.
+
+    Returns:
+        Generador de pares (n, resultado), donde n es la posición de la
+        corrutina en el iterable, en el orden en que terminan.
+    """
+    loop = asyncio.new_event_loop()
+
+    def run_loop():
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+        # Se cancelan las corrutinas que quedaron en vuelo si el consumidor
+        # dejó de iterar
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+    thread = threading.Thread(target=run_loop, daemon=True)
+    thread.start()
+    in_flight = {}
+    try:
+        iterator = enumerate(coroutines)
+        exhausted = False
+        while True:
+            while not exhausted and len(in_flight) < max(1, limit):
+                try:
+                    n, coroutine = next(iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                in_flight[asyncio.run_coroutine_threadsafe(coroutine, loop)] = n
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield in_flight.pop(future), future.result()
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+
+class RateLimiter:
+
+    """
+    Limitador de tipo token bucket para los presupuestos de solicitudes por
+    minuto y tokens por minuto de la API. Puede usarse tanto desde hilos como
+    desde corrutinas.
+    """
+
+    def __init__(self, requests_per_minute: int = None, tokens_per_minute: int = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_budget = float(requests_per_minute or 0)
+        self._token_budget = float(tokens_per_minute or 0)
+        self._last_refill = self._clock()
+        self._lock = threading.Lock()
+
+    def _clock(self) -> float:
+        return time.monotonic()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_budget = min(
+                float(self.requests_per_minute),
+                self._request_budget + elapsed * self.requests_per_minute / 60,
+            )
+        if self.tokens_per_minute:
+            self._token_budget = min(
+                float(self.tokens_per_minute),
+                self._token_budget + elapsed * self.tokens_per_minute / 60,
+            )
+
+    def _reserve(self, tokens: int) -> float:
+        """
+        Intenta reservar una solicitud y `tokens` tokens. Devuelve 0 si la
+        reserva se hizo, o los segundos a esperar antes de volver a intentar.
+        """
+        with self._lock:
+            self._refill()
+            wait = 0.0
+            if self.requests_per_minute and self._request_budget < 1:
+                wait = max(
+                    wait, (1 - self._request_budget) * 60 / self.requests_per_minute
+                )
+            if self.tokens_per_minute:
+                # Una solicitud mayor que el presupuesto completo nunca cabría
+                tokens = min(tokens, self.tokens_per_minute)
+                if self._token_budget < tokens:
+                    wait = max(
+                        wait,
+                        (tokens - self._token_budget) * 60 / self.tokens_per_minute,
+                    )
+            if wait > 0:
+                return wait
+
+            if self.requests_per_minute:
+                self._request_budget -= 1
+            if self.tokens_per_minute:
+                self._token_budget -= tokens
+            return 0.0
+
+    def acquire(self, tokens: int = 0) -> None:
+        """
+        Bloquea el hilo actual hasta que haya presupuesto para una solicitud
+        de `tokens` tokens.
+
+        Args:
+            tokens (int): Tokens estimados de la solicitud.
+
+        Returns:
+            None.
+        """
+        wait = self._reserve(tokens)
+        while wait > 0:
+            time.sleep(wait)
+            wait = self._reserve(tokens)
+
+    async def aacquire(self, tokens: int = 0) -> None:
+        """
+        Versión asíncrona de `acquire`.
+
+        Args:
+            tokens (int): Tokens estimados de la solicitud.
+
+        Returns:
+            None.
+        """
+        wait = self._reserve(tokens)
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self._reserve(tokens)
+
+    def record(self, tokens: int) -> None:
+        """
+        Descuenta del presupuesto tokens consumidos que no se conocían al
+        reservar (por ejemplo los tokens de la respuesta).
+
+        Args:
+            tokens (int): Tokens adicionales consumidos.
+
+        Returns:
+            None.
+        """
+        if not self.tokens_per_minute or not tokens:
+            return
+        with self._lock:
+            self._refill()
+            self._token_budget -= tokens
+
+
+class SharedRateLimiter(RateLimiter):
+
+    """
+    Versión de `RateLimiter` cuyo presupuesto se guarda en un archivo SQLite,
+    de modo que varios procesos (o máquinas con un sistema de archivos
+    compartido que soporte bloqueos) respetan juntos los mismos límites por
+    minuto. Cada reserva se hace dentro de una transacción exclusiva.
+    """
+
+    def __init__(
+        self, path: str, requests_per_minute: int = None, tokens_per_minute: int = None
+    ):
+        """
+        Args:
+            path (str): Ruta al archivo SQLite. Se crea si no existe.
+            requests_per_minute (int): Presupuesto de solicitudes por minuto.
+            tokens_per_minute (int): Presupuesto de tokens por minuto.
+        """
+        folder_path = os.path.dirname(path)
+        if folder_path and not os.path.exists(folder_path):
+            os.makedirs(folder_path)
+        self.path = path
+        self._local = threading.local()
+        super().__init__(requests_per_minute, tokens_per_minute)
+
+        connection = self._connection()
+        with connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS bucket (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    request_budget REAL NOT NULL,
+                    token_budget REAL NOT NULL,
+                    last_refill REAL NOT NULL
+                )
+                """)
+            connection.execute(
+                "INSERT OR IGNORE INTO bucket VALUES (0, ?, ?, ?)",
+                (self._request_budget, self._token_budget, self._last_refill),
+            )
+
+    def _clock(self) -> float:
+        # El reloj debe ser comparable entre procesos
+        return time.time()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            connection.execute("PRAGMA busy_timeout=60000")
+            self._local.connection = connection
+        return connection
+
+    def _shared(self, update):
+        # Carga el estado compartido, aplica `update` y lo guarda en una sola
+        # transacción exclusiva
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            (
+                self._request_budget,
+                self._token_budget,
+                self._last_refill,
+            ) = connection.execute(
+                "SELECT request_budget, token_budget, last_refill FROM bucket"
+            ).fetchone()
+            result = update()
+            connection.execute(
+                "UPDATE bucket SET request_budget = ?, token_budget = ?, "
+                "last_refill = ?",
+                (self._request_budget, self._token_budget, self._last_refill),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return result
+
+    def _reserve(self, tokens: int) -> float:
+        # Sin límites no hay presupuesto que compartir ni bloqueo que tomar
+        if not self.requests_per_minute and not self.tokens_per_minute:
+            return 0.0
+        return self._shared(lambda: super(SharedRateLimiter, self)._reserve(tokens))
+
+    def record(self, tokens: int) -> None:
+        if not self.tokens_per_minute or not tokens:
+            return
+        self._shared(lambda: super(SharedRateLimiter, self).record(tokens))
@@ -1,73 +1,42 @@
+import os
 import time
 import json
+import queue
 import argparse
+import threading
 
 import tweepy
 import pandas as pd
 
 from utils import save_pandas_object
 
-from credentials import (
-    BEARER_TOKEN,
-    API_KEY,
-    API_SECRET,
-    ACCESS_TOKEN,
-    ACCESS_TOKEN_SECRET,
-)
-
-# Definimos los secret tokens para la escucha y se inicia el cliente
-bearer_token = BEARER_TOKEN
-api_key = API_KEY
-api_secret = API_SECRET
-access_token = ACCESS_TOKEN
-access_token_secret = ACCESS_TOKEN_SECRET
-
-client = tweepy.Client(
-    bearer_token,
-    api_key,
-    api_secret,
-    access_token,
-    access_token_secret,
-    wait_on_rate_limit=True,
-)
-
-# Se inicializa la API
-auth = tweepy.OAuthHandler(
-    api_key,
-    api_secret,
-)
-auth.set_access_token(access_token, access_token_secret)
-api = tweepy.API(auth)
-
-# Parámetros de búsqueda
-parser = argparse.ArgumentParser()
-parser.add_argument("--search_query", help="Twitter search query", nargs="+")
-parser.add_argument(
-    "--tweets_number", help="Number of desired tweets per search", type=int, default=10
-)
-parser.add_argument(
-    "--parts", help="Number of desired search (iterations) to do", type=int, default=3
-)
-parser.add_argument(
-    "--name",
-    help="Name you want to assign to your search",
-    type=str,
-    default="programming",
-)
-parser.add_argument("--target_lang", help="Tweets Lang", type=str, default="es")
-
-# Leer parámetros
-args = parser.parse_args()
-
-search_terms = args.search_query
-parts = args.parts
-number_of_tweets = args.tweets_number
-desired_language = args.target_lang
-folder_name = args.name
+TWEET_FIELDS = [
+    "referenced_tweets",
+    "entities",
+    "created_at",
+    "public_metrics",
+    "context_annotations",
+    "lang",
+]
+
+
+# Marca para detener el hilo escritor
+STOP = object()
 
 
 # Streaming Class
 class MyStream(tweepy.StreamingClient):
+
+    """
+    Escucha de tweets en streaming. El hilo del stream solo encola los datos
+    recibidos en una cola acotada; un hilo escritor en segundo plano procesa
+    los tweets y guarda cada parte cuando se alcanza `number_of_tweets`.
+    Cuando pasan `flush_interval` segundos desde la última escritura, la parte
+    en curso se guarda incompleta y se vuelve a escribir en el mismo archivo
+    hasta que se llena, de modo que solo las partes completas cuentan para
+    `parts`.
+    """
+
     def __init__(
         self,
         bearer_token,
@@ -75,21 +44,51 @@ class MyStream(tweepy.StreamingClient):
         parts=1,
         number_of_tweets=0,
         folder_name="",
+        file_format="csv",
+        queue_size=10000,
+        flush_interval=60.0,
+        root_path=os.path.join("..", "data"),
     ):
         super().__init__(bearer_token)
         self.desired_language = desired_language
+        self.max_parts = parts
+        self.tweets_per_part = number_of_tweets
         self.parts = 1
         self.number_of_tweets = 0
         self.tweets = []
+        self.saved_tweets = 0
         self.folder_name = folder_name
+        self.file_format = file_format
+        self.flush_interval = flush_interval
+        self.root_path = root_path
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.writer = None
+        self.last_flush = time.monotonic()
+        self.stats = {
+            "received": 0,
+            "dropped": 0,
+            "processed": 0,
+            "written": 0,
+            "parts_written": 0,
+            "partial_writes": 0,
+            "max_queue_depth": 0,
+            "last_flush_seconds": 0.0,
+            "max_flush_seconds": 0.0,
+        }
 
     def on_connect(self):
         print("Connected")
+        self.start_writer()
+
+    def start_writer(self):
+        if self.writer is None or not self.writer.is_alive():
+            self.writer = threading.Thread(target=self.write_loop, daemon=True)
+            self.writer.start()
 
     def on_tweet(self, tweet):
         retweeted_status = tweet.get("retweeted_status")
         if not retweeted_status and tweet.get("lang") == self.desired_language:
-            time.sleep(0.2)
             self.process_tweet(tweet)
 
     def process_tweet(self, tweet):
@@ -116,56 +115,277 @@ class MyStream(tweepy.StreamingClient):
         self.number_of_tweets += 1
 
     def on_data(self, raw_data):
+        # No se bloquea el hilo del stream: si la cola está llena el dato se
+        # descarta y se cuenta, para que el servidor no corte la conexión
+        self.start_writer()
+        self.stats["received"] += 1
         try:
-            tweet = json.loads(raw_data)["data"]
-            self.on_tweet(tweet)
-            time.sleep(0.2)
-            if self.number_of_tweets == number_of_tweets:
-                print(f"Entered writing part {self.parts}")
-                name = f"data_{self.parts}.csv"
-                df = pd.DataFrame(self.tweets)
-                save_pandas_object(df, "..\data", self.folder_name, name)
-                self.number_of_tweets = 0
-                self.tweets = []
-                self.parts += 1
-            if self.parts == parts:
+            self.queue.put_nowait(raw_data)
+        except queue.Full:
+            self.stats["dropped"] += 1
+        self.stats["max_queue_depth"] = max(
+            self.stats["max_queue_depth"], self.queue.qsize()
+        )
+
+    def write_loop(self):
+        while True:
+            timeout = max(0.0, self.flush_interval - self.elapsed_since_flush())
+            try:
+                raw_data = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                raw_data = None
+
+            if raw_data is STOP:
+                if self.parts < self.max_parts:
+                    self.flush()
+                break
+
+            if raw_data is not None:
+                try:
+                    tweet = json.loads(raw_data)["data"]
+                    self.on_tweet(tweet)
+                    self.stats["processed"] += 1
+                except Exception as e:
+                    print(e)
+
+            part_full = self.number_of_tweets >= self.tweets_per_part
+            due = self.elapsed_since_flush() >= self.flush_interval
+            if self.parts < self.max_parts and part_full:
+                self.flush()
+            elif self.parts < self.max_parts and due:
+                self.flush(complete=False)
+            if self.parts == self.max_parts and self.running:
                 self.disconnect()
-        except Exception as e:
-            print(e)
+
+    def elapsed_since_flush(self):
+        return time.monotonic() - self.last_flush
+
+    def flush(self, complete=True):
+        # Una escritura parcial guarda la parte en curso sin cerrarla: el
+        # contador de partes solo avanza con las partes completas
+        self.last_flush = time.monotonic()
+        if not self.tweets or (not complete and self.saved_tweets == len(self.tweets)):
+            return
+
+        print(f"Entered writing part {self.parts}")
+        start = time.perf_counter()
+        name = f"data_{self.parts}.csv"
+        df = pd.DataFrame(self.tweets)
+        save_pandas_object(df, self.root_path, self.folder_name, name, self.file_format)
+        self.stats["last_flush_seconds"] = time.perf_counter() - start
+        self.stats["max_flush_seconds"] = max(
+            self.stats["max_flush_seconds"], self.stats["last_flush_seconds"]
+        )
+        self.stats["written"] += len(self.tweets) - self.saved_tweets
+        self.saved_tweets = len(self.tweets)
+        if not complete:
+            self.stats["partial_writes"] += 1
+            return
+
+        self.stats["parts_written"] += 1
+        self.number_of_tweets = 0
+        self.tweets = []
+        self.saved_tweets = 0
+        self.parts += 1
+
+    def metrics(self):
+        """
+        Métricas de ingesta y contrapresión: datos recibidos, descartados por
+        cola llena, procesados y escritos, escrituras parciales, profundidad
+        actual y máxima de la cola y duración de la última escritura y de la más lenta.
+        """
+        return {**self.stats, "queue_depth": self.queue.qsize()}
+
+    def close(self):
+        """
+        Detiene el hilo escritor después de procesar lo que quede en la cola y
+        escribir la última parte.
+        """
+        if self.writer is None or not self.writer.is_alive():
+            return
+        self.queue.put(STOP)
+        if threading.current_thread() is not self.writer:
+            self.writer.join()
 
     def on_disconnect(self):
         print("Disconnected")
+        self.close()
+        print(self.metrics())
+
+
+class ReplaySource:
+
+    """
+    Fuente de datos grabados para probar la escucha sin conexión: lee un
+    archivo NDJSON con un payload crudo del stream por línea y lo entrega a
+    `on_data` a una tasa controlada.
+    """
+
+    def __init__(self, path, rate=None):
+        """
+        Args:
+            path (str): Ruta al archivo NDJSON.
+            rate (float): Tweets por segundo. None para entregar lo más rápido
+                posible.
+        """
+        self.path = path
+        self.rate = rate
+
+    def __iter__(self):
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    yield line
+
+    def feed(self, stream):
+        """
+        Entrega los payloads al stream y devuelve el número de payloads
+        entregados.
+        """
+        start = time.perf_counter()
+        count = 0
+        for count, raw_data in enumerate(self, 1):
+            stream.on_data(raw_data)
+            if self.rate:
+                # Espera hasta el instante que le corresponde al siguiente payload
+                delay = start + count / self.rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        return count
+
+
+def replay(stream, path, rate=None):
+    """
+    Reproduce un archivo NDJSON grabado en el stream, como si llegara de la
+    API, y cierra el stream al terminar para escribir la última parte.
+
+    Args:
+        stream (MyStream): Stream que recibe los datos.
+        path (str): Ruta al archivo NDJSON.
+        rate (float): Tweets por segundo. None para no limitar.
+
+    Returns:
+        dict: Métricas del stream.
+    """
+    ReplaySource(path, rate).feed(stream)
+    stream.close()
+    return stream.metrics()
+
+
+def run_stream(stream, search_terms):
+    """
+    Reemplaza las reglas del stream por `search_terms` y empieza la escucha.
+
+    Args:
+        stream (MyStream): Stream a ejecutar.
+        search_terms (list): Queries de búsqueda.
+
+    Returns:
+        None.
+    """
+    # Eliminar reglas anteriores
+    result_count = stream.get_rules().meta["result_count"]
+    print(f"Hay {result_count} queries previos")
+    if result_count > 0:
+        for i in range(result_count):
+            prev_id = stream.get_rules().data[0].id
+            stream.delete_rules(prev_id)
+
+    # Añadir nuevas reglas
+    for term in search_terms:
+        print(f"Se añade el query '{term}'")
+        stream.add_rules(tweepy.StreamRule(term))
+
+    # Streaming
+    stream.filter(tweet_fields=TWEET_FIELDS)
+
+
+def parse_args(argv=None):
+    # Parámetros de búsqueda
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--search_query", help="Twitter search query", nargs="+")
+    parser.add_argument(
+        "--tweets_number",
+        help="Number of desired tweets per search",
+        type=int,
+        default=10,
+    )
+    parser.add_argument(
+        "--parts",
+        help="Number of desired search (iterations) to do",
+        type=int,
+        default=3,
+    )
+    parser.add_argument(
+        "--name",
+        help="Name you want to assign to your search",
+        type=str,
+        default="programming",
+    )
+    parser.add_argument("--target_lang", help="Tweets Lang", type=str, default="es")
+    parser.add_argument(
+        "--file_format",
+        help="Storage format of each part: csv, parquet or feather",
+        type=str,
+        default="csv",
+    )
+    parser.add_argument(
+        "--queue_size",
+        help="Max raw tweets waiting to be processed before dropping new ones",
+        type=int,
+        default=10000,
+    )
+    parser.add_argument(
+        "--flush_interval",
+        help="Seconds after which a part is written even if it is not full",
+        type=float,
+        default=60.0,
+    )
+    parser.add_argument(
+        "--replay",
+        help="NDJSON file with recorded raw payloads to replay instead of the API",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--replay_rate",
+        help="Tweets per second when replaying (no limit by default)",
+        type=float,
+        default=None,
+    )
+
+    # Leer parámetros
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.replay:
+        bearer_token = "replay"
+    else:
+        from credentials import BEARER_TOKEN
+
+        # Definimos el secret token para la escucha
+        bearer_token = BEARER_TOKEN
+
+    stream = MyStream(
+        bearer_token=bearer_token,
+        desired_language=args.target_lang,
+        parts=args.parts,
+        number_of_tweets=args.tweets_number,
+        folder_name=args.name,
+        file_format=args.file_format,
+        queue_size=args.queue_size,
+        flush_interval=args.flush_interval,
+    )
+
+    if args.replay:
+        print(replay(stream, args.replay, args.replay_rate))
+    else:
+        run_stream(stream, args.search_query)
 
 
-stream = MyStream(
-    bearer_token=bearer_token,
-    desired_language=desired_language,
-    parts=parts,
-    number_of_tweets=number_of_tweets,
-    folder_name=folder_name,
-)
-
-# Eliminar reglas anteriores
-result_count = stream.get_rules().meta["result_count"]
-print(f"Hay {result_count} queries previos")
-if result_count > 0:
-    for i in range(result_count):
-        prev_id = stream.get_rules().data[0].id
-        stream.delete_rules(prev_id)
-
-# Añadir nuevas reglas
-for term in search_terms:
-    print(f"Se añade el query '{term}'")
-    stream.add_rules(tweepy.StreamRule(term))
-
-# Streaming
-stream.filter(
-    tweet_fields=[
-        "referenced_tweets",
-        "entities",
-        "created_at",
-        "public_metrics",
-        "context_annotations",
-        "lang",
-    ]
-)
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,136 @@
 import os
 import re
+import gzip
 import glob
 import pickle
+import itertools
+import functools
+import json
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.feather as feather
+import pyarrow.ipc as ipc
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from nltk.tokenize import TweetTokenizer
 
 tknzr = TweetTokenizer(strip_handles=True, reduce_len=True)
 
+# Textos distintos cuyo resultado recuerda `tokenizador`
+TOKENIZER_CACHE_SIZE = 2**18
 
-def read_social_listening_data(folder_name: str) -> pd.DataFrame:
+HASHTAG_PATTERN = re.compile(r"#\w+\b")
+SPECIAL_CHARACTERS_PATTERN = re.compile(r"[^a-zA-Z0-9\s]")
+# Ambas limpiezas en una sola expresión: quitar primero los hashtags y luego los
+# carácteres especiales da el mismo resultado que una única sustitución. Se
+# aplica con `re` y no con `Series.str.replace`: con las cadenas de pyarrow
+# este usa RE2, donde \w no incluye letras acentuadas ni la ñ
+CLEANING_PATTERN = re.compile(r"#\w+\b|[^a-zA-Z0-9\s]")
+
+# Extensión de cada formato de almacenamiento soportado
+STORAGE_FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+# Extensión de las respuestas crudas del modelo (JSONL comprimido)
+RESPONSES_EXTENSION = ".jsonl.gz"
+
+# Llave de los metadatos de Arrow con el índice y el tipo del objeto guardado
+STORE_METADATA = b"codificacion_store"
+# Llave de los metadatos de Arrow con las columnas anidadas y las guardadas
+# como texto JSON por `to_arrow_table`
+COLUMNS_METADATA = b"codificacion_columns"
+
+
+def list_social_listening_files(
+    folder_name: str, root_path: str = "../data/", file_format: str = "csv"
+) -> list:
+    """
+    Lista los archivos de la escucha social de un cliente.
+
+    Args:
+        folder_name (str): Nombre del folder del cliente de interés.
+        root_path (str): Carpeta que contiene los folders de los clientes.
+        file_format (str): "csv" para los archivos originales o "parquet" para
+            los escritos en Parquet por la escucha o con `convert_to_parquet`.
+
+    Returns:
+        list: Rutas de los archivos ordenadas por nombre.
+    """
+    folder_path = os.path.join(root_path, folder_name)
+    extension = ".parquet" if file_format == "parquet" else ".csv"
+    return sorted(glob.glob(f"{folder_path}/*{extension}"))
+
+
+def read_social_listening_file(
+    file: str, usecols: list = None, dtype: dict = None, chunksize: int = None
+):
+    """
+    Lee un archivo de la escucha social (.csv o .parquet).
+
+    Args:
+        file (str): Ruta del archivo.
+        usecols (list): Columnas a leer. None para leer todas.
+        dtype (dict): Tipos de las columnas del .csv.
+        chunksize (int): Si se indica, devuelve un iterador de DataFrames de
+            ese número de filas (solo .csv).
+
+    Returns:
+        pd.DataFrame: El contenido del archivo.
+    """
+    if file.endswith(".parquet"):
+        return pd.read_parquet(file, columns=usecols)
+    return pd.read_csv(
+        file,
+        encoding="ISO-8859-1",
+        on_bad_lines="skip",
+        usecols=usecols,
+        dtype=dtype,
+        chunksize=chunksize,
+    )
+
+
+def read_social_listening_data(
+    folder_name: str,
+    usecols: list = None,
+    dtype: dict = None,
+    n_jobs: int = None,
+    root_path: str = "../data/",
+    file_format: str = "csv",
+) -> pd.DataFrame:
     """
     Lee los archivos .csv resultado de la escucha social para un cliente
-    en particular y los concatena en un único dataframe.
+    en particular y los concatena en un único dataframe. Los archivos se leen
+    en paralelo.
 
     Args:
         folder_name (str): Nombre del folder del cliente de interés.
+        usecols (list): Columnas a leer. None para leer todas.
+        dtype (dict): Tipos de las columnas, para no inferirlos en cada archivo.
+        n_jobs (int): Número de hilos de lectura. None para usar uno por núcleo.
+        root_path (str): Carpeta que contiene los folders de los clientes.
+        file_format (str): "csv" o "parquet" (ver `convert_to_parquet`).
 
     Returns:
         pd.DataFrame: El dataframe concatenado de unir la escucha social.
     """
 
     folder_path = os.path.join(
-        "../data/", folder_name
+        root_path, folder_name
     )  # Replace with the path to your folder containing the CSV files
-    csv_files = glob.glob(
-        f"{folder_path}/*.csv"
-    )  # Get a list of all CSV file paths in the folder
+    files = list_social_listening_files(
+        folder_name, root_path, file_format
+    )  # Get a list of all file paths in the folder
 
     print(f"Ruta destino...{folder_path}")
-    dfs = []  # List to store individual DataFrames
 
-    # Iterate over each CSV file and read it into a DataFrame
-    for file in csv_files:
-        df = pd.read_csv(file, encoding="ISO-8859-1", on_bad_lines="skip")
-        dfs.append(df)
+    # Read every file into a DataFrame, several at a time
+    with ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count()) as executor:
+        dfs = list(
+            executor.map(
+                lambda file: read_social_listening_file(file, usecols, dtype), files
+            )
+        )
 
     # Concatenate all the DataFrames into a single DataFrame
     combined_df = pd.concat(dfs, ignore_index=True)
@@ -42,9 +138,86 @@ def read_social_listening_data(folder_name: str) -> pd.DataFrame:
     return combined_df
 
 
+def iter_social_listening_data(
+    folder_name: str,
+    chunksize: int = 100000,
+    usecols: list = None,
+    dtype: dict = None,
+    root_path: str = "../data/",
+    file_format: str = "csv",
+):
+    """
+    Recorre la escucha social de un cliente por bloques de filas, sin cargar
+    el corpus completo en memoria.
+
+    Args:
+        folder_name (str): Nombre del folder del cliente de interés.
+        chunksize (int): Número máximo de filas por bloque.
+        usecols (list): Columnas a leer. None para leer todas.
+        dtype (dict): Tipos de las columnas.
+        root_path (str): Carpeta que contiene los folders de los clientes.
+        file_format (str): "csv" o "parquet".
+
+    Returns:
+        Generador de DataFrames.
+    """
+    for file in list_social_listening_files(folder_name, root_path, file_format):
+        if file_format == "parquet":
+            parquet_file = pq.ParquetFile(file)
+            for batch in parquet_file.iter_batches(
+                batch_size=chunksize, columns=usecols
+            ):
+                yield batch.to_pandas()
+        else:
+            with read_social_listening_file(file, usecols, dtype, chunksize) as reader:
+                for chunk in reader:
+                    yield chunk
+
+
+def convert_to_parquet(
+    folder_name: str,
+    usecols: list = None,
+    dtype: dict = None,
+    root_path: str = "../data/",
+) -> list:
+    """
+    Convierte los .csv de la escucha social de un cliente a archivos Parquet
+    junto a ellos, en la misma carpeta donde la escucha escribe sus partes en
+    Parquet. Solo se convierten los .csv que no tienen su Parquet o que
+    cambiaron después de la última conversión.
+
+    Args:
+        folder_name (str): Nombre del folder del cliente de interés.
+        usecols (list): Columnas a conservar. None para conservar todas.
+        dtype (dict): Tipos de las columnas.
+        root_path (str): Carpeta que contiene los folders de los clientes.
+
+    Returns:
+        list: Rutas de los archivos Parquet escritos.
+    """
+    folder_path = os.path.join(root_path, folder_name)
+    written = []
+    for file in list_social_listening_files(folder_name, root_path):
+        name = os.path.splitext(os.path.basename(file))[0]
+        target = os.path.join(folder_path, f"{name}.parquet")
+        if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(
+            file
+        ):
+            continue
+        df = read_social_listening_file(file, usecols, dtype)
+        df.to_parquet(target, index=False)
+        written.append(target)
+
+    print(f"Archivos convertidos a Parquet: {len(written)}")
+    return written
+
+
+@functools.lru_cache(maxsize=TOKENIZER_CACHE_SIZE)
 def tokenizador(text: str) -> str:
     """
-    Elimina los carácteres especiales de los tweets
+    Elimina los carácteres especiales de los tweets. Los resultados de los
+    últimos TOKENIZER_CACHE_SIZE textos distintos se guardan en memoria, de
+    modo que un tweet repetido (retweets, copias) se tokeniza una sola vez.
 
     Args:
         text (str): Tweet a limpiar.
@@ -58,44 +231,555 @@ def tokenizador(text: str) -> str:
 
 def remove_word_after_hashtag(string):
     # Use regular expression pattern to match the word after a hashtag
-    pattern = r"#\w+\b"
-    modified_string = re.sub(pattern, "", string)
+    modified_string = HASHTAG_PATTERN.sub("", string)
 
     return modified_string
 
 
 def remove_special_characters(string):
     # Remove special characters using regular expressions
-    pattern = r"[^a-zA-Z0-9\s]"
-    string = re.sub(pattern, "", string)
+    string = SPECIAL_CHARACTERS_PATTERN.sub("", string)
 
     return string
 
 
-def clean_text(df: pd.DataFrame, variable: str = "text") -> pd.DataFrame:
+def tokenize_texts(texts: list) -> list:
+    """
+    Aplica `tokenizador` a una lista de textos en una sola pasada.
+
+    Args:
+        texts (list): Tweets a tokenizar.
+
+    Returns:
+        list: Textos tokenizados.
+    """
+    return [tokenizador(text) for text in texts]
+
+
+def clean_text(
+    df: pd.DataFrame,
+    variable: str = "text",
+    n_jobs: int = 1,
+    chunksize: int = 50000,
+    deduplicate: bool = True,
+    as_category: bool = False,
+) -> pd.DataFrame:
     """
-    Aplica la limpieza a cada instancia del dataframe.
+    Aplica la limpieza a cada instancia del dataframe: tokenización de tweets,
+    eliminación de hashtags y de carácteres especiales y paso a minúsculas.
+
+    La tokenización, la eliminación de hashtags y de carácteres especiales
+    (con una sola expresión regular) y el paso a minúsculas se hacen en una
+    sola pasada por texto. Con
+    `deduplicate` cada texto distinto se limpia una sola vez y el resultado
+    se reparte a sus copias con los códigos de `pd.factorize`.
 
     Args:
         df (pd.DataFrame): Data Frame con columna de texto objetivo a limpiar.
         variable (str): Nombre de la columna que contiene el texto a limpiar.
+        n_jobs (int): Número de procesos para tokenizar. Con -1 se usan todos
+            los núcleos disponibles.
+        chunksize (int): Número de textos que se envía a cada proceso.
+        deduplicate (bool): Si es True, solo se limpian los textos distintos.
+        as_category (bool): Si es True, el resultado es una Serie categórica,
+            que ocupa mucho menos memoria cuando hay muchos textos repetidos.
 
     Returns:
         pd.Series: pandas Series de la columna de texto limpia.
     """
-    data_cleaned = (
-        df[variable]
-        .map(tokenizador)
-        .map(remove_word_after_hashtag)
-        .map(remove_special_characters)
-        .map(lambda x: x.lower())
+    if deduplicate or as_category:
+        codes, uniques = pd.factorize(df[variable])
+        cleaned = clean_text(
+            pd.DataFrame({variable: uniques}),
+            variable,
+            n_jobs,
+            chunksize,
+            deduplicate=False,
+        )
+        if as_category:
+            # Textos distintos pueden quedar iguales después de limpiarlos
+            cleaned_codes, categories = pd.factorize(cleaned)
+            # El -1 agregado al final conserva los valores faltantes
+            codes = np.append(cleaned_codes, -1)[codes]
+            values = pd.Categorical.from_codes(codes, categories)
+        else:
+            values = cleaned.array.take(codes, allow_fill=True)
+        return pd.Series(values, index=df.index, name=variable)
+
+    texts = df[variable].tolist()
+    if n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+
+    if n_jobs > 1 and len(texts) > chunksize:
+        chunks = [texts[i : (i + chunksize)] for i in range(0, len(texts), chunksize)]
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            tokenized = list(
+                itertools.chain.from_iterable(executor.map(tokenize_texts, chunks))
+            )
+    else:
+        tokenized = tokenize_texts(texts)
+
+    data_cleaned = pd.Series(
+        [CLEANING_PATTERN.sub("", text).lower() for text in tokenized],
+        index=df.index,
+        name=variable,
     )
 
     return data_cleaned
 
 
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def _to_json(value):
+    # Los escalares y arreglos de numpy se guardan como sus valores de Python
+    if _is_missing(value):
+        return None
+    return json.dumps(
+        value,
+        ensure_ascii=False,
+        default=lambda x: x.tolist() if hasattr(x, "tolist") else str(x),
+    )
+
+
+def to_arrow_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Convierte un DataFrame en una tabla de Arrow conservando las columnas
+    anidadas (diccionarios y listas) como tipos nativos cuando Arrow las
+    representa sin pérdida. Las demás columnas de objetos (por ejemplo con
+    tipos distintos entre filas, diccionarios vacíos o con llaves distintas)
+    se guardan como texto JSON. Ambos grupos de columnas quedan en los
+    metadatos del esquema para que `restore_columns` los reconstruya al leer.
+
+    Args:
+        df (pd.DataFrame): DataFrame a convertir.
+
+    Returns:
+        pa.Table: Tabla de Arrow.
+    """
+    json_columns, nested_columns = [], []
+    for column in df.columns:
+        if df[column].dtype != object:
+            continue
+        try:
+            array = pa.array(df[column], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            json_columns.append(column)
+            continue
+        if not pa.types.is_nested(array.type):
+            continue
+        # Los structs completan con nulos las llaves que faltan en cada fila
+        values = [None if _is_missing(value) else value for value in df[column]]
+        try:
+            lossless = array.to_pylist() == values
+        except ValueError:
+            # Arreglos de numpy: se conserva la conversión nativa
+            continue
+        if lossless:
+            nested_columns.append(column)
+        else:
+            json_columns.append(column)
+
+    if json_columns:
+        df = df.copy()
+        for column in json_columns:
+            print(f"La columna {column} se guarda como texto JSON")
+            df[column] = df[column].map(_to_json).astype(object)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if json_columns or nested_columns:
+        metadata = {
+            "json": [str(column) for column in json_columns],
+            "nested": [str(column) for column in nested_columns],
+        }
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), COLUMNS_METADATA: json.dumps(metadata)}
+        )
+    return table
+
+
+def restore_columns(table: pa.Table) -> pd.DataFrame:
+    """
+    Convierte una tabla escrita con `to_arrow_table` en un DataFrame,
+    devolviendo las columnas anidadas como listas y diccionarios de Python (y
+    no como arreglos de numpy) y decodificando las guardadas como JSON.
+
+    Args:
+        table (pa.Table): Tabla leída.
+
+    Returns:
+        pd.DataFrame: El DataFrame original.
+    """
+    df = table.to_pandas()
+    raw = (table.schema.metadata or {}).get(COLUMNS_METADATA)
+    if raw is None:
+        return df
+    metadata = json.loads(raw)
+    for column in metadata["nested"]:
+        if column in df.columns:
+            df[column] = pd.Series(
+                table.column(column).to_pylist(), index=df.index, dtype=object
+            )
+    for column in metadata["json"]:
+        if column in df.columns:
+            df[column] = pd.Series(
+                [
+                    None if value is None else json.loads(value)
+                    for value in table.column(column).to_pylist()
+                ],
+                index=df.index,
+                dtype=object,
+            )
+    return df
+
+
+def write_frame(
+    df: pd.DataFrame,
+    file_path: str,
+    file_format: str = "csv",
+    partition_cols: list = None,
+    compression: str = "zstd",
+) -> None:
+    """
+    Escribe un DataFrame en el formato indicado.
+
+    Args:
+        df (pd.DataFrame): DataFrame a guardar.
+        file_path (str): Ruta del archivo, o de la carpeta del dataset si se
+            indica `partition_cols`.
+        file_format (str): "csv", "parquet" o "feather".
+        partition_cols (list): Columnas por las que se particiona el dataset
+            Parquet, por ejemplo ["client", "date"].
+        compression (str): Compresión de Parquet y Feather.
+
+    Returns:
+        None.
+    """
+    if file_format not in STORAGE_FORMATS:
+        raise ValueError(f"Formato no soportado: {file_format}")
+
+    if file_format == "csv":
+        df.to_csv(file_path, index=False)
+        return
+
+    table = to_arrow_table(df)
+    if file_format == "feather":
+        feather.write_feather(table, file_path, compression=compression)
+    elif partition_cols:
+        pq.write_to_dataset(
+            table, file_path, partition_cols=partition_cols, compression=compression
+        )
+    else:
+        pq.write_table(table, file_path, compression=compression)
+
+
+def read_frame(
+    file_path: str, columns: list = None, filters: list = None
+) -> pd.DataFrame:
+    """
+    Lee un DataFrame guardado con `write_frame`. El formato se deduce de la
+    extensión; una carpeta se lee como dataset Parquet particionado.
+
+    Args:
+        file_path (str): Ruta del archivo o carpeta.
+        columns (list): Columnas a leer. None para leer todas.
+        filters (list): Filtros de Parquet que se aplican al leer, por ejemplo
+            [("date", "=", "2023-06-01")].
+
+    Returns:
+        pd.DataFrame: El DataFrame leído.
+    """
+    if file_path.endswith(".csv"):
+        return pd.read_csv(file_path, usecols=columns)
+    if file_path.endswith(".feather"):
+        return restore_columns(feather.read_table(file_path, columns=columns))
+    return restore_columns(pq.read_table(file_path, columns=columns, filters=filters))
+
+
+def save_responses(responses, file_path: str, compresslevel: int = 6) -> None:
+    """
+    Guarda respuestas crudas del modelo como JSONL comprimido con gzip, una
+    respuesta por línea. El archivo se escribe completo antes de reemplazar
+    al anterior, de modo que una interrupción no deja un archivo a medias.
+
+    Args:
+        responses: Lista o iterador de respuestas (str o None).
+        file_path (str): Ruta del archivo, normalmente terminada en ".jsonl.gz".
+        compresslevel (int): Nivel de compresión de gzip.
+
+    Returns:
+        None.
+    """
+    temporary_path = file_path + ".tmp"
+    with gzip.open(
+        temporary_path, "wt", encoding="utf-8", compresslevel=compresslevel
+    ) as file:
+        for response in responses:
+            file.write(json.dumps(response, ensure_ascii=False) + "\n")
+    os.replace(temporary_path, file_path)
+
+
+def iter_responses(file_path: str):
+    """
+    Recorre las respuestas guardadas con `save_responses` sin cargarlas todas
+    en memoria.
+
+    Args:
+        file_path (str): Ruta del archivo.
+
+    Returns:
+        Generador de respuestas.
+    """
+    with gzip.open(file_path, "rt", encoding="utf-8") as file:
+        for line in file:
+            yield json.loads(line)
+
+
+def load_responses(file_path: str) -> list:
+    """
+    Lee todas las respuestas guardadas con `save_responses`.
+
+    Args:
+        file_path (str): Ruta del archivo.
+
+    Returns:
+        list: Lista de respuestas.
+    """
+    return list(iter_responses(file_path))
+
+
+def save_table(obj, file_path: str, compression: str = "zstd") -> None:
+    """
+    Guarda un DataFrame o una Serie de resultados conservando su índice. Con
+    extensión ".arrow" se escribe en formato Arrow IPC sin comprimir, que se
+    lee mapeado en memoria sin copiar las columnas numéricas; con cualquier
+    otra, en Parquet.
+
+    Args:
+        obj (pd.DataFrame | pd.Series): Objeto a guardar.
+        file_path (str): Ruta del archivo.
+        compression (str): Compresión de Parquet.
+
+    Returns:
+        None.
+    """
+    is_series = isinstance(obj, pd.Series)
+    df = (
+        obj.to_frame(obj.name if obj.name is not None else "value")
+        if is_series
+        else obj
+    )
+    index_names = list(df.index.names)
+    index_columns = [
+        f"__index_{n}__" if name is None or name in df.columns else str(name)
+        for n, name in enumerate(index_names)
+    ]
+    df = df.copy()
+    df.index = df.index.set_names(index_columns)
+    table = to_arrow_table(df.reset_index())
+    metadata = {
+        "index_columns": index_columns,
+        "index_names": index_names,
+        "series": obj.name if is_series else False,
+    }
+    table = table.replace_schema_metadata(
+        {**(table.schema.metadata or {}), STORE_METADATA: json.dumps(metadata)}
+    )
+
+    temporary_path = file_path + ".tmp"
+    if file_path.endswith(".arrow"):
+        with ipc.new_file(temporary_path, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, temporary_path, compression=compression)
+    os.replace(temporary_path, file_path)
+
+
+def _from_store_table(table: pa.Table):
+    # Reconstruye el índice, las columnas anidadas o en JSON y, si
+    # corresponde, la Serie original
+    df = restore_columns(table)
+    raw = (table.schema.metadata or {}).get(STORE_METADATA)
+    if raw is None:
+        return df
+    metadata = json.loads(raw)
+    index_columns = [c for c in metadata["index_columns"] if c in df.columns]
+    if index_columns:
+        df = df.set_index(index_columns)
+        df.index = df.index.set_names(metadata["index_names"][: len(index_columns)])
+    if metadata["series"] is not False and len(df.columns) == 1:
+        series = df.iloc[:, 0]
+        return series.rename(metadata["series"])
+    return df
+
+
+def _store_columns(schema: pa.Schema, columns: list) -> list:
+    # Las columnas del índice se leen siempre
+    if columns is None:
+        return None
+    raw = (schema.metadata or {}).get(STORE_METADATA)
+    index_columns = json.loads(raw)["index_columns"] if raw else []
+    return index_columns + [c for c in columns if c not in index_columns]
+
+
+def read_table(file_path: str, columns: list = None, memory_map: bool = True):
+    """
+    Lee un DataFrame o una Serie guardados con `save_table`.
+
+    Args:
+        file_path (str): Ruta del archivo.
+        columns (list): Columnas a leer, además del índice. None para todas.
+        memory_map (bool): Si es True, el archivo se mapea en memoria en lugar
+            de leerse completo a un buffer.
+
+    Returns:
+        pd.DataFrame | pd.Series: El objeto guardado.
+    """
+    if file_path.endswith(".arrow"):
+        source = pa.memory_map(file_path) if memory_map else pa.OSFile(file_path)
+        with source:
+            table = ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(_store_columns(table.schema, columns))
+        return _from_store_table(table)
+
+    schema = pq.read_schema(file_path, memory_map=memory_map)
+    table = pq.read_table(
+        file_path, columns=_store_columns(schema, columns), memory_map=memory_map
+    )
+    return _from_store_table(table)
+
+
+def iter_table(file_path: str, batch_size: int = 100000, columns: list = None):
+    """
+    Recorre un archivo guardado con `save_table` por bloques de filas, sin
+    cargarlo completo en memoria.
+
+    Args:
+        file_path (str): Ruta del archivo.
+        batch_size (int): Número máximo de filas por bloque.
+        columns (list): Columnas a leer, además del índice. None para todas.
+
+    Returns:
+        Generador de DataFrames o Series.
+    """
+    if file_path.endswith(".arrow"):
+        with pa.memory_map(file_path) as source:
+            reader = ipc.open_file(source)
+            selected = _store_columns(reader.schema, columns)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                for start in range(0, batch.num_rows, batch_size):
+                    table = pa.Table.from_batches([batch.slice(start, batch_size)])
+                    if selected is not None:
+                        table = table.select(selected)
+                    yield _from_store_table(
+                        table.replace_schema_metadata(reader.schema.metadata)
+                    )
+        return
+
+    parquet_file = pq.ParquetFile(file_path, memory_map=True)
+    selected = _store_columns(parquet_file.schema_arrow, columns)
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=selected):
+        table = pa.Table.from_batches([batch]).replace_schema_metadata(
+            parquet_file.schema_arrow.metadata
+        )
+        yield _from_store_table(table)
+
+
+def is_response_list(obj) -> bool:
+    """
+    Indica si un objeto es una lista de respuestas crudas del modelo.
+
+    Args:
+        obj: Objeto a revisar.
+
+    Returns:
+        bool: True si es una lista o tupla de strings (o None).
+    """
+    return isinstance(obj, (list, tuple)) and all(
+        response is None or isinstance(response, str) for response in obj
+    )
+
+
+def save_object(obj, file_path: str) -> str:
+    """
+    Guarda respuestas crudas o resultados en el formato que corresponde a su
+    tipo: listas de respuestas como JSONL comprimido y DataFrames o Series
+    como Parquet. La extensión se agrega a `file_path` (sin extensión).
+
+    Args:
+        obj: Lista de respuestas, DataFrame o Serie.
+        file_path (str): Ruta del archivo sin extensión.
+
+    Returns:
+        str: Ruta del archivo escrito.
+    """
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        file_path += STORAGE_FORMATS["parquet"]
+        save_table(obj, file_path)
+    elif is_response_list(obj):
+        file_path += RESPONSES_EXTENSION
+        save_responses(obj, file_path)
+    else:
+        raise TypeError(
+            f"No se puede guardar un objeto de tipo {type(obj).__name__}: "
+            "solo listas de respuestas, DataFrames o Series"
+        )
+    return file_path
+
+
+def load_object(file_path: str, lazy: bool = False):
+    """
+    Lee un archivo guardado con `save_object` según su extensión. Los ".pkl"
+    anteriores también se leen, pero pickle puede ejecutar código al cargar:
+    solo deben abrirse archivos propios (ver `migrate_pickle`).
+
+    Args:
+        file_path (str): Ruta del archivo.
+        lazy (bool): Si es True, las respuestas y las tablas se devuelven como
+            iteradores en lugar de cargarse completas.
+
+    Returns:
+        Las respuestas, el DataFrame o la Serie guardados.
+    """
+    if file_path.endswith(RESPONSES_EXTENSION):
+        return iter_responses(file_path) if lazy else load_responses(file_path)
+    if file_path.endswith((".parquet", ".arrow")):
+        return iter_table(file_path) if lazy else read_table(file_path)
+    if file_path.endswith(".pkl"):
+        with open(file_path, "rb") as file:
+            return pickle.load(file)
+    return read_frame(file_path)
+
+
+def migrate_pickle(file_path: str, remove: bool = False) -> str:
+    """
+    Convierte un ".pkl" guardado con `save_pickle_object` al formato de
+    `save_object`, junto al archivo original.
+
+    Args:
+        file_path (str): Ruta del ".pkl". Debe ser un archivo propio.
+        remove (bool): Si es True, se borra el ".pkl" después de convertirlo.
+
+    Returns:
+        str: Ruta del archivo nuevo.
+    """
+    with open(file_path, "rb") as file:
+        obj = pickle.load(file)
+    new_path = save_object(obj, os.path.splitext(file_path)[0])
+    if remove:
+        os.remove(file_path)
+    return new_path
+
+
 def save_pandas_object(
-    df: pd.DataFrame, root_path: str, subfolder: str, name: str
+    df: pd.DataFrame,
+    root_path: str,
+    subfolder: str,
+    name: str,
+    file_format: str = "csv",
+    partition_cols: list = None,
 ) -> None:
     """
     Guardar los resultados de la escucha en la carpeta "data.
@@ -105,6 +789,10 @@ def save_pandas_object(
         df (pd.DataFrame): Archivo a guardar.
         subfolder (str): Subfolder en data donde se guardarán los datos.
         name (str): Nombre que se quiere para los archivos.
+        file_format (str): "csv", "parquet" o "feather". En Parquet y Feather
+            las columnas anidadas se guardan con sus tipos nativos.
+        partition_cols (list): Columnas por las que se particiona el dataset
+            Parquet (por ejemplo cliente y fecha).
 
     Returns:
         None.
@@ -119,22 +807,29 @@ def save_pandas_object(
         print(f"Root directory already exists at {folder_path}")
 
     # Proceed with saving the file in the root directory
+    if file_format != "csv":
+        name = os.path.splitext(name)[0]
+        if not partition_cols:
+            name += STORAGE_FORMATS[file_format]
     file_path = os.path.join(folder_path, f"{name}")
-    df.to_csv(file_path, index=False)
+    write_frame(df, file_path, file_format, partition_cols)
 
 
-def save_pickle_object(obj, root_path: str, subfolder: str, name: str) -> None:
+def save_pickle_object(obj, root_path: str, subfolder: str, name: str) -> str:
     """
-    Save a file as a pickle file in the specified directory.
+    Save raw responses or coded results in the specified directory. Despite
+    its name, lists of responses are written as compressed JSONL and
+    DataFrames or Series as Parquet (see `save_object`); only other objects
+    are still pickled.
 
     Args:
         obj : Object to be saved.
         root_path (str): Root directory path where the file will be saved.
         subfolder (str): Subfolder in the root directory where the file will be saved.
-        name (str): Name for the file.
+        name (str): Name for the file, without extension.
 
     Returns:
-        None.
+        str: Path of the saved file.
     """
     folder_path = os.path.join(root_path, subfolder)
 
@@ -147,7 +842,12 @@ def save_pickle_object(obj, root_path: str, subfolder: str, name: str) -> None:
         print(f"Root directory already exists at {folder_path}")
 
     # Proceed with saving the file in the root directory
-    file_path = os.path.join(folder_path, f"{name}.pkl")
-    with open(file_path, "wb") as f:
-        pickle.dump(obj, f)
-    print(f"File saved as pickle file: {file_path}")
+    file_path = os.path.join(folder_path, name)
+    if isinstance(obj, (pd.DataFrame, pd.Series)) or is_response_list(obj):
+        file_path = save_object(obj, file_path)
+    else:
+        file_path += ".pkl"
+        with open(file_path, "wb") as f:
+            pickle.dump(obj, f)
+    print(f"File saved: {file_path}")
+    return file_path
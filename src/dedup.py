@@ -0,0 +1,246 @@
+import zlib
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from cache import normalize_text
+
+# Primo de Mersenne 2^31 - 1 para las permutaciones (a * x + b) mod p
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+class Deduplicator:
+
+    """
+    Agrupa frases duplicadas antes de codificarlas. Las copias exactas (mismo
+    texto normalizado) se detectan por hash y las casi duplicadas con MinHash
+    sobre n-gramas de caracteres y LSH por bandas; un candidato solo se une a
+    un grupo si su similitud de Jaccard estimada con el representante supera
+    `threshold`.
+
+    El estado se conserva entre llamadas a `assign`, de modo que un corpus
+    puede procesarse por partes: cada frase nueva se compara con los
+    representantes de todas las partes anteriores. Está pensado para el
+    resultado de `clean_text`.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 5,
+        seed: int = 0,
+        max_bucket: int = 32,
+    ):
+        """
+        Args:
+            threshold (float): Similitud de Jaccard mínima para considerar dos
+                frases casi duplicadas. None para colapsar solo copias exactas.
+            num_perm (int): Número de permutaciones de la firma MinHash.
+            bands (int): Número de bandas del LSH. Debe dividir a `num_perm`;
+                más bandas encuentran más candidatos con similitud baja.
+            shingle_size (int): Largo de los n-gramas de caracteres.
+            seed (int): Semilla de las permutaciones.
+            max_bucket (int): Representantes que se guardan por cubeta del LSH.
+                Acota el costo de las bandas muy frecuentes (por ejemplo
+                fragmentos comunes a muchas frases).
+        """
+        if num_perm % bands:
+            raise ValueError("bands debe dividir a num_perm")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_bucket = max_bucket
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)[:, None]
+
+        self.exact = {}
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = {}
+        self.stats = {"phrases": 0, "exact_duplicates": 0, "near_duplicates": 0}
+
+    def shingles(self, text: str) -> np.ndarray:
+        """
+        Hash de 32 bits de cada n-grama de caracteres distinto de un texto.
+
+        Args:
+            text (str): Texto normalizado.
+
+        Returns:
+            np.ndarray: Arreglo de hashes.
+        """
+        size = self.shingle_size
+        grams = {text[i : (i + size)] for i in range(max(1, len(text) - size + 1))}
+        return np.fromiter(
+            (zlib.crc32(gram.encode("utf-8")) & MERSENNE_PRIME for gram in grams),
+            dtype=np.uint64,
+            count=len(grams),
+        )
+
+    def signatures_of(self, texts: list, max_shingles: int = 50000) -> np.ndarray:
+        """
+        Calcula las firmas MinHash de varios textos. Los n-gramas de varios
+        textos se permutan juntos y se reducen por texto, en bloques de a lo
+        más `max_shingles` n-gramas para acotar la memoria.
+
+        Args:
+            texts (list): Textos normalizados.
+            max_shingles (int): n-gramas por bloque.
+
+        Returns:
+            np.ndarray: Matriz (len(texts), num_perm) de firmas.
+        """
+        result = np.empty((len(texts), self.num_perm), dtype=np.uint64)
+        shingles = [self.shingles(text) for text in texts]
+        start = 0
+        while start < len(texts):
+            end, total = start, 0
+            while end < len(texts) and (end == start or total < max_shingles):
+                total += len(shingles[end])
+                end += 1
+            block = shingles[start:end]
+            hashes = np.concatenate(block)
+            offsets = np.cumsum([0] + [len(s) for s in block[:-1]])
+            permuted = (self._a * hashes + self._b) % MERSENNE_PRIME
+            result[start:end] = np.minimum.reduceat(permuted, offsets, axis=1).T
+            start = end
+        return result
+
+    def _band_keys(self, signature: np.ndarray) -> list:
+        rows = self.rows
+        return [
+            signature[band * rows : (band + 1) * rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def _near_representative(self, signature: np.ndarray, band_keys: list):
+        # Representante candidato más parecido, si su similitud supera el umbral
+        candidates = list(
+            dict.fromkeys(
+                candidate
+                for band, key in enumerate(band_keys)
+                for candidate in self.buckets[band].get(key, ())
+            )
+        )
+        if not candidates:
+            return None
+        matrix = np.stack([self.signatures[candidate] for candidate in candidates])
+        similarity = (matrix == signature).mean(axis=1)
+        best = int(similarity.argmax())
+        return candidates[best] if similarity[best] >= self.threshold else None
+
+    def assign(self, ids: list, texts: list) -> list:
+        """
+        Asigna a cada frase el id del representante de su grupo. El
+        representante es la primera frase vista del grupo, que se asigna a sí
+        misma.
+
+        Args:
+            ids (list): Identificadores de las frases.
+            texts (list): Textos de las frases.
+
+        Returns:
+            list: Id del representante de cada frase, en el mismo orden.
+        """
+        normalized = [normalize_text(text) for text in texts]
+        digests = [
+            hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+            for text in normalized
+        ]
+
+        # Las firmas solo se calculan para los textos que no son copias exactas
+        new_positions, seen = [], set()
+        for n, digest in enumerate(digests):
+            if digest not in self.exact and digest not in seen:
+                seen.add(digest)
+                new_positions.append(n)
+        signatures = {}
+        if self.threshold is not None and new_positions:
+            matrix = self.signatures_of([normalized[n] for n in new_positions])
+            signatures = dict(zip(new_positions, matrix))
+
+        representatives = []
+        for n, (id_i, digest) in enumerate(zip(ids, digests)):
+            self.stats["phrases"] += 1
+            if digest in self.exact:
+                self.stats["exact_duplicates"] += 1
+                representatives.append(self.exact[digest])
+                continue
+
+            representative = None
+            if n in signatures:
+                band_keys = self._band_keys(signatures[n])
+                representative = self._near_representative(signatures[n], band_keys)
+            if representative is not None:
+                self.stats["near_duplicates"] += 1
+            else:
+                representative = id_i
+                if n in signatures:
+                    self.signatures[id_i] = signatures[n]
+                    for band, key in enumerate(band_keys):
+                        bucket = self.buckets[band].setdefault(key, [])
+                        if len(bucket) < self.max_bucket:
+                            bucket.append(id_i)
+            self.exact[digest] = representative
+            representatives.append(representative)
+
+        return representatives
+
+    def report(self) -> dict:
+        """
+        Resumen de las frases vistas.
+
+        Returns:
+            dict: Frases, frases únicas, copias exactas y casi duplicadas.
+        """
+        duplicates = self.stats["exact_duplicates"] + self.stats["near_duplicates"]
+        return {
+            **self.stats,
+            "unique": self.stats["phrases"] - duplicates,
+            "unique_ratio": (self.stats["phrases"] - duplicates)
+            / max(1, self.stats["phrases"]),
+        }
+
+
+def group_members(ids: list, representatives: list) -> dict:
+    """
+    Agrupa los ids que no son representantes bajo el id de su representante.
+
+    Args:
+        ids (list): Identificadores de las frases.
+        representatives (list): Representante de cada frase, de `assign`.
+
+    Returns:
+        dict: Diccionario representante -> lista de ids duplicados (como strings).
+    """
+    members = {}
+    for id_i, representative in zip(ids, representatives):
+        if id_i != representative:
+            members.setdefault(str(representative), []).append(str(id_i))
+    return members
+
+
+def fan_out(labels: pd.Series, ids: list, representatives: list) -> pd.Series:
+    """
+    Extiende las etiquetas de los representantes a todas las frases de su grupo.
+
+    Args:
+        labels (pd.Series): Etiquetas indexadas por el id (string) de cada representante.
+        ids (list): Identificadores de todas las frases.
+        representatives (list): Representante de cada frase, de `assign`.
+
+    Returns:
+        pd.Series: Etiquetas indexadas por el id (string) de cada frase.
+    """
+    return pd.Series(
+        labels.reindex([str(r) for r in representatives]).values,
+        index=[str(id_i) for id_i in ids],
+        dtype=labels.dtype,
+    )
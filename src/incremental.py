@@ -0,0 +1,293 @@
+"""
+Codificación incremental de la escucha social de un cliente.
+
+`MyStream` escribe las partes `data_1.csv`, `data_2.csv`, ... en la carpeta
+del cliente. Un manifiesto en el directorio de salida guarda, por cada parte
+ya codificada, su fecha de modificación, tamaño y hash; cada corrida lee y
+codifica solo las partes nuevas o modificadas, saltando los ids que ya tienen
+resultado en el checkpoint de la tarea, y combina lo nuevo con los resultados
+anteriores.
+
+Uso:
+    python incremental.py --task sentiment --folder_name cliente
+    python incremental.py --task topics --folder_name cliente --num_topicos 3 --since_hours 24
+"""
+
+import os
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from checkpoint import Checkpoint
+from codification import Codificacion
+from data.utils import (
+    clean_text,
+    list_social_listening_files,
+    read_social_listening_file,
+)
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Hash del contenido de un archivo, leído por bloques.
+
+    Args:
+        path (str): Ruta del archivo.
+        chunk_size (int): Bytes por bloque.
+
+    Returns:
+        str: Hash hexadecimal.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_snapshot(path: str) -> dict:
+    """
+    Fecha de modificación, tamaño y hash actuales de un archivo.
+
+    Args:
+        path (str): Ruta del archivo.
+
+    Returns:
+        dict: Llaves "mtime", "size" y "hash".
+    """
+    stat = os.stat(path)
+    return {"mtime": stat.st_mtime, "size": stat.st_size, "hash": file_hash(path)}
+
+
+class Manifest:
+
+    """
+    Registro en JSON de las partes de un cliente ya codificadas para una
+    tarea. Una parte se considera sin cambios si su fecha de modificación y su
+    tamaño coinciden con los registrados; si solo cambió la fecha, se compara
+    el hash del contenido antes de volver a leerla.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Ruta del archivo JSON. Se crea al guardar.
+        """
+        folder_path = os.path.dirname(path)
+        if folder_path and not os.path.exists(folder_path):
+            os.makedirs(folder_path)
+        self.path = path
+        self.parts = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                self.parts = json.load(file)["parts"]
+
+    def is_current(self, file: str) -> bool:
+        """
+        Indica si una parte ya fue codificada y no cambió desde entonces.
+
+        Args:
+            file (str): Ruta de la parte.
+
+        Returns:
+            bool: True si la parte se puede saltar.
+        """
+        entry = self.parts.get(os.path.basename(file))
+        if entry is None:
+            return False
+        stat = os.stat(file)
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime == entry["mtime"]:
+            return True
+        # Copiada o tocada sin cambios: basta con actualizar la fecha
+        if file_hash(file) == entry["hash"]:
+            entry["mtime"] = stat.st_mtime
+            return True
+        return False
+
+    def record(self, file: str, snapshot: dict, rows: int) -> None:
+        """
+        Registra una parte como codificada.
+
+        Args:
+            file (str): Ruta de la parte.
+            snapshot (dict): Resultado de `file_snapshot` tomado antes de leer
+                la parte, de modo que si cambió mientras se codificaba la
+                próxima corrida la vuelva a leer.
+            rows (int): Frases de la parte.
+
+        Returns:
+            None.
+        """
+        self.parts[os.path.basename(file)] = {
+            **snapshot,
+            "rows": rows,
+            "coded_at": time.time(),
+        }
+
+    def save(self) -> None:
+        """
+        Escribe el manifiesto reemplazando el anterior de forma atómica.
+
+        Returns:
+            None.
+        """
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump({"parts": self.parts}, file, ensure_ascii=False, indent=1)
+        os.replace(temporary_path, self.path)
+
+
+def load_results(checkpoint_path: str) -> pd.Series:
+    """
+    Resultados acumulados de un checkpoint, indexados por id y ordenados.
+
+    Args:
+        checkpoint_path (str): Archivo JSONL del checkpoint.
+
+    Returns:
+        pd.Series: Resultado de cada frase.
+    """
+    results = {}
+    for record in Checkpoint(checkpoint_path):
+        results.update(record["results"])
+    return pd.Series(results, dtype=object).sort_index()
+
+
+def code_incremental(
+    codificacion: Codificacion,
+    task: str,
+    folder_name: str,
+    column_name: str,
+    id_column: str,
+    output_dir: str = None,
+    batch_size: int = None,
+    root_path: str = "../data/",
+    file_format: str = "csv",
+    clean: bool = False,
+    since: float = None,
+    n_jobs: int = None,
+    **params,
+) -> pd.Series:
+    """
+    Codifica solo las partes de la escucha de un cliente que son nuevas o
+    cambiaron desde la última corrida y devuelve los resultados acumulados de
+    todas las corridas. Una parte queda registrada en el manifiesto solo si
+    todas sus frases tienen resultado; las que fallan se reintentan en la
+    corrida siguiente.
+
+    Args:
+        codificacion (Codificacion): Instancia con la que se codifica.
+        task (str): Nombre de la tarea (una de las llaves de PROMPTS).
+        folder_name (str): Carpeta del cliente, como en `read_social_listening_data`.
+        column_name (str): Nombre de la columna que contiene las frases.
+        id_column (str): Nombre de la columna que contiene los identificadores.
+        output_dir (str): Directorio del manifiesto y del checkpoint. Por
+            defecto "../artifacts/{folder_name}/{task}_incremental".
+        batch_size (int): Número máximo de frases por lote.
+        root_path (str): Ruta base de las carpetas de clientes.
+        file_format (str): Formato de los archivos del cliente.
+        clean (bool): Si es True, se aplica `clean_text` antes de codificar.
+        since (float): Si se indica, solo se consideran las partes modificadas
+            desde ese instante (segundos desde epoch), por ejemplo las del
+            último día.
+        n_jobs (int): Hilos de lectura de las partes.
+        **params: Parámetros adicionales del prompt.
+
+    Returns:
+        pd.Series: Resultado de cada frase codificada hasta ahora.
+    """
+    output_dir = output_dir or os.path.join(
+        "..", "artifacts", folder_name, f"{task}_incremental"
+    )
+    manifest = Manifest(os.path.join(output_dir, "manifest.json"))
+    checkpoint_path = os.path.join(output_dir, f"{task}.jsonl")
+
+    files = list_social_listening_files(folder_name, root_path, file_format)
+    if since is not None:
+        files = [file for file in files if os.path.getmtime(file) >= since]
+    delta = [file for file in files if not manifest.is_current(file)]
+    print(f"Partes nuevas o modificadas: {len(delta)} de {len(files)}")
+
+    if delta:
+
+        def read(file):
+            snapshot = file_snapshot(file)
+            return snapshot, read_social_listening_file(file, [id_column, column_name])
+
+        with ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count()) as executor:
+            snapshots, dfs = zip(*executor.map(read, delta))
+        df = pd.concat(dfs, ignore_index=True).drop_duplicates(id_column)
+        if clean:
+            df = df.assign(**{column_name: clean_text(df, column_name)})
+
+        for _ in codificacion.codificate_stream(
+            task, df, batch_size, column_name, id_column, checkpoint_path, **params
+        ):
+            pass
+
+        failed = set(codificacion.report["failed_ids"])
+        for file, snapshot, df_file in zip(delta, snapshots, dfs):
+            if not failed.intersection(df_file[id_column].astype(str)):
+                manifest.record(file, snapshot, len(df_file))
+    manifest.save()
+
+    return load_results(checkpoint_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--task", type=str, required=True)
+    parser.add_argument("--folder_name", type=str, required=True)
+    parser.add_argument("--column_name", type=str, default="text")
+    parser.add_argument("--id_column", type=str, default="ID")
+    parser.add_argument("--output_dir", type=str, default=None)
+    parser.add_argument("--batch_size", type=int, default=None)
+    parser.add_argument("--since_hours", type=float, default=None)
+    parser.add_argument("--max_concurrency", type=int, default=1)
+    parser.add_argument("--model", type=str, default="gpt-3.5-turbo")
+    parser.add_argument("--api_base", type=str, default=None)
+    parser.add_argument("--root_path", type=str, default="../data/")
+    parser.add_argument("--file_format", type=str, default="csv")
+    parser.add_argument("--clean", action="store_true")
+    parser.add_argument("--num_topicos", type=int, default=None)
+    parser.add_argument("--lang", type=str, default=None)
+    args = parser.parse_args(argv)
+
+    params = {
+        key: value
+        for key, value in (("num_topicos", args.num_topicos), ("lang", args.lang))
+        if value is not None
+    }
+    codificacion = Codificacion(
+        os.environ.get("OPENAI_API_KEY"),
+        max_concurrency=args.max_concurrency,
+        model=args.model,
+        api_base=args.api_base,
+    )
+    results = code_incremental(
+        codificacion,
+        args.task,
+        args.folder_name,
+        args.column_name,
+        args.id_column,
+        output_dir=args.output_dir,
+        batch_size=args.batch_size,
+        root_path=args.root_path,
+        file_format=args.file_format,
+        clean=args.clean,
+        since=(
+            None if args.since_hours is None else time.time() - args.since_hours * 3600
+        ),
+        **params,
+    )
+    print(f"Frases con resultado: {len(results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+"""
+Servidor local compatible con el endpoint de chat de OpenAI, para probar la
+codificación sin red. Responde de forma determinista: el resultado de cada
+frase depende solo de su texto, y siempre es un JSON bien formado con una
+llave "FraseN" por frase del prompt, o una línea "número<TAB>resultado" por
+frase si la solicitud usa el formato compacto.
+
+También atiende los endpoints de archivos y de lotes (/v1/files y
+/v1/batches): cada trabajo se procesa en un hilo después de `batch_delay`
+segundos, con la misma respuesta de chat por solicitud.
+
+Uso:
+    python mock_server.py --port 8000 --latency 0.2
+    python mock_server.py --port 8000 --batch_delay 5
+    codificacion = Codificacion("mock", api_base="http://127.0.0.1:8000/v1")
+    # Sin servidor ni sockets, en el mismo proceso:
+    codificacion = Codificacion("mock", backend=MockBackend(latency=0.05))
+"""
+
+import re
+import json
+import time
+import uuid
+import asyncio
+import zlib
+import random
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backends import CompletionBackend
+from concurrency import estimate_tokens
+
+PHRASE_LINE = re.compile(r"^\s*Frase(\S+?):\s?(.*)$", re.MULTILINE)
+MULTITASK_KEYS = re.compile(r'"(\w+)"')
+COMPACT_LINE = re.compile(r"^(\d+)\t(.*)$", re.MULTILINE)
+# Columna de cada resultado según las palabras de la instrucción compacta
+COMPACT_COLUMNS = {
+    "sentimiento": "sentimiento",
+    "tópicos": "topicos",
+    "traducción": "traduccion",
+    "Traduce": "traduccion",
+    "corrección": "correccion",
+}
+
+SENTIMENTS = ["positivo", "negativo", "neutro"]
+
+
+def phrase_result(prompt: str, text: str):
+    """
+    Resultado determinista de una frase según la tarea del prompt.
+
+    Args:
+        prompt (str): Prompt completo, usado para reconocer la tarea.
+        text (str): Texto de la frase.
+
+    Returns:
+        Resultado de la frase para esa tarea.
+    """
+    digest = zlib.crc32(text.encode("utf-8"))
+    words = text.split() or ["vacío"]
+    results = {
+        "sentimiento": SENTIMENTS[digest % 3],
+        "topicos": [" ".join(words[:2]), words[-1]],
+        "traduccion": f"[en] {text}",
+        "correccion": text,
+    }
+    if "llaves" in prompt:
+        keys = MULTITASK_KEYS.findall(prompt.rsplit("llaves", 1)[1])
+        return {key: results.get(key) for key in keys}
+    if "sentimiento" in prompt:
+        return results["sentimiento"]
+    if "tópicos" in prompt:
+        return results["topicos"]
+    if "traducción" in prompt:
+        return results["traduccion"]
+    return results["correccion"]
+
+
+def compact_result(system: str, text: str) -> str:
+    """
+    Resultado determinista de una frase en el formato compacto: códigos p/n/u
+    para el sentimiento, tópicos separados por punto y coma y una columna
+    separada por tabulador por tarea en las solicitudes multitarea.
+
+    Args:
+        system (str): Mensaje de sistema, usado para reconocer la tarea.
+        text (str): Texto de la frase.
+
+    Returns:
+        str: Resultado de la frase.
+    """
+    if "tabulador" in system:
+        instructions = system.split("este orden:", 1)[1]
+        columns = sorted(
+            (instructions.find(word), key)
+            for word, key in COMPACT_COLUMNS.items()
+            if word in instructions
+        )
+        keys = [key for _, key in columns]
+    else:
+        keys = [
+            next(
+                (key for word, key in COMPACT_COLUMNS.items() if word in system),
+                "correccion",
+            )
+        ]
+    result = phrase_result("llaves " + " ".join(f'"{k}"' for k in keys), text)
+    values = []
+    for key in keys:
+        value = result[key]
+        if key == "sentimiento":
+            value = value[0] if value != "neutro" else "u"
+        elif key == "topicos":
+            value = "; ".join(value)
+        values.append(value)
+    return "\t".join(values)
+
+
+def chat_completion(body: dict) -> dict:
+    """
+    Construye la respuesta a una solicitud de chat.
+
+    Args:
+        body (dict): Cuerpo de la solicitud.
+
+    Returns:
+        dict: Respuesta con las llaves "choices" y "usage".
+    """
+    prompt = body["messages"][-1]["content"]
+    system = body["messages"][0]["content"] if len(body["messages"]) > 1 else ""
+    if "número<TAB>" in system:
+        content = "\n".join(
+            f"{n}\t{compact_result(system, text)}"
+            for n, text in COMPACT_LINE.findall(prompt)
+        )
+    else:
+        content = json.dumps(
+            {
+                f"Frase{id_i}": phrase_result(prompt, text)
+                for id_i, text in PHRASE_LINE.findall(prompt)
+            },
+            ensure_ascii=False,
+        )
+    prompt_tokens = sum(estimate_tokens(m["content"]) for m in body["messages"])
+    completion_tokens = estimate_tokens(content)
+    return {
+        "id": f"chatcmpl-{zlib.crc32(prompt.encode('utf-8')):08x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def parse_multipart(content_type: str, body: bytes) -> dict:
+    """
+    Campos de un cuerpo multipart/form-data.
+
+    Args:
+        content_type (str): Encabezado Content-Type, con el separador.
+        body (bytes): Cuerpo de la solicitud.
+
+    Returns:
+        dict: Nombre de cada campo -> contenido en bytes.
+    """
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+    )
+    return {
+        part.get_param("name", header="content-disposition"): part.get_payload(
+            decode=True
+        )
+        for part in message.iter_parts()
+    }
+
+
+def run_batch(server, batch: dict) -> None:
+    """
+    Procesa un trabajo de lotes: responde cada solicitud del archivo de
+    entrada y guarda los archivos de salida y de errores. Con `error_rate`
+    del servidor, esa fracción de solicitudes termina con error 503.
+
+    Args:
+        server: Servidor con los archivos y los trabajos.
+        batch (dict): Trabajo a procesar; se actualiza en el lugar.
+
+    Returns:
+        None.
+    """
+    time.sleep(server.batch_delay)
+    with server.lock:
+        if batch["status"] != "validating":
+            return
+        batch["status"] = "in_progress"
+    lines = server.files[batch["input_file_id"]].decode("utf-8").splitlines()
+    requests = [json.loads(line) for line in lines if line.strip()]
+    batch["request_counts"]["total"] = len(requests)
+
+    output, errors = [], []
+    for request in requests:
+        with server.lock:
+            if batch["status"] == "cancelling":
+                break
+            server.requests += 1
+            fail = server.rng.random() < server.error_rate
+        record = {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "error": None}
+        record["custom_id"] = request["custom_id"]
+        if fail:
+            record["response"] = {
+                "status_code": 503,
+                "body": {"error": {"message": "Servidor ocupado"}},
+            }
+            errors.append(record)
+            batch["request_counts"]["failed"] += 1
+        else:
+            record["response"] = {
+                "status_code": 200,
+                "body": chat_completion(request["body"]),
+            }
+            output.append(record)
+            batch["request_counts"]["completed"] += 1
+
+    with server.lock:
+        for key, records in (("output_file_id", output), ("error_file_id", errors)):
+            if records:
+                file_id = f"file-{uuid.uuid4().hex[:12]}"
+                server.files[file_id] = "".join(
+                    json.dumps(record, ensure_ascii=False) + "\n" for record in records
+                ).encode("utf-8")
+                batch[key] = file_id
+        batch["status"] = (
+            "cancelled" if batch["status"] == "cancelling" else "completed"
+        )
+
+
+class MockBackend(CompletionBackend):
+
+    """
+    Cliente falso que responde en el mismo proceso con `chat_completion`, sin
+    servidor HTTP. Las respuestas son deterministas; la latencia simulada
+    permite medir la concurrencia sin que la red agregue ruido.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Args:
+            latency (float): Segundos de espera de cada solicitud.
+        """
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def complete(self, messages: list, model: str, temperature: float) -> dict:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+        return chat_completion({"model": model, "messages": messages})
+
+    async def acomplete(self, messages: list, model: str, temperature: float) -> dict:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+        return chat_completion({"model": model, "messages": messages})
+
+
+class MockHandler(BaseHTTPRequestHandler):
+
+    """
+    Atiende POST /v1/chat/completions y los endpoints de archivos y de lotes.
+    La latencia, la tasa de errores 503 y la demora de los trabajos se toman
+    de los atributos del servidor.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Las conexiones son persistentes; sin esto los encabezados y el cuerpo
+    # de la respuesta esperan al ACK retardado del cliente
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_bytes(status, data, "application/json")
+
+    def send_bytes(self, status: int, data: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def not_found(self) -> None:
+        self.send_json(404, {"error": {"message": f"Ruta desconocida: {self.path}"}})
+
+    def do_GET(self):
+        server = self.server
+        parts = self.path.strip("/").split("/")
+        if len(parts) >= 2 and parts[-2] == "batches":
+            batch = server.batches.get(parts[-1])
+            if batch is None:
+                self.not_found()
+                return
+            with server.lock:
+                payload = dict(batch, request_counts=dict(batch["request_counts"]))
+            self.send_json(200, payload)
+        elif len(parts) >= 3 and parts[-3] == "files" and parts[-1] == "content":
+            content = server.files.get(parts[-2])
+            if content is None:
+                self.not_found()
+                return
+            self.send_bytes(200, content, "application/jsonl")
+        else:
+            self.not_found()
+
+    def do_POST(self):
+        data = self.rfile.read(int(self.headers["Content-Length"]))
+        path = self.path.rstrip("/")
+        if path.endswith("/files"):
+            self.create_file(data)
+        elif path.endswith("/batches"):
+            self.create_batch(json.loads(data))
+        elif path.endswith("/cancel"):
+            self.cancel_batch(path.split("/")[-2])
+        elif path.endswith("/chat/completions"):
+            self.complete(json.loads(data))
+        else:
+            self.not_found()
+
+    def complete(self, body: dict) -> None:
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        with server.lock:
+            server.requests += 1
+            fail = server.rng.random() < server.error_rate
+        if fail:
+            self.send_json(503, {"error": {"message": "Servidor ocupado"}})
+            return
+        self.send_json(200, chat_completion(body))
+
+    def create_file(self, data: bytes) -> None:
+        fields = parse_multipart(self.headers["Content-Type"], data)
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        with self.server.lock:
+            self.server.files[file_id] = fields["file"]
+        self.send_json(
+            200,
+            {
+                "id": file_id,
+                "object": "file",
+                "bytes": len(fields["file"]),
+                "purpose": fields.get("purpose", b"").decode("utf-8"),
+            },
+        )
+
+    def create_batch(self, body: dict) -> None:
+        server = self.server
+        if body.get("input_file_id") not in server.files:
+            self.send_json(
+                400, {"error": {"message": "Archivo de entrada desconocido"}}
+            )
+            return
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex[:12]}",
+            "object": "batch",
+            "endpoint": body.get("endpoint"),
+            "input_file_id": body["input_file_id"],
+            "completion_window": body.get("completion_window"),
+            "status": "validating",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "metadata": body.get("metadata") or {},
+        }
+        with server.lock:
+            server.batches[batch["id"]] = batch
+        threading.Thread(target=run_batch, args=(server, batch), daemon=True).start()
+        self.send_json(200, batch)
+
+    def cancel_batch(self, batch_id: str) -> None:
+        server = self.server
+        batch = server.batches.get(batch_id)
+        if batch is None:
+            self.not_found()
+            return
+        with server.lock:
+            if batch["status"] == "validating":
+                batch["status"] = "cancelled"
+            elif batch["status"] == "in_progress":
+                batch["status"] = "cancelling"
+            payload = dict(batch)
+        self.send_json(200, payload)
+
+
+def start_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency: float = 0.0,
+    error_rate: float = 0.0,
+    seed: int = 0,
+    batch_delay: float = 0.0,
+) -> ThreadingHTTPServer:
+    """
+    Inicia el servidor en un hilo en segundo plano.
+
+    Args:
+        host (str): Dirección donde escuchar.
+        port (int): Puerto. Con 0 se elige uno libre.
+        latency (float): Segundos de espera antes de cada respuesta.
+        error_rate (float): Fracción de solicitudes que responden 503.
+        seed (int): Semilla de los errores simulados.
+        batch_delay (float): Segundos que un trabajo de lotes espera antes de
+            procesarse.
+
+    Returns:
+        ThreadingHTTPServer: Servidor iniciado. Su URL base es
+        `f"http://{host}:{server.server_address[1]}/v1"`; se detiene con
+        `server.shutdown()`.
+    """
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.batch_delay = batch_delay
+    server.files = {}
+    server.batches = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error_rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch_delay", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    server = start_server(
+        args.host,
+        args.port,
+        args.latency,
+        args.error_rate,
+        args.seed,
+        args.batch_delay,
+    )
+    print(f"Servidor en http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import re
+import json
+
+import pandas as pd
+
+CODE_FENCE = re.compile(r"```[a-zA-Z]*")
+PHRASE_KEY = re.compile(r'"?Frase\s*([\w\-]+)"?\s*:\s*')
+VALUE_END = re.compile(r"\s*,?\s*[\n}]|$")
+# Inicio de un valor JSON que, si no se puede decodificar, está truncado
+JSON_VALUE_START = re.compile(r"\s*[\[{\"]")
+
+# Acepta saltos de línea dentro de los strings, como los que deja el modelo
+decoder = json.JSONDecoder(strict=False)
+
+
+def normalize_key(key) -> str:
+    """
+    Elimina la subcadena "Frase" de una llave y devuelve el id como string.
+
+    Args:
+        key: Llave de la respuesta del modelo.
+
+    Returns:
+        str: Id de la frase.
+    """
+    if isinstance(key, str) and key.startswith("Frase"):
+        return key[5:].strip()
+    return str(key).replace("Frase", "").strip()
+
+
+def strip_code_fences(text: str) -> str:
+    """
+    Quita los bloques de código markdown (```json ... ```) de una respuesta.
+
+    Args:
+        text (str): Respuesta del modelo.
+
+    Returns:
+        str: Respuesta sin marcas de bloque de código.
+    """
+    return CODE_FENCE.sub("", text)
+
+
+def _entries_from_json(obj) -> dict:
+    if isinstance(obj, dict):
+        return {normalize_key(key): value for key, value in obj.items()}
+    if isinstance(obj, list):
+        entries = {}
+        for item in obj:
+            if isinstance(item, dict):
+                entries.update(_entries_from_json(item))
+        return entries
+    return {}
+
+
+def _entries_from_keys(text: str) -> dict:
+    # Recupera cada "FraseN": valor por separado, tolerando entradas dañadas
+    entries = {}
+    matches = list(PHRASE_KEY.finditer(text))
+    for n, match in enumerate(matches):
+        position = match.end()
+        try:
+            value, _ = decoder.raw_decode(text, position)
+        except json.JSONDecodeError:
+            # Una lista, objeto o string que no se puede leer está truncado o
+            # dañado: se descarta para que la frase se vuelva a encolar
+            if JSON_VALUE_START.match(text, position):
+                continue
+            # Valor sin comillas, por ejemplo "Frase3: positivo" en texto plano
+            end = VALUE_END.search(text, position).start()
+            if n + 1 < len(matches):
+                end = min(end, matches[n + 1].start())
+            value = text[position:end].strip().rstrip(",").strip().strip('"')
+            if not value:
+                continue
+        entries[match.group(1)] = value
+    return entries
+
+
+def extract_entries(response: str) -> dict:
+    """
+    Extrae las entradas id -> valor de una respuesta del modelo. Primero
+    intenta leer la respuesta completa como JSON (ignorando bloques de código y
+    texto antes o después del objeto); si no es posible, recupera una a una las
+    entradas "FraseN" válidas.
+
+    Args:
+        response (str): Respuesta del modelo.
+
+    Returns:
+        dict: Diccionario con el id de cada frase (sin "Frase") y su valor.
+    """
+    if not isinstance(response, str):
+        return {}
+
+    text = "".join(response.splitlines())
+    try:
+        return _entries_from_json(json.loads(text))
+    except json.JSONDecodeError:
+        pass
+
+    text = strip_code_fences(text)
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start >= 0:
+        try:
+            obj, _ = decoder.raw_decode(text, start)
+            entries = _entries_from_json(obj)
+            if entries:
+                return entries
+        except json.JSONDecodeError:
+            pass
+
+    # El texto por líneas se conserva para las respuestas que no son JSON
+    return _entries_from_keys(strip_code_fences(response))
+
+
+def parse_responses(responses, expected_ids=None) -> tuple:
+    """
+    Interpreta una secuencia de respuestas del modelo y construye directamente
+    las columnas de ids y valores.
+
+    Args:
+        responses: Iterable de respuestas del modelo.
+        expected_ids: Iterable paralelo con la lista de ids enviada en cada
+            lote. Si se indica, se reportan los ids que no aparecen en su
+            respuesta.
+
+    Returns:
+        tuple: (ids, values, lost_ids) donde ids y values son listas paralelas
+        y lost_ids la lista de ids esperados que no se pudieron recuperar.
+    """
+    ids, values, lost_ids = [], [], []
+    if expected_ids is None:
+        for response in responses:
+            entries = extract_entries(response)
+            ids.extend(entries.keys())
+            values.extend(entries.values())
+        return ids, values, lost_ids
+
+    for response, ids_batch in zip(responses, expected_ids):
+        entries = extract_entries(response)
+        ids.extend(entries.keys())
+        values.extend(entries.values())
+        lost_ids.extend(id_i for id_i in map(str, ids_batch) if id_i not in entries)
+    return ids, values, lost_ids
+
+
+def responses_to_series(responses, expected_ids=None) -> tuple:
+    """
+    Convierte una secuencia de respuestas del modelo en una serie de pandas
+    indexada por el id de cada frase. Si un id aparece más de una vez se
+    conserva el último valor.
+
+    Args:
+        responses: Iterable de respuestas del modelo.
+        expected_ids: Iterable paralelo con la lista de ids de cada lote.
+
+    Returns:
+        tuple: (serie, lost_ids).
+    """
+    ids, values, lost_ids = parse_responses(responses, expected_ids)
+    series = pd.Series(values, index=ids, dtype=object)
+    if series.index.has_duplicates:
+        series = series[~series.index.duplicated(keep="last")]
+    return series, lost_ids
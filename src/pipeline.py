@@ -0,0 +1,688 @@
+"""
+Codificación de una carpeta de cliente desde la línea de comandos, con las
+etapas en hilos concurrentes unidos por colas acotadas:
+
+    lectura -> limpieza -> lotes -> solicitudes -> parseo -> escritura
+
+La lectura y la limpieza se hacen una sola vez y alimentan a cada tarea del
+archivo de configuración, que tiene sus propias etapas de lotes, solicitudes,
+parseo y escritura. Mientras unas frases esperan la respuesta del modelo, las
+siguientes ya se están leyendo, limpiando y agrupando, de modo que el tiempo
+total se acerca al de la etapa más lenta. Las colas acotadas limitan la
+memoria: una etapa rápida espera a la siguiente en lugar de acumular datos.
+
+Ejemplo de configuración (JSON):
+    {
+        "folder_name": "cliente",
+        "column_name": "text",
+        "id_column": "ID",
+        "clean": true,
+        "cache_path": "../artifacts/cache.db",
+        "codificacion": {"max_concurrency": 8, "requests_per_minute": 3500,
+                         "deduplicate": true},
+        "tasks": [
+            {"task": "sentiment"},
+            {"task": "topics", "num_topicos": 3},
+            {"name": "sentiment_translation", "task": "multitask",
+             "tasks": ["sentiment", "translation"], "lang": "inglés"}
+        ]
+    }
+
+Uso:
+    python pipeline.py --config cliente.json
+    python pipeline.py --config cliente.json --tasks sentiment --mock_latency 0.2
+"""
+
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+
+import pandas as pd
+
+from cache import CompletionCache, make_key
+from checkpoint import Checkpoint
+from codification import BATCH_ERRORS, MULTITASK_FIELDS, Codificacion
+from data.utils import clean_text, iter_social_listening_data, save_table
+from dedup import Deduplicator
+from incremental import load_results
+from mock_server import MockBackend
+
+# Valores por defecto de la configuración
+DEFAULT_CONFIG = {
+    "column_name": "text",
+    "id_column": "ID",
+    "root_path": "../data/",
+    "file_format": "csv",
+    "output_dir": None,
+    "clean": False,
+    "chunksize": 10000,
+    "batch_size": None,
+    "queue_size": 8,
+    "cache_path": None,
+    "codificacion": {},
+    "tasks": [],
+}
+
+# Parámetros de las tareas que no se indican en la configuración, los mismos
+# de `get_translation` y `get_multitask`
+TASK_DEFAULTS = {"topics": {"num_topicos": 3}, "translation": {"lang": "inglés"}}
+
+# Marca de fin de datos que cada etapa pasa a la siguiente
+DONE = object()
+
+
+def task_params(spec: dict) -> dict:
+    """
+    Parámetros del prompt de una tarea de la configuración, con los valores
+    por defecto de TASK_DEFAULTS para los que no se indican.
+
+    Args:
+        spec (dict): Tarea de la configuración, con las llaves "task" y,
+            opcionalmente, "name" y los parámetros del prompt.
+
+    Returns:
+        dict: Parámetros del prompt.
+    """
+    task = spec["task"]
+    params = {k: v for k, v in spec.items() if k not in ("name", "task")}
+    if task == "multitask":
+        tasks = params.get("tasks") or []
+        unknown = [t for t in tasks if t not in MULTITASK_FIELDS]
+        if not tasks or unknown:
+            raise ValueError(f"Tareas no soportadas en multitask: {tasks}")
+    else:
+        tasks = [task]
+    for t in tasks:
+        for key, value in TASK_DEFAULTS.get(t, {}).items():
+            params.setdefault(key, value)
+    return params
+
+
+class Stopped(Exception):
+
+    """
+    Otra etapa del pipeline falló y las demás deben terminar.
+    """
+
+
+class Groups:
+
+    """
+    Frases de una tarea que esperan el resultado de otra en lugar de enviarse
+    al modelo: las copias y casi duplicadas de su representante (con
+    `deduplicate`) y las que tienen la misma llave de caché que una frase ya
+    enviada. El resultado de cada frase se extiende a las que la esperan,
+    aunque estas lleguen en un bloque posterior.
+    """
+
+    def __init__(self):
+        self.members = {}
+        self.values = {}
+        self.keys = {}
+        self._lock = threading.Lock()
+
+    def add(self, waiting: list) -> dict:
+        """
+        Registra frases que esperan el resultado de otra.
+
+        Args:
+            waiting (list): Pares (id, id de la frase cuyo resultado espera).
+
+        Returns:
+            dict: Resultados de las frases cuya espera ya tiene resultado.
+        """
+        resolved = {}
+        with self._lock:
+            for id_i, leader in waiting:
+                if str(leader) in self.values:
+                    resolved[str(id_i)] = self.values[str(leader)]
+                else:
+                    self.members.setdefault(str(leader), []).append(str(id_i))
+        return resolved
+
+    def send(self, id_i, key: str) -> None:
+        """
+        Registra la llave de caché de una frase que se envía al modelo.
+
+        Args:
+            id_i: Id de la frase.
+            key (str): Llave de caché.
+
+        Returns:
+            None.
+        """
+        with self._lock:
+            self.keys[str(id_i)] = key
+
+    def resolve(self, results: dict) -> tuple:
+        """
+        Extiende resultados id -> valor a las frases que los esperan.
+
+        Args:
+            results (dict): Resultados de un lote.
+
+        Returns:
+            tuple: (fanned, entries) con los resultados de las frases que
+            esperaban y las entradas llave -> valor para el caché.
+        """
+        fanned, entries = {}, {}
+        with self._lock:
+            stack = list(results.items())
+            while stack:
+                id_i, value = stack.pop()
+                self.values[id_i] = value
+                if id_i in self.keys:
+                    entries[self.keys.pop(id_i)] = value
+                for member in self.members.pop(id_i, ()):
+                    fanned[member] = value
+                    stack.append((member, value))
+        return fanned, entries
+
+    def waiting(self) -> list:
+        """
+        Ids que siguen esperando un resultado que no llegó.
+
+        Returns:
+            list: Ids como strings.
+        """
+        with self._lock:
+            return [id_i for members in self.members.values() for id_i in members]
+
+
+class Pipeline:
+
+    """
+    Ejecuta las etapas de la codificación en hilos unidos por colas acotadas
+    y mide el tiempo ocupado de cada etapa (sin contar las esperas en las
+    colas).
+    """
+
+    def __init__(self, codificacion: Codificacion, config: dict):
+        """
+        Args:
+            codificacion (Codificacion): Instancia con la que se codifica. Su
+                `max_concurrency` es el número de hilos de solicitudes de
+                cada tarea.
+            config (dict): Configuración, con las llaves de DEFAULT_CONFIG y
+                "folder_name".
+        """
+        self.codificacion = codificacion
+        self.config = {**DEFAULT_CONFIG, **config}
+        self.output_dir = self.config["output_dir"] or os.path.join(
+            "..", "artifacts", self.config["folder_name"]
+        )
+        self.stop = threading.Event()
+        self.errors = []
+        self.busy = {}
+        self._lock = threading.Lock()
+
+    def new_queue(self) -> queue.Queue:
+        return queue.Queue(maxsize=self.config["queue_size"])
+
+    def put(self, target: queue.Queue, item) -> None:
+        # Espera a que haya espacio sin quedar bloqueado si otra etapa falló
+        while True:
+            if self.stop.is_set():
+                raise Stopped
+            try:
+                target.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def get(self, source: queue.Queue):
+        while True:
+            if self.stop.is_set():
+                raise Stopped
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def add_busy(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.busy[stage] = self.busy.get(stage, 0.0) + seconds
+
+    def thread(self, name: str, target, *args) -> threading.Thread:
+        def run():
+            try:
+                target(*args)
+            except Stopped:
+                pass
+            except Exception as e:
+                self.errors.append((name, e))
+                self.stop.set()
+
+        return threading.Thread(target=run, name=name, daemon=True)
+
+    def load(self, output: queue.Queue) -> None:
+        config = self.config
+        for chunk in iter_social_listening_data(
+            config["folder_name"],
+            config["chunksize"],
+            usecols=[config["id_column"], config["column_name"]],
+            root_path=config["root_path"],
+            file_format=config["file_format"],
+        ):
+            self.put(output, chunk)
+        self.put(output, DONE)
+
+    def clean(self, source: queue.Queue, outputs: dict, coded: dict) -> None:
+        id_column, column_name = self.config["id_column"], self.config["column_name"]
+        seen = set()
+        while True:
+            chunk = self.get(source)
+            if chunk is DONE:
+                break
+            start = time.perf_counter()
+            chunk = chunk.dropna(subset=[column_name]).drop_duplicates(id_column)
+            chunk = chunk[~chunk[id_column].astype(str).isin(seen)]
+            seen.update(chunk[id_column].astype(str))
+            if self.config["clean"]:
+                chunk = chunk.assign(**{column_name: clean_text(chunk, column_name)})
+            ids = chunk[id_column].tolist()
+            texts = chunk[column_name].tolist()
+            self.add_busy("clean", time.perf_counter() - start)
+
+            for name, output in outputs.items():
+                # Se saltan los ids que ya tienen resultado en el checkpoint
+                pending = [
+                    (id_i, text)
+                    for id_i, text in zip(ids, texts)
+                    if str(id_i) not in coded[name]
+                ]
+                if pending:
+                    self.put(output, pending)
+        for output in outputs.values():
+            self.put(output, DONE)
+
+    def batch(
+        self,
+        name: str,
+        task: str,
+        params: dict,
+        groups: Groups,
+        source,
+        output,
+        to_write,
+        n_workers,
+    ) -> None:
+        codificacion = self.codificacion
+        cache = codificacion.cache
+        deduplicator = (
+            Deduplicator(codificacion.task_dedup_threshold(task, **params))
+            if codificacion.deduplicate
+            else None
+        )
+        task_key = codificacion.task_key(task, **params)
+        # Primera frase enviada con cada llave de caché
+        senders = {}
+        while True:
+            pending = self.get(source)
+            if pending is DONE:
+                break
+            start = time.perf_counter()
+            waiting, hits = [], {}
+            if deduplicator is not None:
+                representatives = deduplicator.assign(
+                    [id_i for id_i, _ in pending], [text for _, text in pending]
+                )
+                waiting.extend(
+                    (id_i, representative)
+                    for (id_i, _), representative in zip(pending, representatives)
+                    if id_i != representative
+                )
+                pending = [
+                    item
+                    for item, representative in zip(pending, representatives)
+                    if item[0] == representative
+                ]
+            if cache is not None:
+                keys = [
+                    make_key(
+                        codificacion.model, codificacion.temperature, task_key, text
+                    )
+                    for _, text in pending
+                ]
+                cached = cache.get_many(keys)
+                found = sum(1 for key in keys if key in cached)
+                codificacion.telemetry.record_cache(found, len(keys) - found)
+                send = []
+                for item, key in zip(pending, keys):
+                    if key in cached:
+                        hits[str(item[0])] = cached[key]
+                    elif key in senders:
+                        waiting.append((item[0], senders[key]))
+                    else:
+                        senders[key] = item[0]
+                        groups.send(item[0], key)
+                        send.append(item)
+                pending = send
+            if groups is not None:
+                hits.update(groups.add(waiting))
+            if hits:
+                self.put(to_write, (list(hits), codificacion.dump_results(hits), hits))
+            if not pending:
+                self.add_busy(f"{name}.batch", time.perf_counter() - start)
+                continue
+
+            batches = codificacion.plan_batches(
+                task,
+                [id_i for id_i, _ in pending],
+                [text for _, text in pending],
+                self.config["batch_size"],
+                **params,
+            )
+            prompts = [
+                (ids_batch, codificacion.batch_prompt(task, ids_batch, texts, **params))
+                for ids_batch, texts in batches
+            ]
+            self.add_busy(f"{name}.batch", time.perf_counter() - start)
+            for item in prompts:
+                self.put(output, item)
+        for _ in range(n_workers):
+            self.put(output, DONE)
+
+    def complete(self, name: str, system: str, source, output, n_workers) -> None:
+        codificacion = self.codificacion
+        while True:
+            item = self.get(source)
+            if item is DONE:
+                break
+            ids_batch, prompt = item
+            start = time.perf_counter()
+            try:
+                response = codificacion.get_completion(
+                    prompt, codificacion.model, len(ids_batch), system
+                )
+            except BATCH_ERRORS as e:
+                print(f"Falló un lote de {name}: {e}")
+                response = None
+            # Tiempo de la etapa: los hilos de solicitudes trabajan en paralelo
+            self.add_busy(f"{name}.complete", (time.perf_counter() - start) / n_workers)
+            self.put(output, (ids_batch, response))
+        self.put(output, DONE)
+
+    def parse(
+        self, name: str, task: str, params: dict, source, output, n_workers
+    ) -> None:
+        codificacion = self.codificacion
+        finished = 0
+        while finished < n_workers:
+            item = self.get(source)
+            if item is DONE:
+                finished += 1
+                continue
+            ids_batch, response = item
+            start = time.perf_counter()
+            results = codificacion.decode_response(task, response, ids_batch, **params)
+            if codificacion.compact and response is not None:
+                response = codificacion.dump_results(results)
+            self.add_busy(f"{name}.parse", time.perf_counter() - start)
+            self.put(output, (ids_batch, response, results))
+        self.put(output, DONE)
+
+    def write(
+        self, name: str, checkpoint: Checkpoint, groups: Groups, source, missing
+    ) -> None:
+        codificacion = self.codificacion
+        while True:
+            item = self.get(source)
+            if item is DONE:
+                break
+            ids_batch, response, results = item
+            start = time.perf_counter()
+            missing.extend(id_i for id_i in ids_batch if str(id_i) not in results)
+            if response is not None:
+                checkpoint.append(ids_batch, response, results)
+            if groups is not None:
+                fanned, entries = groups.resolve(results)
+                if entries:
+                    codificacion.cache.set_many(entries)
+                if fanned:
+                    checkpoint.append(
+                        list(fanned), codificacion.dump_results(fanned), fanned
+                    )
+            self.add_busy(f"{name}.write", time.perf_counter() - start)
+
+    def run(self) -> dict:
+        """
+        Ejecuta el pipeline completo para todas las tareas de la
+        configuración. Las frases sin resultado al terminar se reintentan con
+        `codificate_stream` (que reencola hasta `max_requeue` veces) y los
+        resultados de cada tarea se guardan como Parquet.
+
+        Returns:
+            dict: Tiempo total, tiempo ocupado de cada etapa (el de las
+            solicitudes dividido por el número de hilos) y, por tarea, frases
+            codificadas y rutas de salida.
+        """
+        config = self.config
+        n_workers = max(1, self.codificacion.max_concurrency)
+        tasks = {spec.get("name", spec["task"]): spec for spec in config["tasks"]}
+        if not tasks:
+            raise ValueError("La configuración no tiene tareas")
+
+        checkpoints, coded, missing = {}, {}, {}
+        for name in tasks:
+            checkpoints[name] = Checkpoint(
+                os.path.join(self.output_dir, f"{name}.jsonl")
+            )
+            coded[name] = checkpoints[name].coded_ids()
+            missing[name] = []
+
+        start = time.perf_counter()
+        loaded = self.new_queue()
+        to_batch = {name: self.new_queue() for name in tasks}
+        threads = [
+            self.thread("load", self.load, loaded),
+            self.thread("clean", self.clean, loaded, to_batch, coded),
+        ]
+        specs, groups = {}, {}
+        for name, spec in tasks.items():
+            task = spec["task"]
+            params = task_params(spec)
+            # Solo se agrupan frases si hay caché o deduplicación
+            groups[name] = (
+                Groups()
+                if self.codificacion.cache is not None or self.codificacion.deduplicate
+                else None
+            )
+            system = self.codificacion.system_message(task, **params)
+            to_complete, to_parse, to_write = (
+                self.new_queue(),
+                self.new_queue(),
+                self.new_queue(),
+            )
+            threads.append(
+                self.thread(
+                    f"{name}.batch",
+                    self.batch,
+                    name,
+                    task,
+                    params,
+                    groups[name],
+                    to_batch[name],
+                    to_complete,
+                    to_write,
+                    n_workers,
+                )
+            )
+            threads.extend(
+                self.thread(
+                    f"{name}.complete",
+                    self.complete,
+                    name,
+                    system,
+                    to_complete,
+                    to_parse,
+                    n_workers,
+                )
+                for _ in range(n_workers)
+            )
+            threads.append(
+                self.thread(
+                    f"{name}.parse",
+                    self.parse,
+                    name,
+                    task,
+                    params,
+                    to_parse,
+                    to_write,
+                    n_workers,
+                )
+            )
+            threads.append(
+                self.thread(
+                    f"{name}.write",
+                    self.write,
+                    name,
+                    checkpoints[name],
+                    groups[name],
+                    to_write,
+                    missing[name],
+                )
+            )
+            specs[name] = (task, params)
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self.errors:
+            stage, error = self.errors[0]
+            raise RuntimeError(f"Falló la etapa {stage}: {error}") from error
+        pipeline_seconds = time.perf_counter() - start
+
+        report = {"pipeline_seconds": pipeline_seconds, "busy": dict(self.busy)}
+        for name, (task, params) in specs.items():
+            # Frases que esperaban el resultado de una que quedó sin él
+            if groups[name] is not None:
+                missing[name].extend(groups[name].waiting())
+            if missing[name]:
+                self.retry_missing(name, task, params, checkpoints[name], missing[name])
+            results = load_results(checkpoints[name].path)
+            results_path = os.path.join(self.output_dir, f"{name}.parquet")
+            save_table(
+                results.rename(name).rename_axis(config["id_column"]), results_path
+            )
+            report[name] = {
+                "coded": len(results),
+                "checkpoint": checkpoints[name].path,
+                "results": results_path,
+            }
+        report["seconds"] = time.perf_counter() - start
+        return report
+
+    def retry_missing(
+        self, name: str, task: str, params: dict, checkpoint: Checkpoint, ids: list
+    ) -> None:
+        """
+        Vuelve a codificar las frases que quedaron sin resultado.
+
+        Args:
+            name (str): Nombre de la tarea en la configuración.
+            task (str): Tarea.
+            params (dict): Parámetros de la tarea.
+            checkpoint (Checkpoint): Checkpoint de la tarea.
+            ids (list): Ids sin resultado.
+
+        Returns:
+            None.
+        """
+        config = self.config
+        id_column, column_name = config["id_column"], config["column_name"]
+        wanted = {str(id_i) for id_i in ids}
+        frames = []
+        for chunk in iter_social_listening_data(
+            config["folder_name"],
+            config["chunksize"],
+            usecols=[id_column, column_name],
+            root_path=config["root_path"],
+            file_format=config["file_format"],
+        ):
+            frames.append(chunk[chunk[id_column].astype(str).isin(wanted)])
+        df = pd.concat(frames).drop_duplicates(id_column)
+        if config["clean"]:
+            df = df.assign(**{column_name: clean_text(df, column_name)})
+        print(f"Reintentando {len(df)} frases sin resultado de {name}")
+        for _ in self.codificacion.codificate_stream(
+            task,
+            df,
+            config["batch_size"],
+            column_name,
+            id_column,
+            checkpoint.path,
+            **params,
+        ):
+            pass
+
+
+def load_config(path: str) -> dict:
+    """
+    Lee un archivo de configuración JSON.
+
+    Args:
+        path (str): Ruta del archivo.
+
+    Returns:
+        dict: Configuración.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", type=str, required=True)
+    parser.add_argument("--folder_name", type=str, default=None)
+    parser.add_argument("--output_dir", type=str, default=None)
+    parser.add_argument("--cache_path", type=str, default=None)
+    parser.add_argument(
+        "--tasks",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Nombres de las tareas de la configuración a ejecutar",
+    )
+    parser.add_argument("--max_concurrency", type=int, default=None)
+    parser.add_argument("--api_base", type=str, default=None)
+    parser.add_argument(
+        "--mock_latency",
+        type=float,
+        default=None,
+        help="Usa MockBackend con esta latencia en lugar de la API",
+    )
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    for key in ("folder_name", "output_dir", "cache_path"):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+    if args.tasks is not None:
+        config["tasks"] = [
+            spec
+            for spec in config["tasks"]
+            if spec.get("name", spec["task"]) in args.tasks
+        ]
+
+    params = dict(config.get("codificacion", {}))
+    if args.max_concurrency is not None:
+        params["max_concurrency"] = args.max_concurrency
+    if args.api_base is not None:
+        params["api_base"] = args.api_base
+    if args.mock_latency is not None:
+        params["backend"] = MockBackend(args.mock_latency)
+    if config.get("cache_path"):
+        params["cache"] = CompletionCache(config["cache_path"])
+    codificacion = Codificacion(os.environ.get("OPENAI_API_KEY"), **params)
+
+    report = Pipeline(codificacion, config).run()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+import re
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from parsing import responses_to_series
+
+LABELS = ["positivo", "negativo", "neutro"]
+
+# Variantes de las etiquetas que devuelve el modelo
+LABEL_ALIASES = {
+    "positivo": "positivo",
+    "positiva": "positivo",
+    "positive": "positivo",
+    "negativo": "negativo",
+    "negativa": "negativo",
+    "negative": "negativo",
+    "neutro": "neutro",
+    "neutra": "neutro",
+    "neutral": "neutro",
+}
+
+LABEL_PATTERN = re.compile("|".join(sorted(LABEL_ALIASES, key=len, reverse=True)))
+
+# Caracteres que `clean_text` elimina, incluidas las letras con tilde
+NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]")
+
+# Léxico mínimo de polaridad
+POLARITY_WORDS = {
+    **dict.fromkeys(
+        [
+            "bien", "bueno", "buena", "buenísimo", "excelente", "genial",
+            "increíble", "feliz", "felicidades", "gracias", "encanta", "encantó",
+            "mejor", "maravilloso", "perfecto", "amor", "amo", "gusta", "éxito",
+            "apoyo", "orgullo", "orgulloso", "felicitaciones", "recomiendo",
+            "lindo", "hermoso", "fácil", "rápido", "alegría", "bravo",
+            "sostenible", "responsable", "confianza", "calidad", "logro",
+        ],
+        1,
+    ),
+    **dict.fromkeys(
+        [
+            "mal", "malo", "mala", "pésimo", "pésima", "horrible", "terrible",
+            "odio", "triste", "peor", "problema", "problemas", "queja", "fraude",
+            "estafa", "robo", "nunca", "lento", "caro", "error", "falla",
+            "falló", "vergüenza", "asco", "decepción", "decepcionado", "injusto",
+            "injusticia", "preocupación", "preocupa", "crisis", "desempleo",
+            "contaminación", "corrupción", "miedo", "peligro", "basura",
+        ],
+        -1,
+    ),
+}  # fmt: skip
+
+
+def normalize_label(value) -> str:
+    """
+    Lleva una etiqueta de sentimiento del modelo a una de LABELS. Acepta
+    mayúsculas, variantes en inglés o femenino y respuestas como
+    "compromiso (positivo)".
+
+    Args:
+        value: Etiqueta devuelta por el modelo.
+
+    Returns:
+        str: Etiqueta normalizada, o None si no se reconoce.
+    """
+    if not isinstance(value, str):
+        return None
+    match = LABEL_PATTERN.search(value.lower())
+    return LABEL_ALIASES[match.group(0)] if match else None
+
+
+def fold_tokens(text) -> list:
+    """
+    Separa un texto en palabras en minúsculas y quita los caracteres que
+    `clean_text` elimina, de modo que un texto crudo y su versión limpia
+    producen las mismas palabras.
+
+    Args:
+        text (str): Texto crudo o limpio.
+
+    Returns:
+        list: Lista de palabras.
+    """
+    tokens = (NON_ALPHANUMERIC.sub("", token) for token in str(text).lower().split())
+    return [token for token in tokens if token]
+
+
+LEXICON = {fold_tokens(word)[0]: value for word, value in POLARITY_WORDS.items()}
+
+# Palabras que invierten la polaridad de las que les siguen ("no es bueno") y
+# las que la invierten desde después ("gracias por nada")
+NEGATORS = {
+    fold_tokens(word)[0]
+    for word in ["no", "ni", "nunca", "jamás", "tampoco", "sin", "nadie"]
+}
+POST_NEGATORS = {"nada"}
+NEGATION_WINDOW = 3
+POST_NEGATION_WINDOW = 2
+
+# Sin un modelo entrenado, factor con que se reducen los logits de los textos
+# con negaciones o con ambas polaridades, para que no superen el umbral de
+# aceptación local y se envíen al modelo
+UNCERTAIN_SCALE = 0.25
+
+
+def polarities(tokens: list) -> tuple:
+    """
+    Polaridad de cada palabra del léxico en un texto, invertida si está
+    negada: por una negación hasta NEGATION_WINDOW palabras antes o por
+    "nada" hasta POST_NEGATION_WINDOW palabras después.
+
+    Args:
+        tokens (list): Palabras de `fold_tokens`.
+
+    Returns:
+        tuple: (values, negated) con la polaridad (1 o -1) de cada palabra del
+        léxico y si alguna se invirtió.
+    """
+    values, negated = [], False
+    for n, token in enumerate(tokens):
+        value = LEXICON.get(token)
+        if value is None:
+            continue
+        before = tokens[max(0, n - NEGATION_WINDOW) : n]
+        after = tokens[n + 1 : n + 1 + POST_NEGATION_WINDOW]
+        if any(t in NEGATORS for t in before) or any(t in POST_NEGATORS for t in after):
+            value = -value
+            negated = True
+        values.append(value)
+    return values, negated
+
+
+def training_data(
+    responses: list, df: pd.DataFrame, column_name: str, id_column: str
+) -> tuple:
+    """
+    Construye un conjunto de entrenamiento a partir de respuestas de
+    sentimiento del modelo ya guardadas (por ejemplo con `save_pickle_object`)
+    y del DataFrame que se codificó.
+
+    Args:
+        responses (list): Respuestas de `get_sentiment`.
+        df (pd.DataFrame): DataFrame con las frases codificadas.
+        column_name (str): Nombre de la columna que contiene las frases.
+        id_column (str): Nombre de la columna que contiene los identificadores.
+
+    Returns:
+        tuple: (texts, labels) con las frases que tienen una etiqueta válida.
+    """
+    series, _ = responses_to_series(responses)
+    labels = series.map(normalize_label).dropna()
+    texts = df.set_index(df[id_column].astype(str))[column_name]
+    labels = labels[labels.index.isin(texts.index)]
+    return texts.loc[labels.index].tolist(), labels.tolist()
+
+
+class SentimentClassifier:
+
+    """
+    Clasificador local de sentimiento: regresión logística multinomial sobre
+    unigramas y bigramas con hashing, más indicadores de un léxico de
+    polaridad que tienen en cuenta las negaciones. Se entrena con etiquetas
+    que ya devolvió el modelo y permite resolver localmente los textos con
+    alta confianza. Sin entrenar, clasifica solo con el léxico y nunca tiene
+    alta confianza en los textos con negaciones o con ambas polaridades.
+    """
+
+    def __init__(self, n_features: int = 2**18, l2: float = 1e-4):
+        """
+        Args:
+            n_features (int): Dimensión del espacio de hashing.
+            l2 (float): Regularización L2 de los pesos.
+        """
+        self.n_features = n_features
+        self.l2 = l2
+        self.weights = None
+        self.bias = np.zeros(len(LABELS), dtype=np.float32)
+
+    def features(self, texts: list) -> tuple:
+        """
+        Índices y valores de las características de cada texto, en formato
+        disperso por coordenadas.
+
+        Args:
+            texts (list): Textos limpios.
+
+        Returns:
+            tuple: (rows, columns, values) con una entrada por característica.
+        """
+        rows, columns, values = [], [], []
+        for n, text in enumerate(texts):
+            tokens = fold_tokens(text)
+            terms = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            polarity, negated = polarities(tokens)
+            terms += ["__lex_pos__"] * polarity.count(1)
+            terms += ["__lex_neg__"] * polarity.count(-1)
+            if negated:
+                terms.append("__lex_negated__")
+            if not polarity:
+                terms.append("__lex_none__")
+            value = 1 / np.sqrt(len(terms))
+            for term in terms:
+                rows.append(n)
+                columns.append(zlib.crc32(term.encode("utf-8")) % self.n_features)
+                values.append(value)
+        return (
+            np.array(rows, dtype=np.int64),
+            np.array(columns, dtype=np.int64),
+            np.array(values, dtype=np.float32),
+        )
+
+    def _logits(self, features: tuple, n_texts: int) -> np.ndarray:
+        rows, columns, values = features
+        logits = np.empty((n_texts, len(LABELS)), dtype=np.float32)
+        for c in range(len(LABELS)):
+            logits[:, c] = (
+                np.bincount(
+                    rows, weights=self.weights[c, columns] * values, minlength=n_texts
+                )
+                + self.bias[c]
+            )
+        return logits
+
+    def fit(
+        self,
+        texts: list,
+        labels: list,
+        epochs: int = 200,
+        learning_rate: float = 0.5,
+    ):
+        """
+        Entrena la regresión logística con descenso de gradiente (AdaGrad) sobre
+        el conjunto completo.
+
+        Args:
+            texts (list): Textos limpios.
+            labels (list): Etiquetas (se normalizan con `normalize_label`).
+            epochs (int): Número de pasadas.
+            learning_rate (float): Tasa de aprendizaje.
+
+        Returns:
+            SentimentClassifier: La misma instancia, entrenada.
+        """
+        labels = [normalize_label(label) for label in labels]
+        keep = [n for n, label in enumerate(labels) if label is not None]
+        texts = [texts[n] for n in keep]
+        y = np.zeros((len(keep), len(LABELS)), dtype=np.float32)
+        y[np.arange(len(keep)), [LABELS.index(labels[n]) for n in keep]] = 1
+
+        features = self.features(texts)
+        rows, columns, values = features
+        self.weights = np.zeros((len(LABELS), self.n_features), dtype=np.float32)
+        self.bias = np.log(y.mean(axis=0) + 1e-3).astype(np.float32)
+        squared_weights = np.full_like(self.weights, 1e-8)
+        squared_bias = np.full_like(self.bias, 1e-8)
+
+        for _ in range(epochs):
+            probabilities = self._softmax(self._logits(features, len(texts)))
+            error = (probabilities - y) / len(texts)
+            for c in range(len(LABELS)):
+                gradient = np.bincount(
+                    columns, weights=error[rows, c] * values, minlength=self.n_features
+                )
+                gradient += self.l2 * self.weights[c]
+                squared_weights[c] += gradient**2
+                self.weights[c] -= (
+                    learning_rate * gradient / np.sqrt(squared_weights[c])
+                )
+            bias_gradient = error.sum(axis=0)
+            squared_bias += bias_gradient**2
+            self.bias -= learning_rate * bias_gradient / np.sqrt(squared_bias)
+
+        return self
+
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, texts: list) -> np.ndarray:
+        """
+        Probabilidad de cada etiqueta de LABELS para cada texto. Sin entrenar,
+        la probabilidad se deriva del balance de palabras del léxico, ya
+        invertidas por las negaciones; los textos con negaciones o con ambas
+        polaridades reciben una probabilidad baja, de modo que
+        `get_tiered_sentiment` los envíe al modelo.
+
+        Args:
+            texts (list): Textos limpios.
+
+        Returns:
+            np.ndarray: Matriz (len(texts), 3).
+        """
+        texts = list(texts)
+        if self.weights is not None:
+            return self._softmax(self._logits(self.features(texts), len(texts)))
+
+        logits = np.zeros((len(texts), len(LABELS)), dtype=np.float32)
+        for n, text in enumerate(texts):
+            polarity, negated = polarities(fold_tokens(text))
+            positive, negative = polarity.count(1), polarity.count(-1)
+            logits[n] = [1.5 * positive, 1.5 * negative, 1.0]
+            if negated or (positive and negative):
+                logits[n] *= UNCERTAIN_SCALE
+        return self._softmax(logits)
+
+    def predict(self, texts: list) -> tuple:
+        """
+        Etiqueta más probable de cada texto y su probabilidad.
+
+        Args:
+            texts (list): Textos limpios.
+
+        Returns:
+            tuple: (labels, confidence) como arreglos de numpy.
+        """
+        probabilities = self.predict_proba(texts)
+        best = probabilities.argmax(axis=1)
+        return np.array(LABELS, dtype=object)[best], probabilities.max(axis=1)
@@ -0,0 +1,389 @@
+"""
+Codificación de un cliente completo repartida en varios procesos o máquinas.
+
+Si la carpeta tiene al menos FILES_PER_SHARD archivos por shard, cada
+archivo se asigna a un shard según un hash estable de su nombre y cada
+proceso lee solo sus archivos; si no, las frases se asignan según un hash
+estable de su id. Cada shard se codifica en su propio proceso con un
+checkpoint propio, todos comparten el mismo presupuesto de solicitudes y
+tokens por minuto (un `SharedRateLimiter` en el directorio de salida, solo si
+hay límites) y al final los shards se combinan en un orden determinista.
+
+Uso:
+    python sharding.py --task sentiment --folder_name cliente --shards 8 --workers 8
+    # En varias máquinas con el directorio de salida compartido:
+    python sharding.py ... --shards 8 --shard_ids 0 1 2 3
+    python sharding.py ... --shards 8 --shard_ids 4 5 6 7
+    python sharding.py ... --shards 8 --merge
+"""
+
+import os
+import glob
+import json
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from cache import CompletionCache
+from checkpoint import Checkpoint
+from codification import Codificacion
+from concurrency import SharedRateLimiter
+from data.utils import (
+    clean_text,
+    iter_social_listening_data,
+    list_social_listening_files,
+    read_social_listening_file,
+    write_frame,
+)
+
+# Archivos por shard a partir de los cuales se reparte la carpeta por archivos
+FILES_PER_SHARD = 4
+
+
+def shard_of(id_i, n_shards: int) -> int:
+    """
+    Shard de una frase según un hash estable de su id, igual en cualquier
+    proceso o máquina.
+
+    Args:
+        id_i: Identificador de la frase.
+        n_shards (int): Número de shards.
+
+    Returns:
+        int: Número del shard.
+    """
+    digest = hashlib.blake2b(str(id_i).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % n_shards
+
+
+def shard_path(output_dir: str, shard: int, n_shards: int) -> str:
+    """
+    Ruta del checkpoint de un shard.
+
+    Args:
+        output_dir (str): Directorio de salida.
+        shard (int): Número del shard.
+        n_shards (int): Número de shards.
+
+    Returns:
+        str: Ruta del archivo JSONL.
+    """
+    return os.path.join(output_dir, f"shard-{shard:04d}-of-{n_shards:04d}.jsonl")
+
+
+def shard_mode(output_dir: str, n_shards: int, n_files: int) -> str:
+    """
+    Forma de repartir la carpeta entre los shards: "files" si tiene al menos
+    FILES_PER_SHARD archivos por shard y "rows" si no. La primera corrida la
+    guarda en el directorio de salida, de modo que al reanudar (aunque
+    lleguen archivos nuevos) cada frase cae en el mismo shard.
+
+    Args:
+        output_dir (str): Directorio de salida.
+        n_shards (int): Número de shards.
+        n_files (int): Número de archivos de la carpeta.
+
+    Returns:
+        str: "files" o "rows".
+    """
+    path = os.path.join(output_dir, f"plan-of-{n_shards:04d}.json")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)["mode"]
+    mode = "files" if n_files >= FILES_PER_SHARD * n_shards else "rows"
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"mode": mode}, file)
+    return mode
+
+
+def read_shard(config: dict, shard: int) -> pd.DataFrame:
+    """
+    Lee las frases de un shard. Al repartir por archivos solo se leen los
+    archivos del shard; al repartir por filas se recorre la carpeta por
+    bloques y se conservan solo las filas del shard.
+
+    Args:
+        config (dict): Configuración de la corrida (ver `run_sharded`).
+        shard (int): Número del shard.
+
+    Returns:
+        pd.DataFrame: Columnas de id y texto de las frases del shard.
+    """
+    column_name, id_column = config["column_name"], config["id_column"]
+    usecols = [id_column, column_name]
+    n_shards = config["n_shards"]
+    if config["mode"] == "files":
+        files = list_social_listening_files(
+            config["folder_name"], config["root_path"], config["file_format"]
+        )
+        frames = [
+            read_social_listening_file(file, usecols)
+            for file in files
+            if shard_of(os.path.basename(file), n_shards) == shard
+        ]
+    else:
+        frames = [
+            chunk[[shard_of(id_i, n_shards) == shard for id_i in chunk[id_column]]]
+            for chunk in iter_social_listening_data(
+                config["folder_name"],
+                config["chunksize"],
+                usecols=usecols,
+                root_path=config["root_path"],
+                file_format=config["file_format"],
+            )
+        ]
+    if not frames:
+        return pd.DataFrame(columns=usecols)
+    return pd.concat(frames, ignore_index=True)
+
+
+def run_shard(config: dict, shard: int) -> dict:
+    """
+    Codifica las frases de un shard. Se ejecuta en un proceso propio: lee
+    solo las frases del shard y las codifica con checkpoint, de modo que un
+    shard interrumpido se reanuda al volver a ejecutarlo.
+
+    Args:
+        config (dict): Configuración de la corrida (ver `run_sharded`).
+        shard (int): Número del shard.
+
+    Returns:
+        dict: Reporte de cobertura del shard.
+    """
+    column_name, id_column = config["column_name"], config["id_column"]
+    df = read_shard(config, shard).drop_duplicates(id_column)
+    if config["clean"]:
+        df = df.assign(**{column_name: clean_text(df, column_name)})
+
+    rate_limiter = None
+    if config["requests_per_minute"] or config["tokens_per_minute"]:
+        rate_limiter = SharedRateLimiter(
+            os.path.join(config["output_dir"], "rate_limit.db"),
+            config["requests_per_minute"],
+            config["tokens_per_minute"],
+        )
+    cache = CompletionCache(config["cache_path"]) if config["cache_path"] else None
+    codificacion = Codificacion(
+        config["openai_api_key"],
+        rate_limiter=rate_limiter,
+        cache=cache,
+        **config["codificacion"],
+    )
+    for _ in codificacion.codificate_stream(
+        config["task"],
+        df,
+        config["batch_size"],
+        column_name,
+        id_column,
+        shard_path(config["output_dir"], shard, config["n_shards"]),
+        **config["params"],
+    ):
+        pass
+
+    report = dict(codificacion.report)
+    report["shard"] = shard
+    return report
+
+
+def run_sharded(
+    task: str,
+    folder_name: str,
+    column_name: str,
+    id_column: str,
+    output_dir: str,
+    openai_api_key: str,
+    n_shards: int,
+    n_workers: int = None,
+    shard_ids: list = None,
+    batch_size: int = None,
+    requests_per_minute: int = None,
+    tokens_per_minute: int = None,
+    root_path: str = "../data/",
+    file_format: str = "csv",
+    clean: bool = False,
+    cache_path: str = None,
+    chunksize: int = 100000,
+    codificacion: dict = None,
+    **params,
+) -> list:
+    """
+    Codifica una carpeta de cliente repartida en `n_shards` shards, cada uno
+    en su propio proceso. Para repartir el trabajo entre máquinas, cada una
+    ejecuta un subconjunto distinto de `shard_ids` con el mismo `output_dir`
+    en un sistema de archivos compartido.
+
+    Args:
+        task (str): Nombre de la tarea (una de las llaves de PROMPTS).
+        folder_name (str): Carpeta del cliente, como en `read_social_listening_data`.
+        column_name (str): Nombre de la columna que contiene las frases.
+        id_column (str): Nombre de la columna que contiene los identificadores.
+        output_dir (str): Directorio de los checkpoints de cada shard y del
+            limitador compartido.
+        openai_api_key (str): Llave de la API de OpenAI.
+        n_shards (int): Número total de shards.
+        n_workers (int): Procesos simultáneos. Por defecto uno por shard.
+        shard_ids (list): Shards a ejecutar en esta máquina. Por defecto todos.
+        batch_size (int): Número máximo de frases por lote.
+        requests_per_minute (int): Presupuesto global de solicitudes por minuto.
+        tokens_per_minute (int): Presupuesto global de tokens por minuto.
+        root_path (str): Ruta base de las carpetas de clientes.
+        file_format (str): Formato de los archivos del cliente.
+        clean (bool): Si es True, se aplica `clean_text` antes de codificar.
+        cache_path (str): Caché compartido por todos los procesos.
+        chunksize (int): Filas por bloque al repartir la carpeta por filas.
+        codificacion (dict): Argumentos adicionales de `Codificacion`, por
+            ejemplo `max_concurrency`, `model` o `api_base`.
+        **params: Parámetros adicionales del prompt.
+
+    Returns:
+        list: Reporte de cobertura de cada shard ejecutado.
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    shard_ids = list(range(n_shards)) if shard_ids is None else list(shard_ids)
+    files = list_social_listening_files(folder_name, root_path, file_format)
+    config = {
+        "task": task,
+        "params": params,
+        "folder_name": folder_name,
+        "column_name": column_name,
+        "id_column": id_column,
+        "output_dir": output_dir,
+        "openai_api_key": openai_api_key,
+        "n_shards": n_shards,
+        "batch_size": batch_size,
+        "requests_per_minute": requests_per_minute,
+        "tokens_per_minute": tokens_per_minute,
+        "root_path": root_path,
+        "file_format": file_format,
+        "clean": clean,
+        "cache_path": cache_path,
+        "chunksize": chunksize,
+        "mode": shard_mode(output_dir, n_shards, len(files)),
+        "codificacion": codificacion or {},
+    }
+    # Se crea el limitador antes de iniciar los procesos para que su tabla
+    # exista una sola vez
+    if requests_per_minute or tokens_per_minute:
+        SharedRateLimiter(
+            os.path.join(output_dir, "rate_limit.db"),
+            requests_per_minute,
+            tokens_per_minute,
+        )
+
+    # spawn evita heredar hilos y conexiones abiertas del proceso principal
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=n_workers or len(shard_ids), mp_context=context
+    ) as executor:
+        futures = [executor.submit(run_shard, config, shard) for shard in shard_ids]
+        reports = [future.result() for future in futures]
+
+    for report in reports:
+        print(
+            f"Shard {report['shard']}: {report['coverage']:.2%} "
+            f"({report['coded']} de {report['phrases']} frases)"
+        )
+    return reports
+
+
+def merge_shards(output_dir: str, n_shards: int) -> pd.Series:
+    """
+    Combina los resultados de todos los shards en una serie indexada por el id
+    de cada frase y ordenada por id, de modo que el resultado no depende del
+    orden en que terminaron los shards.
+
+    Args:
+        output_dir (str): Directorio de los checkpoints.
+        n_shards (int): Número total de shards.
+
+    Returns:
+        pd.Series: Resultado de cada frase.
+    """
+    paths = [shard_path(output_dir, shard, n_shards) for shard in range(n_shards)]
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        print(f"Shards sin checkpoint: {len(missing)}")
+    stale = set(glob.glob(os.path.join(output_dir, "shard-*.jsonl"))) - set(paths)
+    if stale:
+        print(f"Se ignoran {len(stale)} checkpoints de otro número de shards")
+
+    results = {}
+    for path in paths:
+        for record in Checkpoint(path):
+            results.update(record["results"])
+    return pd.Series(results, dtype=object).sort_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--task", type=str, required=True)
+    parser.add_argument("--folder_name", type=str, required=True)
+    parser.add_argument("--column_name", type=str, default="text")
+    parser.add_argument("--id_column", type=str, default="ID")
+    parser.add_argument("--output_dir", type=str, default=None)
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--shard_ids", type=int, nargs="+", default=None)
+    parser.add_argument("--batch_size", type=int, default=None)
+    parser.add_argument("--requests_per_minute", type=int, default=None)
+    parser.add_argument("--tokens_per_minute", type=int, default=None)
+    parser.add_argument("--max_concurrency", type=int, default=1)
+    parser.add_argument("--model", type=str, default="gpt-3.5-turbo")
+    parser.add_argument("--api_base", type=str, default=None)
+    parser.add_argument("--root_path", type=str, default="../data/")
+    parser.add_argument("--file_format", type=str, default="csv")
+    parser.add_argument("--clean", action="store_true")
+    parser.add_argument("--cache_path", type=str, default=None)
+    parser.add_argument("--num_topicos", type=int, default=None)
+    parser.add_argument("--lang", type=str, default=None)
+    parser.add_argument("--merge", action="store_true")
+    args = parser.parse_args(argv)
+
+    output_dir = args.output_dir or os.path.join(
+        "..", "artifacts", args.folder_name, f"{args.task}_shards"
+    )
+    if args.merge:
+        results = merge_shards(output_dir, args.shards)
+        path = os.path.join(output_dir, f"{args.task}.parquet")
+        df = results.rename(args.task).rename_axis(args.id_column).reset_index()
+        write_frame(df, path, "parquet")
+        print(f"{len(results)} resultados guardados en {path}")
+        return
+
+    params = {
+        key: value
+        for key, value in (("num_topicos", args.num_topicos), ("lang", args.lang))
+        if value is not None
+    }
+    run_sharded(
+        args.task,
+        args.folder_name,
+        args.column_name,
+        args.id_column,
+        output_dir,
+        os.environ.get("OPENAI_API_KEY"),
+        args.shards,
+        n_workers=args.workers,
+        shard_ids=args.shard_ids,
+        batch_size=args.batch_size,
+        requests_per_minute=args.requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute,
+        root_path=args.root_path,
+        file_format=args.file_format,
+        clean=args.clean,
+        cache_path=args.cache_path,
+        codificacion={
+            "max_concurrency": args.max_concurrency,
+            "model": args.model,
+            "api_base": args.api_base,
+        },
+        **params,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Migración de los resultados guardados con pickle al almacenamiento de
+resultados: las listas de respuestas pasan a JSONL comprimido (".jsonl.gz") y
+los DataFrames o Series a Parquet, junto a cada ".pkl" original.
+
+Uso:
+    python store.py ../artifacts/cliente
+    python store.py ../artifacts/cliente/sentiment.pkl --remove
+"""
+
+import os
+import glob
+import argparse
+
+from data.utils import migrate_pickle
+
+
+def migrate_paths(paths: list, remove: bool = False) -> list:
+    """
+    Migra los ".pkl" indicados y los de las carpetas indicadas (recorridas
+    de forma recursiva). Los objetos que no son respuestas ni tablas se
+    dejan como están.
+
+    Args:
+        paths (list): Archivos ".pkl" o carpetas.
+        remove (bool): Si es True, se borra cada ".pkl" migrado.
+
+    Returns:
+        list: Rutas de los archivos nuevos.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                sorted(glob.glob(os.path.join(path, "**", "*.pkl"), recursive=True))
+            )
+        else:
+            files.append(path)
+
+    migrated = []
+    for file in files:
+        try:
+            new_path = migrate_pickle(file, remove)
+        except TypeError as e:
+            print(f"Se omite {file}: {e}")
+            continue
+        print(f"{file} -> {new_path}")
+        migrated.append(new_path)
+    return migrated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", type=str, nargs="+")
+    parser.add_argument("--remove", action="store_true")
+    args = parser.parse_args(argv)
+
+    migrated = migrate_paths(args.paths, args.remove)
+    print(f"Archivos migrados: {len(migrated)}")
+
+
+if __name__ == "__main__":
+    main()
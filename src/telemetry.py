@@ -0,0 +1,342 @@
+import json
+import time
+import threading
+
+import numpy as np
+
+# Precio en dólares por cada 1000 tokens: (prompt, respuesta)
+PRICES_PER_1K_TOKENS = {
+    "gpt-3.5-turbo": (0.0015, 0.002),
+    "gpt-3.5-turbo-16k": (0.003, 0.004),
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-32k": (0.06, 0.12),
+}
+
+
+class Telemetry:
+
+    """
+    Registro estructurado de cada solicitud al modelo: latencia, tokens de
+    prompt y de respuesta, reintentos, tamaño del lote y resultado, además de
+    los aciertos del caché. Cada registro se entrega a los hooks registrados
+    y se puede exportar como JSON o en el formato de texto de Prometheus.
+    """
+
+    def __init__(self, hooks: list = None, prices: dict = None):
+        """
+        Args:
+            hooks (list): Funciones que reciben cada registro (un diccionario)
+                apenas se produce. Se llaman desde el hilo que hizo la solicitud.
+            prices (dict): Precios por 1000 tokens de cada modelo, como
+                PRICES_PER_1K_TOKENS, para estimar el costo.
+        """
+        self.hooks = list(hooks or [])
+        self.prices = prices or PRICES_PER_1K_TOKENS
+        self.records = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.run = 0
+        self.task = None
+        self.run_start = time.time()
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook) -> None:
+        """
+        Registra una función que recibe cada registro.
+
+        Args:
+            hook: Función de un argumento.
+
+        Returns:
+            None.
+        """
+        self.hooks.append(hook)
+
+    def start_run(self, task: str) -> None:
+        """
+        Marca el inicio de una codificación; los registros siguientes quedan
+        asociados a ella.
+
+        Args:
+            task (str): Nombre de la tarea.
+
+        Returns:
+            None.
+        """
+        with self._lock:
+            self.run += 1
+            self.task = task
+            self.run_start = time.time()
+
+    def _emit(self, record: dict) -> None:
+        with self._lock:
+            self.records.append(record)
+        for hook in self.hooks:
+            hook(record)
+
+    def record_request(
+        self,
+        model: str,
+        batch_size: int,
+        latency: float,
+        elapsed: float,
+        retries: int,
+        usage: dict = None,
+        error: str = None,
+        price_factor: float = 1.0,
+    ) -> None:
+        """
+        Registra una solicitud al modelo.
+
+        Args:
+            model (str): LLM utilizado.
+            batch_size (int): Frases en el lote.
+            latency (float): Segundos de la solicitud que tuvo éxito.
+            elapsed (float): Segundos totales, incluidas las esperas del
+                limitador y los reintentos.
+            retries (int): Reintentos por errores transitorios.
+            usage (dict): Campo `usage` de la respuesta.
+            error (str): Tipo de error si la solicitud falló.
+            price_factor (float): Fracción del precio por token que se cobra,
+                por ejemplo 0.5 en la API de lotes.
+
+        Returns:
+            None.
+        """
+        usage = usage or {}
+        prompt_price, completion_price = self.prices.get(model, (0.0, 0.0))
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        self._emit(
+            {
+                "event": "request",
+                "run": self.run,
+                "task": self.task,
+                "timestamp": time.time(),
+                "model": model,
+                "batch_size": batch_size,
+                "latency": latency,
+                "elapsed": elapsed,
+                "retries": retries,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "cost": (
+                    prompt_tokens * prompt_price + completion_tokens * completion_price
+                )
+                * price_factor
+                / 1000,
+                "status": "error" if error else "ok",
+                "error": error,
+            }
+        )
+
+    def record_cache(self, hits: int, misses: int) -> None:
+        """
+        Registra los aciertos y fallos del caché de una búsqueda.
+
+        Args:
+            hits (int): Frases encontradas en el caché.
+            misses (int): Frases no encontradas.
+
+        Returns:
+            None.
+        """
+        with self._lock:
+            self.cache_hits += hits
+            self.cache_misses += misses
+        self._emit(
+            {
+                "event": "cache",
+                "run": self.run,
+                "task": self.task,
+                "timestamp": time.time(),
+                "hits": hits,
+                "misses": misses,
+            }
+        )
+
+    def summary(self, run: int = None) -> dict:
+        """
+        Resume los registros de una codificación o de todas.
+
+        Args:
+            run (int): Número de la codificación. None para todas.
+
+        Returns:
+            dict: Solicitudes, errores, reintentos, percentiles de latencia,
+            tamaño medio de lote, tokens (totales y por frase enviada), costo
+            estimado y aciertos del caché.
+        """
+        with self._lock:
+            records = [r for r in self.records if run is None or r["run"] == run]
+        requests = [r for r in records if r["event"] == "request"]
+        ok = [r for r in requests if r["status"] == "ok"]
+        # Las solicitudes de la API de lotes no tienen latencia propia
+        latencies = np.array(
+            [r["latency"] for r in ok if r["latency"] is not None], dtype=float
+        )
+        caches = [r for r in records if r["event"] == "cache"]
+
+        def percentile(q):
+            return float(np.percentile(latencies, q)) if len(latencies) else None
+
+        phrases_sent = sum(r["batch_size"] or 0 for r in ok)
+        prompt_tokens = sum(r["prompt_tokens"] for r in requests)
+        completion_tokens = sum(r["completion_tokens"] for r in requests)
+
+        def per_phrase(tokens):
+            return tokens / phrases_sent if phrases_sent else None
+
+        return {
+            "requests": len(requests),
+            "errors": len(requests) - len(ok),
+            "retries": sum(r["retries"] for r in requests),
+            "latency_p50": percentile(50),
+            "latency_p95": percentile(95),
+            "latency_max": float(latencies.max()) if len(latencies) else None,
+            "mean_batch_size": (
+                float(np.mean([r["batch_size"] for r in ok])) if ok else None
+            ),
+            "phrases_sent": phrases_sent,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "prompt_tokens_per_phrase": per_phrase(prompt_tokens),
+            "completion_tokens_per_phrase": per_phrase(completion_tokens),
+            "cost": sum(r["cost"] for r in requests),
+            "cache_hits": sum(r["hits"] for r in caches),
+            "cache_misses": sum(r["misses"] for r in caches),
+        }
+
+    def print_summary(self, run: int = None) -> dict:
+        """
+        Imprime el resumen de una codificación (por defecto la última).
+
+        Args:
+            run (int): Número de la codificación.
+
+        Returns:
+            dict: El resumen impreso.
+        """
+        summary = self.summary(self.run if run is None else run)
+        if summary["latency_p50"] is not None:
+            latency = (
+                f"latencia p50 {summary['latency_p50']:.2f} s, "
+                f"p95 {summary['latency_p95']:.2f} s, "
+            )
+        else:
+            latency = ""
+        print(
+            f"Solicitudes: {summary['requests']} ({summary['errors']} con error), "
+            f"{latency}tokens: {summary['prompt_tokens']} + "
+            f"{summary['completion_tokens']}, costo estimado: ${summary['cost']:.4f}"
+        )
+        return summary
+
+    def to_json(self, path: str = None) -> str:
+        """
+        Exporta el resumen y todos los registros como JSON.
+
+        Args:
+            path (str): Archivo donde escribir el JSON. None para solo devolverlo.
+
+        Returns:
+            str: Cadena JSON.
+        """
+        with self._lock:
+            records = list(self.records)
+        payload = json.dumps(
+            {"summary": self.summary(), "records": records}, ensure_ascii=False
+        )
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(payload)
+        return payload
+
+    def to_prometheus(self, path: str = None, prefix: str = "codificacion") -> str:
+        """
+        Exporta los contadores acumulados en el formato de texto de Prometheus,
+        por ejemplo para el textfile collector de node_exporter.
+
+        Args:
+            path (str): Archivo donde escribir las métricas. None para solo
+                devolverlas.
+            prefix (str): Prefijo de los nombres de las métricas.
+
+        Returns:
+            str: Métricas en formato de texto.
+        """
+        summary = self.summary()
+        with self._lock:
+            requests = [r for r in self.records if r["event"] == "request"]
+        # Las solicitudes de la API de lotes no tienen latencia propia
+        latencies = [
+            r["latency"]
+            for r in requests
+            if r["status"] == "ok" and r["latency"] is not None
+        ]
+
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{prefix}_{name}{labels} {value}")
+
+        metric(
+            "requests_total",
+            "counter",
+            "Solicitudes al modelo.",
+            [
+                ('{status="ok"}', summary["requests"] - summary["errors"]),
+                ('{status="error"}', summary["errors"]),
+            ],
+        )
+        metric("retries_total", "counter", "Reintentos.", [("", summary["retries"])])
+        metric(
+            "tokens_total",
+            "counter",
+            "Tokens consumidos.",
+            [
+                ('{type="prompt"}', summary["prompt_tokens"]),
+                ('{type="completion"}', summary["completion_tokens"]),
+            ],
+        )
+        metric(
+            "cost_dollars_total",
+            "counter",
+            "Costo estimado en dólares.",
+            [("", summary["cost"])],
+        )
+        metric(
+            "cache_lookups_total",
+            "counter",
+            "Búsquedas en el caché.",
+            [
+                ('{result="hit"}', summary["cache_hits"]),
+                ('{result="miss"}', summary["cache_misses"]),
+            ],
+        )
+        metric(
+            "phrases_sent_total",
+            "counter",
+            "Frases enviadas al modelo.",
+            [("", summary["phrases_sent"])],
+        )
+        quantiles = [
+            (f'{{quantile="{q}"}}', float(np.quantile(latencies, q)))
+            for q in (0.5, 0.95, 0.99)
+            if latencies
+        ]
+        metric(
+            "request_latency_seconds",
+            "summary",
+            "Latencia de las solicitudes exitosas.",
+            quantiles + [("_sum", sum(latencies)), ("_count", len(latencies))],
+        )
+
+        text = "\n".join(lines) + "\n"
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(text)
+        return text
@@ -0,0 +1,260 @@
+import numpy as np
+import pandas as pd
+
+
+class TopicClusterer:
+
+    """
+    Agrupa frases por contenido de forma local, sin red: vectoriza el texto
+    limpio con TF-IDF, lo proyecta a un espacio denso de pocas dimensiones con
+    una proyección aleatoria y lo agrupa con k-means esférico. Así solo los
+    ejemplares de cada grupo necesitan enviarse al modelo para nombrar sus
+    tópicos. Está pensado para el resultado de `clean_text`.
+    """
+
+    def __init__(
+        self,
+        n_clusters: int = 100,
+        dimensions: int = 256,
+        max_features: int = 20000,
+        min_df: int = 5,
+        max_df: float = 0.5,
+        sample_size: int = 100000,
+        max_iter: int = 25,
+        chunksize: int = 20000,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            n_clusters (int): Número de grupos.
+            dimensions (int): Dimensiones de la proyección aleatoria.
+            max_features (int): Tamaño máximo del vocabulario.
+            min_df (int): Número mínimo de frases en que debe aparecer un término.
+            max_df (float): Fracción máxima de frases en que puede aparecer un
+                término; los más frecuentes se descartan como palabras vacías.
+            sample_size (int): Frases con que se ajustan los centroides. Luego
+                se asignan todas las frases al centroide más cercano.
+            max_iter (int): Iteraciones máximas de k-means.
+            chunksize (int): Frases que se vectorizan y asignan a la vez, para
+                acotar la memoria.
+            seed (int): Semilla aleatoria.
+        """
+        self.n_clusters = n_clusters
+        self.dimensions = dimensions
+        self.max_features = max_features
+        self.min_df = min_df
+        self.max_df = max_df
+        self.sample_size = sample_size
+        self.max_iter = max_iter
+        self.chunksize = chunksize
+        self.seed = seed
+
+        self.vocabulary = None
+        self.centroids = None
+        self.labels = None
+        self.similarities = None
+        self.term_weights = None
+
+    def _tokens(self, texts: list) -> tuple:
+        # Posición de la frase e índice en el vocabulario de cada término conocido
+        tokens = pd.Series(texts, dtype=object).fillna("").str.split().explode()
+        columns = tokens.map(self.vocabulary).dropna()
+        return columns.index.to_numpy(), columns.to_numpy(dtype=np.int64)
+
+    def build_vocabulary(self, texts: list) -> pd.Series:
+        """
+        Construye el vocabulario a partir de la frecuencia de documento de cada
+        término y calcula su idf.
+
+        Args:
+            texts (list): Textos limpios.
+
+        Returns:
+            pd.Series: Serie término -> índice en el vocabulario.
+        """
+        tokens = pd.Series(texts, dtype=object).fillna("").str.split().explode()
+        pairs = pd.DataFrame({"doc": tokens.index, "term": tokens.to_numpy()})
+        document_frequency = pairs.dropna().drop_duplicates()["term"].value_counts()
+        document_frequency = document_frequency[
+            (document_frequency >= self.min_df)
+            & (document_frequency <= self.max_df * max(1, len(texts)))
+        ].head(self.max_features)
+
+        self.vocabulary = pd.Series(
+            np.arange(len(document_frequency)), index=document_frequency.index
+        )
+        self.idf = (
+            np.log((1 + len(texts)) / (1 + document_frequency.to_numpy())) + 1
+        ).astype(np.float32)
+        rng = np.random.default_rng(self.seed)
+        self.projection = rng.standard_normal(
+            (len(self.vocabulary), self.dimensions), dtype=np.float32
+        )
+        return self.vocabulary
+
+    def transform(self, texts: list) -> np.ndarray:
+        """
+        Vectoriza textos con TF-IDF y la proyección aleatoria. Los vectores
+        quedan normalizados; los textos sin términos del vocabulario quedan
+        en cero.
+
+        Args:
+            texts (list): Textos limpios.
+
+        Returns:
+            np.ndarray: Matriz (len(texts), dimensions).
+        """
+        embeddings = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        rows, columns = self._tokens(texts)
+        if len(rows):
+            contributions = self.projection[columns] * self.idf[columns, None]
+            present, starts = np.unique(rows, return_index=True)
+            embeddings[present] = np.add.reduceat(contributions, starts, axis=0)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+        return embeddings
+
+    def _fit_centroids(self, sample: np.ndarray) -> np.ndarray:
+        # k-means esférico con inicialización k-means++ sobre la muestra
+        rng = np.random.default_rng(self.seed)
+        k = min(self.n_clusters, len(sample))
+        centroids = np.empty((k, sample.shape[1]), dtype=np.float32)
+        centroids[0] = sample[rng.integers(len(sample))]
+        distances = 1 - sample @ centroids[0]
+        for i in range(1, k):
+            weights = np.clip(distances, 0, None) ** 2
+            total = weights.sum()
+            index = (
+                rng.choice(len(sample), p=weights / total)
+                if total > 0
+                else rng.integers(len(sample))
+            )
+            centroids[i] = sample[index]
+            distances = np.minimum(distances, 1 - sample @ centroids[i])
+
+        labels = None
+        for _ in range(self.max_iter):
+            new_labels = (sample @ centroids.T).argmax(axis=1)
+            if labels is not None and np.array_equal(labels, new_labels):
+                break
+            labels = new_labels
+            assignment = np.zeros((len(centroids), len(sample)), dtype=np.float32)
+            assignment[labels, np.arange(len(sample))] = 1
+            sums = assignment @ sample
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            centroids[~empty] = sums[~empty] / norms[~empty]
+            if empty.any():
+                # Los grupos vacíos se reinician con frases al azar
+                centroids[empty] = sample[rng.integers(len(sample), size=empty.sum())]
+        return centroids
+
+    def fit_predict(self, texts: list) -> np.ndarray:
+        """
+        Construye el vocabulario, ajusta los centroides sobre una muestra y
+        asigna cada frase a su grupo. Las frases sin términos del vocabulario
+        quedan en el grupo -1.
+
+        Args:
+            texts (list): Textos limpios.
+
+        Returns:
+            np.ndarray: Grupo de cada frase.
+        """
+        texts = list(texts)
+        self.build_vocabulary(texts)
+
+        rng = np.random.default_rng(self.seed)
+        sample_index = np.sort(
+            rng.choice(len(texts), min(self.sample_size, len(texts)), replace=False)
+        )
+        sample = self.transform([texts[i] for i in sample_index])
+        sample = sample[np.linalg.norm(sample, axis=1) > 0]
+        if not len(sample):
+            raise ValueError("Ninguna frase tiene términos del vocabulario")
+        self.centroids = self._fit_centroids(sample)
+
+        self.labels = np.full(len(texts), -1, dtype=np.int64)
+        self.similarities = np.zeros(len(texts), dtype=np.float32)
+        self.term_weights = np.zeros(
+            (len(self.centroids), len(self.vocabulary)), dtype=np.float32
+        )
+        for start in range(0, len(texts), self.chunksize):
+            chunk = texts[start : (start + self.chunksize)]
+            embeddings = self.transform(chunk)
+            similarities = embeddings @ self.centroids.T
+            labels = similarities.argmax(axis=1)
+            known = np.linalg.norm(embeddings, axis=1) > 0
+            labels[~known] = -1
+            self.labels[start : (start + len(chunk))] = labels
+            self.similarities[start : (start + len(chunk))] = similarities.max(axis=1)
+
+            # Peso TF-IDF acumulado de cada término en cada grupo
+            rows, columns = self._tokens(chunk)
+            cluster = labels[rows]
+            keep = cluster >= 0
+            self.term_weights += np.bincount(
+                cluster[keep] * len(self.vocabulary) + columns[keep],
+                weights=self.idf[columns[keep]],
+                minlength=self.term_weights.size,
+            ).reshape(self.term_weights.shape)
+
+        return self.labels
+
+    def exemplars(self, texts: list, n_exemplars: int = 5) -> dict:
+        """
+        Frases distintas más cercanas al centroide de cada grupo.
+
+        Args:
+            texts (list): Los mismos textos pasados a `fit_predict`.
+            n_exemplars (int): Ejemplares por grupo.
+
+        Returns:
+            dict: Diccionario grupo -> lista de textos.
+        """
+        frame = pd.DataFrame(
+            {"cluster": self.labels, "similarity": self.similarities, "text": texts}
+        )
+        frame = (
+            frame[frame["cluster"] >= 0]
+            .sort_values("similarity", ascending=False)
+            .drop_duplicates(["cluster", "text"])
+            .groupby("cluster")
+            .head(n_exemplars)
+        )
+        return frame.groupby("cluster")["text"].agg(list).to_dict()
+
+    def top_terms(self, n_terms: int = 10) -> dict:
+        """
+        Términos con mayor peso TF-IDF acumulado en cada grupo.
+
+        Args:
+            n_terms (int): Términos por grupo.
+
+        Returns:
+            dict: Diccionario grupo -> lista de términos.
+        """
+        terms = self.vocabulary.index.to_numpy()
+        top = np.argsort(-self.term_weights, axis=1)[:, :n_terms]
+        return {
+            cluster: [
+                terms[i] for i in top[cluster] if self.term_weights[cluster, i] > 0
+            ]
+            for cluster in range(len(top))
+        }
+
+    def report(self) -> dict:
+        """
+        Resumen del último agrupamiento.
+
+        Returns:
+            dict: Frases, grupos no vacíos, frases sin grupo y tamaño del vocabulario.
+        """
+        sizes = np.bincount(self.labels[self.labels >= 0], minlength=self.n_clusters)
+        return {
+            "phrases": len(self.labels),
+            "clusters": int((sizes > 0).sum()),
+            "unclustered": int((self.labels < 0).sum()),
+            "largest_cluster": int(sizes.max()) if len(sizes) else 0,
+            "vocabulary": len(self.vocabulary),
+        }
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos del paquete se importan desde src, como en los scripts
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
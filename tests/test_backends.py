@@ -0,0 +1,108 @@
+import asyncio
+import json
+
+import openai
+import pandas as pd
+import pytest
+import requests
+
+from backends import HTTPBackend, api_error
+from codification import Codificacion
+from mock_server import start_server
+
+MESSAGES = [{"role": "user", "content": "Sentimiento de:\nFrase1: hola"}]
+
+
+def http_response(status: int, payload=None, text: str = "") -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response._content = (
+        json.dumps(payload).encode("utf-8") if payload is not None else text.encode()
+    )
+    response.headers["Content-Type"] = "application/json"
+    return response
+
+
+@pytest.mark.parametrize(
+    "status, error",
+    [
+        (429, openai.error.RateLimitError),
+        (500, openai.error.APIError),
+        (502, openai.error.APIError),
+        (503, openai.error.ServiceUnavailableError),
+        (401, openai.error.AuthenticationError),
+        (400, openai.error.InvalidRequestError),
+    ],
+)
+def test_api_error_maps_status_codes(status, error):
+    exception = api_error(http_response(status, {"error": {"message": "falló"}}))
+    assert type(exception) is error
+    assert exception.http_status == status
+    assert exception.user_message == "falló"
+
+
+def test_api_error_falls_back_to_the_body_text():
+    exception = api_error(http_response(500, text="<html>error</html>"))
+    assert exception.user_message == "<html>error</html>"
+
+
+@pytest.fixture
+def server():
+    server = start_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def api_base(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def test_sync_and_async_completions(server):
+    backend = HTTPBackend("test", api_base=api_base(server), pool_size=4)
+    try:
+        response = backend.complete(MESSAGES, "gpt-3.5-turbo", 0)
+        content = json.loads(response["choices"][0]["message"]["content"])
+        assert list(content) == ["Frase1"]
+
+        async def complete_many():
+            return await asyncio.gather(
+                *(backend.acomplete(MESSAGES, "gpt-3.5-turbo", 0) for _ in range(8))
+            )
+
+        responses = asyncio.run(complete_many())
+        assert all(r["choices"][0]["message"]["content"] for r in responses)
+        assert server.requests == 9
+    finally:
+        backend.close()
+
+
+def test_busy_server_raises_service_unavailable(server):
+    server.error_rate = 1.0
+    backend = HTTPBackend("test", api_base=api_base(server))
+    try:
+        with pytest.raises(openai.error.ServiceUnavailableError):
+            backend.complete(MESSAGES, "gpt-3.5-turbo", 0)
+    finally:
+        backend.close()
+
+
+def test_unreachable_server_raises_a_connection_error(server):
+    url = api_base(server)
+    server.shutdown()
+    server.server_close()
+    backend = HTTPBackend("test", api_base=url, connect_timeout=1)
+    with pytest.raises(openai.error.APIConnectionError):
+        backend.complete(MESSAGES, "gpt-3.5-turbo", 0)
+
+
+def test_codificacion_over_http(server):
+    backend = HTTPBackend("test", api_base=api_base(server), pool_size=4)
+    codificacion = Codificacion("test", backend=backend, max_concurrency=4)
+    df = pd.DataFrame({"ID": range(12), "text": [f"frase {n}" for n in range(12)]})
+    try:
+        codificacion.get_sentiment(df, 3, "text", "ID")
+    finally:
+        backend.close()
+    assert codificacion.report["coverage"] == 1.0
+    assert server.requests == 4
@@ -0,0 +1,64 @@
+import json
+
+import pandas as pd
+import pytest
+
+from codification import Codificacion
+from mock_server import start_server
+
+
+@pytest.fixture
+def api_base():
+    server = start_server(batch_delay=0.05)
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+
+
+@pytest.fixture
+def df():
+    texts = ["hola mundo", "qué buen día", "pésimo servicio", "café verde"] * 5
+    return pd.DataFrame({"ID": range(len(texts)), "text": texts})
+
+
+def test_tasks_sharing_a_job_dir_have_their_own_rounds(api_base, df, tmp_path):
+    codificacion = Codificacion("mock", api_base=api_base, max_requeue=0)
+
+    codificacion.codificate_batch(
+        "sentiment", df, 8, "text", "ID", str(tmp_path), poll_interval=0.05
+    )
+    assert codificacion.report["coverage"] == 1.0
+
+    codificacion.codificate_batch(
+        "topics", df, 8, "text", "ID", str(tmp_path), poll_interval=0.05, num_topicos=2
+    )
+    assert codificacion.report["coverage"] == 1.0
+    assert codificacion.report["requeued"] == 0
+    assert codificacion.report["rounds"] == 1
+
+
+def test_metrics_export_after_a_batch_run(api_base, df, tmp_path):
+    codificacion = Codificacion("mock", api_base=api_base)
+    codificacion.codificate_batch(
+        "sentiment", df, 8, "text", "ID", str(tmp_path), poll_interval=0.05
+    )
+
+    metrics = codificacion.telemetry.to_prometheus()
+
+    assert 'codificacion_requests_total{status="ok"} 3' in metrics
+    assert "codificacion_request_latency_seconds_count 0" in metrics
+    assert codificacion.telemetry.summary()["latency_p50"] is None
+
+
+def test_state_file_holds_only_the_jobs(api_base, df, tmp_path):
+    codificacion = Codificacion("mock", api_base=api_base, deduplicate=True)
+
+    codificacion.codificate_batch(
+        "sentiment", df, 2, "text", "ID", str(tmp_path), poll_interval=0.05
+    )
+
+    state = json.loads((tmp_path / "sentiment.state.json").read_text())
+    assert set(state) == {"round", "jobs"}
+    assert all(job["ingested"] for job in state["jobs"])
+    # Los duplicados reciben el resultado de su representante desde el índice
+    assert codificacion.report["coverage"] == 1.0
+    assert (tmp_path / "sentiment.index_0.jsonl").exists()
@@ -0,0 +1,64 @@
+from batching import BatchPlanner
+
+TEXTS = [f"frase número {n} sobre el servicio" for n in range(10)]
+IDS = list(range(10))
+
+
+def test_batches_fit_the_context_with_the_safety_margin():
+    planner = BatchPlanner(context_tokens=1000)
+    tokens = planner.phrase_tokens("sentiment", 0, TEXTS[0])
+    prompt_tokens = 900 - 3 * tokens
+
+    batches = planner.plan("sentiment", IDS, TEXTS, prompt_tokens)
+    assert [len(ids_batch) for ids_batch, _ in batches] == [3, 3, 3, 1]
+    for ids_batch, text_batch in batches:
+        used = sum(
+            planner.phrase_tokens("sentiment", id_i, text)
+            for id_i, text in zip(ids_batch, text_batch)
+        )
+        assert prompt_tokens + used <= 900
+    assert planner.report()["planned_requests"] == 4
+
+    without_margin = BatchPlanner(context_tokens=1000, safety_margin=1.0)
+    batches = without_margin.plan("sentiment", IDS, TEXTS, prompt_tokens)
+    assert len(batches[0][0]) > 3
+
+
+def test_max_batch_size_caps_each_batch():
+    planner = BatchPlanner(context_tokens=100000)
+    batches = planner.plan("sentiment", IDS, TEXTS, 100, max_batch_size=4)
+    assert [ids_batch for ids_batch, _ in batches] == [IDS[:4], IDS[4:8], IDS[8:]]
+    assert [text_batch for _, text_batch in batches] == [
+        TEXTS[:4],
+        TEXTS[4:8],
+        TEXTS[8:],
+    ]
+    assert len(planner.plan("sentiment", IDS, TEXTS, 100)) == 1
+
+
+def test_compact_format_budgets_fewer_output_tokens():
+    normal = BatchPlanner(context_tokens=1000)
+    compact = BatchPlanner(context_tokens=1000, compact=True)
+    for task in ["sentiment", "topics", "translation"]:
+        assert compact.phrase_tokens(task, 123, TEXTS[0]) < normal.phrase_tokens(
+            task, 123, TEXTS[0]
+        )
+    assert len(compact.plan("sentiment", IDS, TEXTS, 800)) < len(
+        normal.plan("sentiment", IDS, TEXTS, 800)
+    )
+
+
+def test_multitask_adds_the_output_of_each_task():
+    planner = BatchPlanner()
+    both = planner.phrase_tokens(["sentiment", "topics"], 1, TEXTS[0])
+    sentiment = planner.phrase_tokens("sentiment", 1, TEXTS[0])
+    topics = planner.phrase_tokens("topics", 1, TEXTS[0])
+    assert both > max(sentiment, topics)
+
+
+def test_oversized_phrase_goes_in_its_own_batch():
+    planner = BatchPlanner(context_tokens=1000)
+    texts = ["corta", "muy larga " * 500, "otra corta", "final"]
+    batches = planner.plan("sentiment", [1, 2, 3, 4], texts, 100)
+    assert [ids_batch for ids_batch, _ in batches] == [[1], [2], [3, 4]]
+    assert planner.report()["oversized_phrases"] == 1
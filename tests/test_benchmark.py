@@ -0,0 +1,60 @@
+from benchmark import SUITE_STAGES, bench_suite, compare_to_baseline, run_stage
+
+
+def suite(p99, items_per_sec=100.0, peak_memory_mb=10.0):
+    stage = {
+        "items_per_sec": items_per_sec,
+        "latency_p50": 0.01,
+        "latency_p99": p99,
+        "peak_memory_mb": peak_memory_mb,
+    }
+    return {"suite": {"rows": 100}, "stages": {"parsing": stage}}
+
+
+def test_p99_regression_fails_the_check():
+    baseline = suite(p99=0.02)
+    assert not compare_to_baseline(suite(p99=0.025), baseline)["parsing"]["regression"]
+    comparison = compare_to_baseline(suite(p99=0.05), baseline)["parsing"]
+    assert comparison["regression"]
+    assert comparison["latency_p99_ratio"] == 2.5
+    assert not compare_to_baseline(suite(p99=0.05), baseline, p99_tolerance=2.0)[
+        "parsing"
+    ]["regression"]
+
+
+def test_throughput_and_memory_regressions():
+    baseline = suite(p99=0.02)
+    assert compare_to_baseline(suite(0.02, items_per_sec=50.0), baseline)["parsing"][
+        "regression"
+    ]
+    assert compare_to_baseline(suite(0.02, peak_memory_mb=30.0), baseline)["parsing"][
+        "regression"
+    ]
+
+
+def test_run_stage_counts_items_and_calls_finish():
+    finished = []
+
+    def setup():
+        return [1, 2, 3], lambda unit: unit * 10, lambda: finished.append(True)
+
+    stage = run_stage(setup, repeat=2)
+    assert stage["items"] == 60
+    assert stage["units"] == 3
+    assert stage["items_per_sec"] == stage["items"] / stage["seconds"]
+    assert stage["latency_p99"] >= stage["latency_p50"]
+    # Dos ejecuciones cronometradas y una con tracemalloc
+    assert len(finished) == 3
+
+
+def test_suite_runs_every_stage_offline():
+    result = bench_suite(200, latency=0.0, repeat=1)
+
+    assert list(result["stages"]) == SUITE_STAGES
+    for stage in result["stages"].values():
+        assert stage["items"] > 0
+        assert stage["peak_memory_mb"] >= 0
+
+    compared = bench_suite(200, stages=["parsing"], repeat=1, baseline=result)
+    assert list(compared["comparison"]) == ["parsing"]
+    assert compare_to_baseline(result, result)["parsing"]["regression"] is False
@@ -0,0 +1,111 @@
+import sqlite3
+
+import pandas as pd
+
+from cache import CompletionCache, make_key
+from codification import Codificacion
+from mock_server import MockBackend
+
+
+def table_size(cache):
+    return (
+        cache._connection()
+        .execute("SELECT COALESCE(SUM(size), 0) FROM entries")
+        .fetchone()[0]
+    )
+
+
+def test_size_counter_follows_inserts_replacements_and_evictions(tmp_path):
+    cache = CompletionCache(str(tmp_path / "cache.db"), max_size_bytes=200)
+    cache.set_many({f"k{n}": "x" * 10 for n in range(5)})
+    assert cache.size() == table_size(cache) == 60
+
+    cache.set_many({"k0": "x" * 40})
+    assert cache.size() == table_size(cache) == 90
+
+    cache.set_many({f"n{n}": "y" * 30 for n in range(10)})
+    assert cache.size() == table_size(cache) <= 200
+    assert cache.get_many(["n9"]) == {"n9": "y" * 30}
+
+
+def test_existing_cache_initializes_the_counter(tmp_path):
+    path = str(tmp_path / "cache.db")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+        "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+    )
+    connection.execute("INSERT INTO entries VALUES ('a', '\"abc\"', 5, 0)")
+    connection.commit()
+    connection.close()
+
+    cache = CompletionCache(path)
+    assert cache.size() == 5
+    assert cache.stats()["size_bytes"] == 5
+    assert CompletionCache(path).size() == 5
+
+
+def sentiment_df(texts):
+    return pd.DataFrame({"ID": range(len(texts)), "text": texts})
+
+
+def test_make_key_depends_on_model_task_and_normalized_text():
+    key = make_key("gpt-3.5-turbo", 0, "sentiment", "hola  mundo")
+    assert key == make_key("gpt-3.5-turbo", 0, "sentiment", " hola mundo ")
+    assert key != make_key("gpt-4", 0, "sentiment", "hola mundo")
+    assert key != make_key("gpt-3.5-turbo", 0.5, "sentiment", "hola mundo")
+    assert key != make_key("gpt-3.5-turbo", 0, "topics", "hola mundo")
+    assert key != make_key("gpt-3.5-turbo", 0, "sentiment", "hola")
+
+
+def test_get_many_and_set_many_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    CompletionCache(path).set_many({"a": "positivo", "b": ["x", "y"]})
+
+    cache = CompletionCache(path)
+    assert cache.get_many(["a", "b", "c"]) == {"a": "positivo", "b": ["x", "y"]}
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_cached_phrases_are_not_sent_again(tmp_path):
+    cache = CompletionCache(str(tmp_path / "cache.db"))
+    texts = [f"frase {n}" for n in range(6)]
+
+    first = MockBackend()
+    Codificacion("x", backend=first, cache=cache).get_sentiment(
+        sentiment_df(texts[:4]), 2, "text", "ID"
+    )
+    assert first.requests == 2
+
+    second = MockBackend()
+    codificacion = Codificacion("x", backend=second, cache=cache)
+    responses = codificacion.get_sentiment(sentiment_df(texts), 2, "text", "ID")
+    # Solo las dos frases nuevas van al modelo
+    assert second.requests == 1
+    assert codificacion.report["coverage"] == 1.0
+    assert len(codificacion.from_json_list_to_df(responses)) == 6
+    assert codificacion.telemetry.summary()["cache_hits"] == 4
+
+
+def test_repeated_texts_are_sent_once(tmp_path):
+    cache = CompletionCache(str(tmp_path / "cache.db"))
+    backend = MockBackend()
+    codificacion = Codificacion("x", backend=backend, cache=cache)
+    responses = codificacion.get_sentiment(
+        sentiment_df(["hola", "hola ", "chao", "hola"]), 10, "text", "ID"
+    )
+    assert codificacion.telemetry.summary()["phrases_sent"] == 2
+    assert len(codificacion.from_json_list_to_df(responses)) == 4
+
+
+def test_task_parameters_are_part_of_the_key(tmp_path):
+    cache = CompletionCache(str(tmp_path / "cache.db"))
+    df = sentiment_df(["hola mundo", "chao mundo"])
+    Codificacion("x", backend=MockBackend(), cache=cache).get_topics(
+        df, 10, "text", "ID", 3
+    )
+
+    backend = MockBackend()
+    Codificacion("x", backend=backend, cache=cache).get_topics(df, 10, "text", "ID", 5)
+    assert backend.requests == 1
@@ -0,0 +1,63 @@
+import pandas as pd
+
+from checkpoint import Checkpoint
+from codification import Codificacion
+from mock_server import MockBackend
+
+
+def test_append_after_a_torn_tail_keeps_the_new_records(tmp_path):
+    path = tmp_path / "sentiment.jsonl"
+    checkpoint = Checkpoint(str(path))
+    checkpoint.append([1], '{"Frase1": "positivo"}', {"1": "positivo"})
+    with open(path, "a", encoding="utf-8") as file:
+        file.write('{"ids": ["2"], "response": "{\\"Fra')
+
+    resumed = Checkpoint(str(path))
+    resumed.append([3], '{"Frase3": "negativo"}', {"3": "negativo"})
+    resumed.append([4], '{"Frase4": "neutro"}', {"4": "neutro"})
+
+    assert Checkpoint(str(path)).coded_ids() == {"1", "3", "4"}
+    assert len(list(Checkpoint(str(path)).iter_responses())) == 3
+
+
+def test_torn_first_line_is_dropped(tmp_path):
+    path = tmp_path / "sentiment.jsonl"
+    path.write_text('{"ids": ["1"], "resp', encoding="utf-8")
+    Checkpoint(str(path)).append([2], '{"Frase2": "neutro"}', {"2": "neutro"})
+    assert Checkpoint(str(path)).coded_ids() == {"2"}
+
+
+def test_resume_after_a_torn_tail_codes_each_phrase_once(tmp_path):
+    path = str(tmp_path / "sentiment.jsonl")
+    df = pd.DataFrame({"ID": range(6), "text": [f"frase {n}" for n in range(6)]})
+    first = Codificacion("x", backend=MockBackend())
+    stream = first.codificate_stream("sentiment", df.iloc[:2], 1, "text", "ID", path)
+    for _ in stream:
+        pass
+    with open(path, "a", encoding="utf-8") as file:
+        file.write('{"ids": ["2"], "resp')
+
+    backend = MockBackend()
+    second = Codificacion("x", backend=backend)
+    for _ in second.codificate_stream("sentiment", df, 1, "text", "ID", path):
+        pass
+    assert backend.requests == 4
+    assert Checkpoint(path).coded_ids() == {str(n) for n in range(6)}
+
+    third = MockBackend()
+    for _ in Codificacion("x", backend=third).codificate_stream(
+        "sentiment", df, 1, "text", "ID", path
+    ):
+        pass
+    assert third.requests == 0
+
+
+def test_codificate_with_a_checkpoint_returns_every_saved_response(tmp_path):
+    path = str(tmp_path / "sentiment.jsonl")
+    df = pd.DataFrame({"ID": range(4), "text": [f"frase {n}" for n in range(4)]})
+    codificacion = Codificacion("x", backend=MockBackend())
+    codificacion.codificate("sentiment", df.iloc[:2], 1, "text", "ID", path)
+
+    responses = codificacion.codificate("sentiment", df, 1, "text", "ID", path)
+    assert len(responses) == 4
+    assert responses == list(Checkpoint(path).iter_responses())
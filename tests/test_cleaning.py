@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.utils import (
+    TOKENIZER_CACHE_SIZE,
+    clean_text,
+    remove_special_characters,
+    remove_word_after_hashtag,
+    tokenizador,
+)
+
+TEXTS = [
+    "#niñoFeliz hoy",
+    "#año2023x",
+    "#Ñandú",
+    "#caféabc hola",
+    "Qué día #cafeína con @usuario_1 https://t.co/abc123 gooooool",
+    "¡Increíble! #medioambiente :) 😀",
+    "sin hashtags ni acentos",
+    "#café",
+    "#café",
+    "",
+]
+
+
+def legacy_clean_text(texts: list) -> list:
+    # Cadena original: una pasada por paso y por texto
+    return [
+        remove_special_characters(
+            remove_word_after_hashtag(tokenizador.__wrapped__(text))
+        ).lower()
+        for text in texts
+    ]
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"deduplicate": False},
+        {"deduplicate": True},
+        {"as_category": True},
+    ],
+)
+def test_clean_text_matches_legacy_chain(options):
+    df = pd.DataFrame({"text": TEXTS})
+
+    cleaned = clean_text(df, **options)
+
+    assert cleaned.astype(object).tolist() == legacy_clean_text(TEXTS)
+
+
+def test_clean_text_removes_accented_hashtags():
+    df = pd.DataFrame({"text": ["#niñoFeliz hoy", "#año2023x", "#Ñandú"]})
+
+    assert clean_text(df).tolist() == [" hoy", "", ""]
+
+
+def test_clean_text_keeps_index_and_missing_values():
+    df = pd.DataFrame({"text": ["#Ñandú hola", None, "#Ñandú hola"]}, index=[5, 7, 9])
+
+    cleaned = clean_text(df)
+
+    assert cleaned.index.tolist() == [5, 7, 9]
+    assert cleaned[5] == cleaned[9] == " hola"
+    assert pd.isna(cleaned[7])
+
+
+def test_clean_text_process_pool_matches_single_process():
+    df = pd.DataFrame({"text": TEXTS * 3})
+
+    parallel = clean_text(df, n_jobs=2, chunksize=4, deduplicate=False)
+
+    np.testing.assert_array_equal(
+        parallel.astype(object), clean_text(df, deduplicate=False).astype(object)
+    )
+
+
+def test_tokenizador_is_memoized():
+    tokenizador.cache_clear()
+    assert tokenizador.cache_info().maxsize == TOKENIZER_CACHE_SIZE
+
+    first = tokenizador("@usuario hola hola #café")
+    assert tokenizador("@usuario hola hola #café") == first
+    info = tokenizador.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+
+
+@pytest.mark.parametrize("deduplicate, hits", [(True, 0), (False, 7)])
+def test_clean_text_tokenizes_each_distinct_text_once(deduplicate, hits):
+    df = pd.DataFrame({"text": ["uno #feliz", "dos", "uno #feliz", "tres", "dos"] * 2})
+    tokenizador.cache_clear()
+
+    cleaned = clean_text(df, deduplicate=deduplicate)
+
+    assert cleaned.tolist() == ["uno ", "dos", "uno ", "tres", "dos"] * 2
+    info = tokenizador.cache_info()
+    assert (info.hits, info.misses) == (hits, 3)
+
+
+def test_as_category_shares_categories_between_equal_results():
+    df = pd.DataFrame(
+        {"text": ["#feliz hola", "#triste hola", "chao", None, "#feliz hola"]}
+    )
+
+    cleaned = clean_text(df, as_category=True)
+
+    assert isinstance(cleaned.dtype, pd.CategoricalDtype)
+    assert list(cleaned.cat.categories) == [" hola", "chao"]
+    assert cleaned.astype(object).tolist()[:3] == [" hola", " hola", "chao"]
+    assert pd.isna(cleaned[3])
+    assert cleaned[4] == " hola"
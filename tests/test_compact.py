@@ -0,0 +1,43 @@
+from compact import decode_compact, join_compact
+
+IDS = [10, 20, 30]
+
+
+def test_join_compact_uses_short_keys():
+    assert join_compact(["hola\tmundo", "adiós\n"]) == "1\thola mundo\n2\tadiós"
+
+
+def test_decode_sentiment_codes():
+    response = "1\tp\n2\tn\n3\tu"
+
+    assert decode_compact("sentiment", response, IDS) == {
+        "10": "positivo",
+        "20": "negativo",
+        "30": "neutro",
+    }
+
+
+def test_empty_results_count_as_missing():
+    assert decode_compact("sentiment", "1\tp\n2\t\n3", IDS) == {"10": "positivo"}
+    assert decode_compact("topics", "1\ta; b\n2\t ; ", IDS) == {"10": ["a", "b"]}
+
+
+def test_multitask_rows_with_missing_columns_count_as_missing():
+    tasks = ["sentiment", "topics"]
+    fields = ["sentimiento", "topicos"]
+    response = "1\tp\ta; b\n2\tn\n3\t\tc"
+
+    assert decode_compact("multitask", response, IDS, tasks, fields) == {
+        "10": {"sentimiento": "positivo", "topicos": ["a", "b"]}
+    }
+
+
+def test_numbers_outside_the_batch_are_ignored():
+    assert decode_compact("sentiment", "0\tp\n4\tn\n2\tu", IDS) == {"20": "neutro"}
+
+
+def test_pairs_with_a_non_integer_number_are_skipped():
+    assert decode_compact("sentiment", '[["x", "p"]]', [1]) == {}
+    assert decode_compact("sentiment", '[["x", "p"], [2, "n"]]', [1, 2]) == {
+        "2": "negativo"
+    }
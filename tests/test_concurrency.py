@@ -0,0 +1,183 @@
+import time
+import asyncio
+import threading
+
+import pandas as pd
+import pytest
+
+import concurrency
+from backends import CompletionBackend
+from codification import Codificacion
+from concurrency import RateLimiter, iter_as_completed
+from mock_server import MockBackend
+
+
+class SlowFirstBackend(MockBackend):
+
+    """
+    Mock cuya solicitud con la frase "lenta" tarda `slow` segundos y que
+    registra el máximo de solicitudes en vuelo y los loops usados.
+    """
+
+    def __init__(self, slow: float):
+        super().__init__()
+        self.slow = slow
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.loops = set()
+
+    async def acomplete(self, messages: list, model: str, temperature: float) -> dict:
+        self.loops.add(id(asyncio.get_running_loop()))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        if "lenta" in messages[-1]["content"]:
+            await asyncio.sleep(self.slow)
+        else:
+            await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return await super().acomplete(messages, model, temperature)
+
+
+def test_iter_as_completed_bounds_the_producer():
+    started = []
+
+    async def work(n):
+        await asyncio.sleep(0.5 if n == 0 else 0.01)
+        return n
+
+    def coroutines():
+        for n in range(10):
+            started.append(n)
+            yield work(n)
+
+    results = []
+    for n, value in iter_as_completed(coroutines(), 2):
+        assert len(started) - len(results) <= 2
+        results.append(value)
+    assert sorted(results) == list(range(10))
+    assert results[-1] == 0
+
+
+def test_iter_as_completed_stops_its_loop_when_abandoned():
+    threads = threading.active_count()
+
+    async def work(n):
+        await asyncio.sleep(0 if n == 0 else 10)
+        return n
+
+    start = time.perf_counter()
+    generator = iter_as_completed((work(n) for n in range(5)), 2)
+    assert next(generator) == (0, 0)
+    generator.close()
+    assert time.perf_counter() - start < 1
+    assert threading.active_count() == threads
+
+
+def test_a_slow_batch_does_not_hold_back_the_stream():
+    backend = SlowFirstBackend(slow=0.5)
+    codificacion = Codificacion("x", backend=backend, max_concurrency=4)
+    texts = ["frase lenta"] + [f"frase {n}" for n in range(39)]
+    df = pd.DataFrame({"ID": range(len(texts)), "text": texts})
+
+    start = time.perf_counter()
+    arrivals = []
+    for item in codificacion.codificate_stream("sentiment", df, 1, "text", "ID"):
+        arrivals.append((item["ids"], time.perf_counter() - start))
+
+    assert codificacion.report["coverage"] == 1.0
+    assert backend.max_in_flight <= 4
+    assert len(backend.loops) == 1
+    # Las demás frases llegan mientras la lenta sigue en vuelo
+    assert arrivals[-1][0] == [0]
+    assert sum(1 for _, seconds in arrivals if seconds < 0.4) == 39
+
+
+class FakeClockLimiter(RateLimiter):
+
+    """
+    `RateLimiter` con un reloj que solo avanza cuando se duerme.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.now = 0.0
+        super().__init__(*args, **kwargs)
+
+    def _clock(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def fake_sleep(monkeypatch):
+    limiters = []
+
+    def sleep(seconds):
+        for limiter in limiters:
+            limiter.now += seconds
+
+    monkeypatch.setattr(concurrency.time, "sleep", sleep)
+    return limiters
+
+
+def test_rate_limiter_spaces_requests_per_minute(fake_sleep):
+    limiter = FakeClockLimiter(requests_per_minute=60)
+    fake_sleep.append(limiter)
+    starts = []
+    for _ in range(65):
+        limiter.acquire()
+        starts.append(limiter.now)
+
+    # El presupuesto inicial cubre un minuto; después, una por segundo
+    assert starts[:60] == [0.0] * 60
+    assert starts[60:] == pytest.approx([1.0, 2.0, 3.0, 4.0, 5.0])
+
+
+def test_rate_limiter_waits_for_the_token_budget(fake_sleep):
+    limiter = FakeClockLimiter(tokens_per_minute=600)
+    fake_sleep.append(limiter)
+    limiter.acquire(500)
+    assert limiter.now == 0.0
+
+    limiter.acquire(200)
+    assert limiter.now == pytest.approx(10.0)
+
+    # Los tokens de la respuesta también se descuentan del presupuesto
+    limiter.record(300)
+    limiter.acquire(100)
+    assert limiter.now == pytest.approx(50.0)
+
+    # Una solicitud mayor que el presupuesto completo espera a tenerlo lleno
+    limiter.acquire(1000)
+    assert limiter.now == pytest.approx(110.0)
+
+
+class EchoBackend(CompletionBackend):
+
+    """
+    Responde con el prompt recibido; los prompts con número menor tardan más,
+    de modo que las respuestas llegan en orden inverso.
+    """
+
+    def __init__(self, prompts: int):
+        self.prompts = prompts
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def complete(self, messages: list, model: str, temperature: float) -> dict:
+        raise NotImplementedError
+
+    async def acomplete(self, messages: list, model: str, temperature: float) -> dict:
+        prompt = messages[-1]["content"]
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01 * (self.prompts - int(prompt)))
+        self.in_flight -= 1
+        return {"choices": [{"message": {"content": prompt}}], "usage": {}}
+
+
+def test_run_prompts_keeps_the_order_of_the_prompts():
+    prompts = [str(n) for n in range(12)]
+    backend = EchoBackend(len(prompts))
+    codificacion = Codificacion("x", backend=backend, max_concurrency=4)
+
+    assert codificacion.run_prompts(prompts) == prompts
+    assert 1 < backend.max_in_flight <= 4
@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "data"))
+
+import data_collection  # noqa: E402
+from data_collection import MyStream, ReplaySource, replay  # noqa: E402
+
+
+def payload(n):
+    return json.dumps({"data": {"text": f"tweet {n}", "lang": "es"}})
+
+
+def test_timed_flushes_do_not_use_the_part_budget(tmp_path):
+    # Con flush_interval=0 cada tweet dispara una escritura parcial
+    stream = MyStream(
+        "test",
+        parts=3,
+        number_of_tweets=4,
+        folder_name="stream",
+        flush_interval=0.0,
+        root_path=str(tmp_path),
+    )
+    for n in range(6):
+        stream.on_data(payload(n))
+    stream.close()
+
+    metrics = stream.metrics()
+    assert metrics["parts_written"] == 2
+    assert metrics["partial_writes"] > 0
+    assert metrics["written"] == 6
+
+    folder = tmp_path / "stream"
+    assert sorted(os.listdir(folder)) == ["data_1.csv", "data_2.csv"]
+    assert len(pd.read_csv(folder / "data_1.csv")) == 4
+    assert len(pd.read_csv(folder / "data_2.csv")) == 2
+
+
+def record(path, payloads):
+    path.write_text("\n".join(payloads) + "\n\n", encoding="utf-8")
+    return str(path)
+
+
+def test_replay_writes_the_recorded_tweets_in_parts(tmp_path):
+    payloads = [payload(n) for n in range(7)]
+    payloads.insert(2, json.dumps({"data": {"text": "tweet en", "lang": "en"}}))
+    payloads.insert(5, "no es json")
+    path = record(tmp_path / "grabacion.ndjson", payloads)
+    stream = MyStream(
+        "test",
+        parts=4,
+        number_of_tweets=3,
+        folder_name="replay",
+        root_path=str(tmp_path),
+    )
+
+    metrics = replay(stream, path)
+
+    assert metrics["received"] == 9
+    assert metrics["processed"] == 8
+    assert metrics["written"] == 7
+    assert metrics["dropped"] == 0
+    folder = tmp_path / "replay"
+    assert sorted(os.listdir(folder)) == ["data_1.csv", "data_2.csv", "data_3.csv"]
+    parts = [pd.read_csv(folder / f"data_{n}.csv") for n in range(1, 4)]
+    assert pd.concat(parts)["text"].tolist() == [f"tweet {n}" for n in range(7)]
+    assert len(pd.read_csv(folder / "data_3.csv")) == 1
+
+
+class FakeTime:
+
+    """
+    Reloj falso para `data_collection.time`: avanza solo cuando se le pide.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Recorder:
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.arrivals = []
+
+    def on_data(self, raw_data):
+        self.arrivals.append(self.clock.now)
+        # Procesar un payload toma 0.05 s del reloj falso
+        self.clock.now += 0.05
+
+
+def test_replay_source_paces_payloads_at_the_rate(tmp_path, monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(data_collection, "time", clock)
+    path = record(tmp_path / "grabacion.ndjson", [payload(n) for n in range(5)])
+
+    recorder = Recorder(clock)
+    assert ReplaySource(path, rate=4).feed(recorder) == 5
+    assert recorder.arrivals == pytest.approx([0.0, 0.25, 0.5, 0.75, 1.0])
+    # La espera descuenta el tiempo que tomó entregar cada payload
+    assert clock.sleeps == pytest.approx([0.2] * 5)
+
+    clock.sleeps.clear()
+    recorder = Recorder(clock)
+    assert ReplaySource(path).feed(recorder) == 5
+    assert clock.sleeps == []
+
+
+def test_replay_source_does_not_sleep_when_behind(tmp_path, monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(data_collection, "time", clock)
+    path = record(tmp_path / "grabacion.ndjson", [payload(n) for n in range(3)])
+
+    recorder = Recorder(clock)
+    assert ReplaySource(path, rate=100).feed(recorder) == 3
+    assert clock.sleeps == []
+
+
+def test_full_queue_drops_and_counts_payloads(tmp_path, monkeypatch):
+    stream = MyStream(
+        "test",
+        parts=2,
+        number_of_tweets=10,
+        folder_name="lleno",
+        queue_size=2,
+        root_path=str(tmp_path),
+    )
+    # Sin hilo escritor la cola se llena
+    monkeypatch.setattr(stream, "start_writer", lambda: None)
+    for n in range(5):
+        stream.on_data(payload(n))
+
+    metrics = stream.metrics()
+    assert metrics["received"] == 5
+    assert metrics["dropped"] == 3
+    assert metrics["queue_depth"] == metrics["max_queue_depth"] == 2
+
+    monkeypatch.undo()
+    stream.start_writer()
+    stream.close()
+    metrics = stream.metrics()
+    assert metrics["processed"] == 2
+    assert metrics["written"] == 2
+    assert metrics["queue_depth"] == 0
+    assert metrics["max_flush_seconds"] >= metrics["last_flush_seconds"] > 0
+    texts = pd.read_csv(tmp_path / "lleno" / "data_1.csv")["text"].tolist()
+    assert texts == ["tweet 0", "tweet 1"]
@@ -0,0 +1,102 @@
+import pandas as pd
+import pytest
+
+from codification import Codificacion
+from dedup import Deduplicator, fan_out, group_members
+from mock_server import MockBackend
+
+BASE = (
+    "el servicio de la empresa de energia fue muy bueno durante todo el mes de "
+    "enero en la ciudad"
+)
+NEAR = BASE + " hoy"
+OTHER = (
+    "el servicio de la empresa de energia fue muy malo durante todo el mes de "
+    "febrero en la zona sur"
+)
+
+
+@pytest.mark.parametrize(
+    "task, params, expected",
+    [
+        ("sentiment", {}, 0.8),
+        ("topics", {"num_topicos": 3}, 0.8),
+        ("translation", {"lang": "inglés"}, None),
+        ("spelling_correction", {}, None),
+        ("multitask", {"tasks": ["sentiment", "topics"]}, 0.8),
+        ("multitask", {"tasks": ["sentiment", "translation"]}, None),
+    ],
+)
+def test_only_label_tasks_group_near_duplicates(task, params, expected):
+    codificacion = Codificacion("x", backend=MockBackend(), deduplicate=True)
+    assert codificacion.task_dedup_threshold(task, **params) == expected
+
+
+def test_translation_codes_each_near_duplicate():
+    df = pd.DataFrame({"ID": [1, 2, 3], "text": [BASE, NEAR, BASE]})
+
+    sentiment = Codificacion("x", backend=MockBackend(), deduplicate=True)
+    sentiment.get_sentiment(df, 10, "text", "ID")
+    assert sentiment.report["unique"] == 1
+
+    translation = Codificacion("x", backend=MockBackend(), deduplicate=True)
+    translation.get_translation(df, 10, "text", "ID")
+    assert translation.report["unique"] == 2
+    assert translation.report["coverage"] == 1.0
+
+
+def similarity(deduplicator, a, b):
+    signatures = deduplicator.signatures_of([a, b])
+    return float((signatures[0] == signatures[1]).mean())
+
+
+def test_exact_copies_collapse_after_normalization():
+    deduplicator = Deduplicator(threshold=None)
+    representatives = deduplicator.assign(
+        [1, 2, 3, 4], ["hola  mundo", " hola mundo ", "chao", "hola mundo"]
+    )
+    assert representatives == [1, 1, 3, 1]
+    assert deduplicator.report()["exact_duplicates"] == 2
+    assert deduplicator.report()["unique"] == 2
+    assert deduplicator.signatures == {}
+
+
+def test_near_duplicates_collapse_at_the_threshold_and_not_below():
+    score = similarity(Deduplicator(), BASE, NEAR)
+    assert 0.8 <= score < 1
+
+    at_threshold = Deduplicator(threshold=score)
+    assert at_threshold.assign([1, 2], [BASE, NEAR]) == [1, 1]
+    assert at_threshold.report()["near_duplicates"] == 1
+
+    above_score = Deduplicator(threshold=score + 1 / 64)
+    assert above_score.assign([1, 2], [BASE, NEAR]) == [1, 2]
+
+    assert Deduplicator(threshold=None).assign([1, 2], [BASE, NEAR]) == [1, 2]
+    assert similarity(Deduplicator(), BASE, OTHER) < 0.8
+    assert Deduplicator().assign([1, 3], [BASE, OTHER]) == [1, 3]
+
+
+def test_state_is_kept_across_chunks():
+    deduplicator = Deduplicator()
+    assert deduplicator.assign([1, 2], [BASE, OTHER]) == [1, 2]
+    assert deduplicator.assign([3, 4, 5], [NEAR, BASE, "otra"]) == [1, 1, 5]
+    assert deduplicator.report()["phrases"] == 5
+    assert deduplicator.report()["unique"] == 3
+
+
+def test_group_members_and_fan_out_keep_the_original_order():
+    ids = [10, 11, 12, 13, 14]
+    representatives = [10, 10, 12, 10, 12]
+    assert group_members(ids, representatives) == {"10": ["11", "13"], "12": ["14"]}
+
+    labels = pd.Series({"12": "negativo", "10": "positivo"})
+    fanned = fan_out(labels, ids, representatives)
+    assert list(fanned.index) == ["10", "11", "12", "13", "14"]
+    assert list(fanned) == ["positivo", "positivo", "negativo", "positivo", "negativo"]
+
+
+def test_fan_out_leaves_groups_without_label_missing():
+    fanned = fan_out(pd.Series({"1": "neutro"}), [1, 2, 3], [1, 1, 3])
+    assert fanned["2"] == "neutro"
+    assert pd.isna(fanned["3"])
@@ -0,0 +1,141 @@
+import os
+import time
+
+import openai
+import pandas as pd
+
+from codification import Codificacion
+from incremental import Manifest, code_incremental
+from mock_server import MockBackend
+
+
+class AppendingBackend(MockBackend):
+
+    """
+    Mock que agrega filas a una parte durante la primera solicitud, como el
+    stream que sigue escribiendo mientras se codifica.
+    """
+
+    def __init__(self, part, rows: pd.DataFrame):
+        super().__init__()
+        self.part = part
+        self.rows = rows
+
+    def complete(self, messages: list, model: str, temperature: float) -> dict:
+        if self.rows is not None:
+            self.rows.to_csv(self.part, mode="a", header=False, index=False)
+            self.rows = None
+        return super().complete(messages, model, temperature)
+
+
+def test_part_changed_while_coding_is_read_again(tmp_path):
+    folder = tmp_path / "data" / "cliente"
+    folder.mkdir(parents=True)
+    part = folder / "data_1.csv"
+    pd.DataFrame({"ID": [1, 2], "text": ["hola", "chao"]}).to_csv(part, index=False)
+    late = pd.DataFrame({"ID": [3], "text": ["tarde"]})
+
+    def run(backend):
+        return code_incremental(
+            Codificacion("x", backend=backend),
+            "sentiment",
+            "cliente",
+            "text",
+            "ID",
+            output_dir=str(tmp_path / "out"),
+            root_path=str(tmp_path / "data"),
+        )
+
+    assert list(run(AppendingBackend(part, late)).index) == ["1", "2"]
+    assert list(run(MockBackend()).index) == ["1", "2", "3"]
+
+
+def write_part(folder, n, ids):
+    part = folder / f"data_{n}.csv"
+    texts = [f"frase {id_i}" for id_i in ids]
+    pd.DataFrame({"ID": ids, "text": texts}).to_csv(part, index=False)
+    return part
+
+
+def incremental(tmp_path, backend, **kwargs):
+    return code_incremental(
+        Codificacion("x", backend=backend, max_requeue=0),
+        "sentiment",
+        "cliente",
+        "text",
+        "ID",
+        output_dir=str(tmp_path / "out"),
+        root_path=str(tmp_path / "data"),
+        **kwargs,
+    )
+
+
+def test_only_new_parts_are_coded(tmp_path):
+    folder = tmp_path / "data" / "cliente"
+    folder.mkdir(parents=True)
+    write_part(folder, 1, [1, 2])
+
+    first = MockBackend()
+    assert list(incremental(tmp_path, first).index) == ["1", "2"]
+    assert first.requests == 1
+
+    unchanged = MockBackend()
+    assert list(incremental(tmp_path, unchanged).index) == ["1", "2"]
+    assert unchanged.requests == 0
+
+    write_part(folder, 2, [3, 4])
+    new_part = MockBackend()
+    results = incremental(tmp_path, new_part)
+    assert list(results.index) == ["1", "2", "3", "4"]
+    assert new_part.requests == 1
+
+
+def test_touched_part_with_the_same_content_is_skipped(tmp_path):
+    folder = tmp_path / "data" / "cliente"
+    folder.mkdir(parents=True)
+    part = write_part(folder, 1, [1, 2])
+    incremental(tmp_path, MockBackend())
+
+    stat = os.stat(part)
+    os.utime(part, (stat.st_atime, stat.st_mtime + 10))
+    backend = MockBackend()
+    incremental(tmp_path, backend)
+    assert backend.requests == 0
+
+    manifest = Manifest(str(tmp_path / "out" / "manifest.json"))
+    assert manifest.parts["data_1.csv"]["mtime"] == os.stat(part).st_mtime
+    assert manifest.parts["data_1.csv"]["rows"] == 2
+
+
+class FailingBackend(MockBackend):
+
+    """
+    Mock que rechaza todas las solicitudes.
+    """
+
+    def complete(self, messages: list, model: str, temperature: float) -> dict:
+        raise openai.error.InvalidRequestError("prompt inválido", None)
+
+
+def test_parts_with_failed_phrases_are_retried(tmp_path):
+    folder = tmp_path / "data" / "cliente"
+    folder.mkdir(parents=True)
+    write_part(folder, 1, [1, 2])
+
+    assert incremental(tmp_path, FailingBackend()).empty
+    assert "data_1.csv" not in Manifest(str(tmp_path / "out" / "manifest.json")).parts
+
+    backend = MockBackend()
+    assert list(incremental(tmp_path, backend).index) == ["1", "2"]
+    assert backend.requests == 1
+
+
+def test_since_skips_older_parts(tmp_path):
+    folder = tmp_path / "data" / "cliente"
+    folder.mkdir(parents=True)
+    old = write_part(folder, 1, [1, 2])
+    os.utime(old, (0, 0))
+    write_part(folder, 2, [3])
+
+    results = incremental(tmp_path, MockBackend(), since=time.time() - 3600)
+    assert list(results.index) == ["3"]
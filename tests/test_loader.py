@@ -0,0 +1,100 @@
+import os
+
+import pandas as pd
+import pytest
+
+from data.utils import (
+    convert_to_parquet,
+    iter_social_listening_data,
+    list_social_listening_files,
+    read_social_listening_data,
+)
+
+
+@pytest.fixture
+def client(tmp_path):
+    folder = tmp_path / "cliente"
+    folder.mkdir()
+    parts = []
+    for n in range(3):
+        part = pd.DataFrame(
+            {
+                "id": range(10 * n, 10 * n + 7),
+                "text": [
+                    f"tweet número {i} del día" for i in range(10 * n, 10 * n + 7)
+                ],
+                "lang": "es",
+            }
+        )
+        part.to_csv(folder / f"tweets_part_{n}.csv", index=False, encoding="ISO-8859-1")
+        parts.append(part)
+    return str(tmp_path), pd.concat(parts, ignore_index=True)
+
+
+def test_csv_round_trip(client):
+    root_path, expected = client
+    df = read_social_listening_data("cliente", root_path=root_path, n_jobs=2)
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+    df = read_social_listening_data(
+        "cliente", usecols=["id", "text"], dtype={"id": "int64"}, root_path=root_path
+    )
+    assert list(df.columns) == ["id", "text"]
+    assert df["id"].tolist() == expected["id"].tolist()
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+def test_chunks_cover_every_row_once(client, file_format):
+    root_path, expected = client
+    convert_to_parquet("cliente", root_path=root_path)
+
+    chunks = list(
+        iter_social_listening_data(
+            "cliente", chunksize=3, root_path=root_path, file_format=file_format
+        )
+    )
+    assert all(len(chunk) <= 3 for chunk in chunks)
+    # Cada archivo de 7 filas da bloques de 3, 3 y 1
+    assert len(chunks) == 9
+    df = pd.concat(chunks, ignore_index=True)
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+    chunks = list(
+        iter_social_listening_data(
+            "cliente",
+            chunksize=100,
+            usecols=["text"],
+            root_path=root_path,
+            file_format=file_format,
+        )
+    )
+    assert [list(chunk.columns) for chunk in chunks] == [["text"]] * 3
+
+
+def test_parquet_is_read_once_after_conversion(client):
+    root_path, expected = client
+    written = convert_to_parquet("cliente", root_path=root_path)
+    assert len(written) == 3
+
+    files = list_social_listening_files("cliente", root_path, "parquet")
+    assert files == sorted(written)
+    df = read_social_listening_data(
+        "cliente", root_path=root_path, file_format="parquet"
+    )
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+
+def test_conversion_only_rewrites_changed_files(client):
+    root_path, _ = client
+    convert_to_parquet("cliente", root_path=root_path)
+    assert convert_to_parquet("cliente", root_path=root_path) == []
+
+    csv_path = os.path.join(root_path, "cliente", "tweets_part_1.csv")
+    pd.DataFrame({"id": [1], "text": ["nuevo"], "lang": ["es"]}).to_csv(
+        csv_path, index=False
+    )
+    target = os.path.join(root_path, "cliente", "tweets_part_1.parquet")
+    os.utime(csv_path, (os.path.getmtime(target) + 1,) * 2)
+
+    assert convert_to_parquet("cliente", root_path=root_path) == [target]
+    assert pd.read_parquet(target)["text"].tolist() == ["nuevo"]
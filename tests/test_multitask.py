@@ -0,0 +1,97 @@
+import json
+
+import pandas as pd
+import pytest
+
+from backends import CompletionBackend
+from codification import Codificacion, valid_multitask_result
+from mock_server import MockBackend
+
+TASKS = ["sentiment", "topics"]
+
+
+class FixedBackend(CompletionBackend):
+
+    """
+    Responde siempre el mismo contenido.
+    """
+
+    def __init__(self, content: str):
+        self.content = content
+        self.requests = 0
+
+    def complete(self, messages: list, model: str, temperature: float) -> dict:
+        self.requests += 1
+        return {
+            "choices": [{"message": {"content": self.content}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1},
+        }
+
+
+def test_valid_multitask_result():
+    assert valid_multitask_result({"sentimiento": "positivo", "topicos": ["a"]}, TASKS)
+    assert not valid_multitask_result("positivo", TASKS)
+    assert not valid_multitask_result(["positivo", ["a"]], TASKS)
+    assert not valid_multitask_result({"sentimiento": "positivo"}, TASKS)
+    assert not valid_multitask_result({"sentimiento": "", "topicos": ["a"]}, TASKS)
+    assert not valid_multitask_result({"sentimiento": "neutro", "topicos": "a"}, TASKS)
+
+
+def test_invalid_multitask_entries_count_as_missing():
+    content = json.dumps(
+        {
+            "Frase1": {"sentimiento": "positivo", "topicos": ["a"]},
+            "Frase2": "positivo",
+            "Frase3": {"sentimiento": "negativo"},
+        }
+    )
+    backend = FixedBackend(content)
+    codificacion = Codificacion("x", backend=backend, max_requeue=1)
+    df = pd.DataFrame({"ID": [1, 2, 3], "text": ["uno", "dos", "tres"]})
+
+    codificacion.get_multitask(df, 10, "text", "ID", TASKS)
+
+    assert codificacion.report["coded"] == 1
+    assert codificacion.report["failed_ids"] == ["2", "3"]
+    assert codificacion.report["requeued"] == 2
+    assert backend.requests == 2
+
+
+def test_one_request_per_batch_for_all_tasks():
+    tasks = ["sentiment", "topics", "translation", "spelling_correction"]
+    df = pd.DataFrame({"ID": range(6), "text": [f"frase número {n}" for n in range(6)]})
+    backend = MockBackend()
+    codificacion = Codificacion("x", backend=backend)
+
+    responses = codificacion.get_multitask(df, 3, "text", "ID", tasks)
+
+    assert backend.requests == 2
+    results = codificacion.from_multitask_json_list_to_df(responses)
+    assert list(results.columns) == tasks
+    assert list(results.index) == [str(n) for n in range(6)]
+    assert results.loc["0", "translation"] == "[en] frase número 0"
+    assert results.loc["0", "spelling_correction"] == "frase número 0"
+    assert results.loc["0", "topics"] == ["frase número", "0"]
+    assert results["sentiment"].isin(["positivo", "negativo", "neutro"]).all()
+
+    sentiment_only = codificacion.from_multitask_json_list_to_df(
+        responses, ["sentiment"]
+    )
+    assert list(sentiment_only.columns) == ["sentiment"]
+
+
+def test_prompt_asks_only_for_the_requested_tasks():
+    codificacion = Codificacion("x", backend=MockBackend())
+    prompt = codificacion.build_prompt(
+        "multitask", "Frase1: hola", tasks=TASKS, num_topicos=2
+    )
+    assert "sentimiento" in prompt
+    assert "máximo 2 tópicos" in prompt
+    assert "traduccion" not in prompt
+
+
+def test_unknown_tasks_raise():
+    codificacion = Codificacion("x", backend=MockBackend())
+    df = pd.DataFrame({"ID": [1], "text": ["hola"]})
+    with pytest.raises(ValueError):
+        codificacion.get_multitask(df, 10, "text", "ID", ["sentiment", "resumen"])
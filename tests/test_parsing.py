@@ -0,0 +1,52 @@
+from parsing import extract_entries, parse_responses
+
+
+def test_complete_json_response():
+    response = '```json\n{"Frase1": "positivo", "Frase2": ["a b", "c"]}\n```'
+
+    assert extract_entries(response) == {"1": "positivo", "2": ["a b", "c"]}
+
+
+def test_bare_values_in_plain_text():
+    response = "Frase1: positivo\nFrase2: negativo"
+
+    assert extract_entries(response) == {"1": "positivo", "2": "negativo"}
+
+
+def test_truncated_list_value_is_dropped():
+    response = '{"Frase1": ["a b", "c"], "Frase2": ["x"'
+
+    assert extract_entries(response) == {"1": ["a b", "c"]}
+
+
+def test_truncated_dict_value_is_dropped():
+    response = (
+        '{"Frase1": {"sentimiento": "positivo", "topicos": ["a"]}, '
+        '"Frase2": {"sentimiento": "neg'
+    )
+
+    assert extract_entries(response) == {
+        "1": {"sentimiento": "positivo", "topicos": ["a"]}
+    }
+
+
+def test_truncated_string_value_is_dropped():
+    response = '{"Frase1": "positivo", "Frase2": "negat'
+
+    assert extract_entries(response) == {"1": "positivo"}
+
+
+def test_string_with_line_break_is_recovered():
+    response = '{"Frase1": "hola\nmundo", "Frase2": ["x"'
+
+    assert extract_entries(response) == {"1": "hola\nmundo"}
+
+
+def test_truncated_entries_are_reported_as_lost():
+    responses = ['{"Frase1": ["a"], "Frase2": ["x"', None]
+
+    ids, values, lost_ids = parse_responses(responses, [[1, 2], [3]])
+
+    assert ids == ["1"]
+    assert values == [["a"]]
+    assert lost_ids == ["2", "3"]
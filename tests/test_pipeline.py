@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+from cache import CompletionCache
+from codification import Codificacion
+from incremental import load_results
+from mock_server import MockBackend
+from pipeline import Pipeline, task_params
+
+TEXTS = ["hola mundo", "qué buen día", "pésimo servicio", "café verde"]
+
+
+@pytest.fixture
+def root_path(tmp_path):
+    folder = tmp_path / "data" / "cliente"
+    folder.mkdir(parents=True)
+    texts = TEXTS * 5
+    pd.DataFrame({"ID": range(len(texts)), "text": texts}).to_csv(
+        folder / "data_1.csv", index=False
+    )
+    return str(tmp_path / "data")
+
+
+def run(codificacion, root_path, output_dir, tasks):
+    config = {
+        "folder_name": "cliente",
+        "root_path": root_path,
+        "output_dir": str(output_dir),
+        "batch_size": 2,
+        "chunksize": 3,
+        "tasks": tasks,
+    }
+    return Pipeline(codificacion, config).run()
+
+
+def test_multitask_params_use_the_get_multitask_defaults():
+    params = task_params(
+        {"name": "m", "task": "multitask", "tasks": ["topics", "translation"]}
+    )
+    assert params == {
+        "tasks": ["topics", "translation"],
+        "num_topicos": 3,
+        "lang": "inglés",
+    }
+    assert task_params({"task": "topics", "num_topicos": 5}) == {"num_topicos": 5}
+    with pytest.raises(ValueError):
+        task_params({"task": "multitask", "tasks": ["unknown"]})
+
+
+def test_multitask_without_num_topicos(root_path, tmp_path):
+    codificacion = Codificacion("x", backend=MockBackend())
+    spec = {"name": "m", "task": "multitask", "tasks": ["sentiment", "topics"]}
+    report = run(codificacion, root_path, tmp_path / "out", [spec])
+    assert report["m"]["coded"] == 20
+
+
+def test_deduplicate_sends_each_text_once(root_path, tmp_path):
+    codificacion = Codificacion("x", backend=MockBackend(), deduplicate=True)
+    report = run(codificacion, root_path, tmp_path / "out", [{"task": "sentiment"}])
+
+    assert report["sentiment"]["coded"] == 20
+    assert codificacion.telemetry.summary()["phrases_sent"] == len(TEXTS)
+    results = load_results(report["sentiment"]["checkpoint"])
+    assert results["0"] == results["4"] == results["16"]
+
+
+def test_cache_is_read_and_filled(root_path, tmp_path):
+    cache = CompletionCache(str(tmp_path / "cache.db"))
+    backend = MockBackend()
+    codificacion = Codificacion("x", backend=backend, cache=cache)
+
+    report = run(codificacion, root_path, tmp_path / "first", [{"task": "sentiment"}])
+    assert report["sentiment"]["coded"] == 20
+    assert codificacion.telemetry.summary()["phrases_sent"] == len(TEXTS)
+    requests = backend.requests
+
+    report = run(codificacion, root_path, tmp_path / "second", [{"task": "sentiment"}])
+    assert report["sentiment"]["coded"] == 20
+    assert backend.requests == requests
@@ -0,0 +1,97 @@
+import asyncio
+
+import openai
+import pytest
+
+import codification
+from backends import CompletionBackend
+from codification import Codificacion
+from concurrency import backoff_delay
+
+
+class FlakyBackend(CompletionBackend):
+
+    """
+    Falla las primeras `failures` solicitudes y después responde.
+    """
+
+    def __init__(self, failures: int, error=openai.error.RateLimitError):
+        self.failures = failures
+        self.error = error
+        self.requests = 0
+
+    def complete(self, messages: list, model: str, temperature: float) -> dict:
+        self.requests += 1
+        if self.requests <= self.failures:
+            raise self.error("ocupado")
+        return {
+            "choices": [{"message": {"content": "listo"}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1},
+        }
+
+    async def acomplete(self, messages: list, model: str, temperature: float) -> dict:
+        return self.complete(messages, model, temperature)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+
+    async def asleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(codification.time, "sleep", delays.append)
+    monkeypatch.setattr(codification.asyncio, "sleep", asleep)
+    return delays
+
+
+@pytest.mark.parametrize("attempt", range(10))
+def test_backoff_delay_is_jittered_under_the_cap(attempt):
+    delays = [backoff_delay(attempt, base=1.0, cap=8.0) for _ in range(50)]
+    expected = min(8.0, 2**attempt)
+    assert all(expected / 2 <= delay <= expected for delay in delays)
+    assert all(delay <= 8.0 for delay in delays)
+
+
+@pytest.mark.parametrize("error", [openai.error.RateLimitError, openai.error.APIError])
+def test_get_completion_retries_until_it_succeeds(sleeps, error):
+    backend = FlakyBackend(3, error)
+    codificacion = Codificacion("x", backend=backend, max_retries=5)
+
+    assert codificacion.get_completion("hola") == "listo"
+    assert backend.requests == 4
+    assert codificacion.retries == 3
+    assert len(sleeps) == 3
+    assert all(delay <= 60.0 for delay in sleeps)
+
+
+def test_get_completion_gives_up_after_max_retries(sleeps):
+    backend = FlakyBackend(10)
+    codificacion = Codificacion("x", backend=backend, max_retries=2)
+
+    with pytest.raises(openai.error.RateLimitError):
+        codificacion.get_completion("hola")
+    assert backend.requests == 3
+    assert codificacion.retries == 2
+    assert len(sleeps) == 2
+
+
+def test_aget_completion_retries_until_it_succeeds(sleeps):
+    backend = FlakyBackend(2, openai.error.APIError)
+    codificacion = Codificacion("x", backend=backend, max_retries=5)
+
+    assert asyncio.run(codificacion.aget_completion("hola")) == "listo"
+    assert backend.requests == 3
+    assert codificacion.retries == 2
+    assert len(sleeps) == 2
+
+
+def test_aget_completion_gives_up_after_max_retries(sleeps):
+    backend = FlakyBackend(10)
+    codificacion = Codificacion("x", backend=backend, max_retries=1)
+
+    with pytest.raises(openai.error.RateLimitError):
+        asyncio.run(codificacion.aget_completion("hola"))
+    assert backend.requests == 2
+    assert codificacion.retries == 1
+    assert len(sleeps) == 1
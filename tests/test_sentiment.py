@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from codification import Codificacion
+from mock_server import MockBackend
+from sentiment import SentimentClassifier, fold_tokens, polarities
+
+NEGATIVE = [
+    "no me gusta nada, no es bueno",
+    "gracias por nada, pésimo servicio",
+    "no es bueno",
+    "nunca recomiendo esta marca",
+    "no estoy feliz con el servicio",
+    "pésimo servicio, horrible",
+]
+
+
+def test_negation_inverts_polarity():
+    assert polarities(fold_tokens("no es bueno")) == ([-1], True)
+    assert polarities(fold_tokens("gracias por nada")) == ([-1], True)
+    assert polarities(fold_tokens("sin problemas")) == ([1], True)
+    assert polarities(fold_tokens("es muy bueno")) == ([1], False)
+
+
+@pytest.mark.parametrize("text", NEGATIVE)
+def test_untrained_classifier_labels_negative_and_negated_texts(text):
+    labels, _ = SentimentClassifier().predict([text])
+
+    assert labels[0] == "negativo"
+
+
+def test_untrained_classifier_is_not_confident_on_negations_or_mixed_texts():
+    texts = NEGATIVE[:5] + ["gracias, pero pésimo servicio"]
+
+    _, confidence = SentimentClassifier().predict(texts)
+
+    assert (confidence < 0.8).all()
+
+
+def test_untrained_classifier_accepts_clear_texts():
+    labels, confidence = SentimentClassifier().predict(
+        ["me encanta, excelente servicio", "pésimo servicio, horrible"]
+    )
+
+    assert labels.tolist() == ["positivo", "negativo"]
+    assert (confidence >= 0.8).all()
+
+
+def test_tiered_sentiment_escalates_negated_texts():
+    texts = ["me encanta, excelente servicio"] + NEGATIVE[:5]
+    df = pd.DataFrame({"ID": range(len(texts)), "text": texts})
+    codificacion = Codificacion("mock", backend=MockBackend())
+
+    codificacion.get_tiered_sentiment(df, 10, "text", "ID", audit_fraction=0)
+
+    assert codificacion.report["escalation_rate"] == pytest.approx(5 / 6)
@@ -0,0 +1,87 @@
+import os
+
+import pandas as pd
+import pytest
+
+import sharding
+from mock_server import MockBackend
+from sharding import FILES_PER_SHARD, read_shard, run_shard, shard_mode
+
+N_SHARDS = 2
+
+
+def make_folder(root, n_files, rows_per_file=5):
+    folder = root / "cliente"
+    folder.mkdir(parents=True)
+    for n in range(n_files):
+        ids = range(n * rows_per_file, (n + 1) * rows_per_file)
+        pd.DataFrame({"ID": ids, "text": [f"frase {i}" for i in ids]}).to_csv(
+            folder / f"data_{n}.csv", index=False
+        )
+    return str(root)
+
+
+def config(root_path, output_dir, mode):
+    return {
+        "task": "sentiment",
+        "params": {},
+        "folder_name": "cliente",
+        "column_name": "text",
+        "id_column": "ID",
+        "output_dir": str(output_dir),
+        "openai_api_key": "x",
+        "n_shards": N_SHARDS,
+        "batch_size": 4,
+        "requests_per_minute": None,
+        "tokens_per_minute": None,
+        "root_path": root_path,
+        "file_format": "csv",
+        "clean": False,
+        "cache_path": None,
+        "chunksize": 3,
+        "mode": mode,
+        "codificacion": {"backend": MockBackend()},
+    }
+
+
+@pytest.mark.parametrize("mode", ["files", "rows"])
+def test_shards_split_the_folder(tmp_path, mode):
+    root_path = make_folder(tmp_path / "data", FILES_PER_SHARD * N_SHARDS)
+    shards = [
+        read_shard(config(root_path, tmp_path, mode), shard)
+        for shard in range(N_SHARDS)
+    ]
+    ids = [set(df["ID"]) for df in shards]
+    assert not ids[0] & ids[1]
+    assert ids[0] | ids[1] == set(range(5 * FILES_PER_SHARD * N_SHARDS))
+
+
+def test_file_shards_read_only_their_files(tmp_path, monkeypatch):
+    root_path = make_folder(tmp_path / "data", FILES_PER_SHARD * N_SHARDS)
+    read = []
+    original = sharding.read_social_listening_file
+
+    def read_file(file, *args, **kwargs):
+        read.append(os.path.basename(file))
+        return original(file, *args, **kwargs)
+
+    monkeypatch.setattr(sharding, "read_social_listening_file", read_file)
+    read_shard(config(root_path, tmp_path, "files"), 0)
+    assert read
+    assert all(sharding.shard_of(name, N_SHARDS) == 0 for name in read)
+
+
+def test_shard_mode_is_kept_on_resume(tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+    assert shard_mode(str(first), N_SHARDS, 1) == "rows"
+    assert shard_mode(str(first), N_SHARDS, 100) == "rows"
+    assert shard_mode(str(second), N_SHARDS, 100) == "files"
+
+
+def test_shard_without_limits_skips_the_shared_limiter(tmp_path):
+    root_path = make_folder(tmp_path / "data", 2)
+    report = run_shard(config(root_path, tmp_path, "rows"), 0)
+    assert report["coverage"] == 1.0
+    assert not os.path.exists(tmp_path / "rate_limit.db")
@@ -0,0 +1,173 @@
+import os
+import pickle
+
+import pandas as pd
+import pytest
+
+from codification import Codificacion
+from data.utils import (
+    iter_table,
+    load_object,
+    read_frame,
+    read_table,
+    save_object,
+    save_pickle_object,
+    save_table,
+    write_frame,
+)
+from mock_server import MockBackend
+from store import migrate_paths
+
+MIXED = pd.Series({"1": "positivo", "2": ["a", "b"], "3": None}, name="resultado")
+RESULTS = pd.DataFrame(
+    {
+        "topicos": [["a b", "c"], [], None],
+        "metadata": [{"likes": 3}, {}, None],
+        "multitarea": [
+            {"sentimiento": "positivo", "topicos": ["a"]},
+            {"sentimiento": "neutro", "topicos": []},
+            {"sentimiento": "negativo", "topicos": ["b", "c"]},
+        ],
+        "n": [1, 2, 3],
+    },
+    index=pd.Index(["10", "20", "30"], name="ID"),
+)
+
+
+@pytest.mark.parametrize("extension", [".parquet", ".arrow"])
+def test_mixed_series_round_trip(tmp_path, extension):
+    path = str(tmp_path / f"mixed{extension}")
+
+    save_table(MIXED, path)
+    loaded = read_table(path)
+
+    assert loaded.name == "resultado"
+    assert loaded.to_dict() == MIXED.to_dict()
+
+
+@pytest.mark.parametrize("extension", [".parquet", ".arrow"])
+def test_list_and_dict_columns_round_trip(tmp_path, extension):
+    path = str(tmp_path / f"results{extension}")
+
+    save_table(RESULTS, path)
+    loaded = read_table(path)
+
+    assert loaded.index.name == "ID"
+    assert loaded.to_dict() == RESULTS.to_dict()
+    assert isinstance(loaded.loc["10", "topicos"], list)
+    assert loaded.loc["20", "metadata"] == {}
+
+
+def test_iter_table_restores_columns(tmp_path):
+    path = str(tmp_path / "results.parquet")
+    save_table(RESULTS, path)
+
+    chunks = list(iter_table(path, batch_size=2))
+
+    assert pd.concat(chunks).to_dict() == RESULTS.to_dict()
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "feather"])
+def test_write_frame_round_trip(tmp_path, file_format):
+    path = str(tmp_path / f"results.{file_format}")
+    df = RESULTS.reset_index().assign(mixto=MIXED.tolist())
+
+    write_frame(df, path, file_format)
+    loaded = read_frame(path)
+
+    assert loaded.to_dict() == df.to_dict()
+    assert isinstance(loaded.loc[0, "topicos"], list)
+    assert loaded.loc[1, "metadata"] == {}
+
+
+def test_partitioned_dataset_is_filtered_while_reading(tmp_path):
+    path = str(tmp_path / "dataset")
+    df = pd.DataFrame(
+        {
+            "client": ["a", "a", "b", "b"],
+            "date": ["2023-06-01", "2023-06-02", "2023-06-01", "2023-06-01"],
+            "text": ["uno", "dos", "tres", "cuatro"],
+            "topicos": [["x"], ["y"], [], ["z", "w"]],
+        }
+    )
+
+    write_frame(df, path, "parquet", partition_cols=["client", "date"])
+    assert sorted(os.listdir(path)) == ["client=a", "client=b"]
+
+    loaded = read_frame(path, filters=[("date", "=", "2023-06-01")])
+    assert sorted(loaded["text"]) == ["cuatro", "tres", "uno"]
+    by_text = loaded.set_index("text")
+    assert by_text.loc["cuatro", "topicos"] == ["z", "w"]
+
+    loaded = read_frame(path, columns=["text"], filters=[("client", "=", "b")])
+    assert list(loaded.columns) == ["text"]
+    assert sorted(loaded["text"]) == ["cuatro", "tres"]
+
+
+def test_unknown_format_raises(tmp_path):
+    with pytest.raises(ValueError):
+        write_frame(RESULTS, str(tmp_path / "results.xlsx"), "xlsx")
+
+
+def test_save_object_round_trip(tmp_path):
+    path = save_object(MIXED, str(tmp_path / "mixed"))
+
+    assert load_object(path).to_dict() == MIXED.to_dict()
+
+
+RESPONSES = ['{"Frase1": "positivo"}', None, '{"Frase2": ["años", "niñez"]}']
+
+
+def test_responses_round_trip(tmp_path):
+    path = save_object(RESPONSES, str(tmp_path / "respuestas"))
+
+    assert path.endswith(".jsonl.gz")
+    assert load_object(path) == RESPONSES
+    lazy = load_object(path, lazy=True)
+    assert not isinstance(lazy, list)
+    assert list(lazy) == RESPONSES
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_save_pickle_object_picks_the_format(tmp_path):
+    root_path = str(tmp_path)
+    responses_path = save_pickle_object(RESPONSES, root_path, "cliente", "respuestas")
+    results_path = save_pickle_object(RESULTS, root_path, "cliente", "resultados")
+    other_path = save_pickle_object({"a": 1}, root_path, "cliente", "otro")
+
+    assert responses_path.endswith(".jsonl.gz")
+    assert results_path.endswith(".parquet")
+    assert other_path.endswith(".pkl")
+    codificacion = Codificacion("x", backend=MockBackend())
+    assert codificacion.load_pickle_object(responses_path) == RESPONSES
+    assert codificacion.load_pickle_object(results_path).to_dict() == RESULTS.to_dict()
+    assert codificacion.load_pickle_object(other_path) == {"a": 1}
+
+
+def test_unsupported_objects_raise(tmp_path):
+    with pytest.raises(TypeError):
+        save_object({"a": 1}, str(tmp_path / "otro"))
+
+
+def test_migrate_pickles(tmp_path):
+    for name, obj in [("respuestas", RESPONSES), ("resultados", MIXED)]:
+        with open(tmp_path / f"{name}.pkl", "wb") as file:
+            pickle.dump(obj, file)
+    with open(tmp_path / "otro.pkl", "wb") as file:
+        pickle.dump({"a": 1}, file)
+
+    migrated = migrate_paths([str(tmp_path)], remove=True)
+
+    assert sorted(os.path.basename(path) for path in migrated) == [
+        "respuestas.jsonl.gz",
+        "resultados.parquet",
+    ]
+    assert load_object(str(tmp_path / "respuestas.jsonl.gz")) == RESPONSES
+    assert (
+        load_object(str(tmp_path / "resultados.parquet")).to_dict() == MIXED.to_dict()
+    )
+    assert sorted(os.listdir(tmp_path)) == [
+        "otro.pkl",
+        "respuestas.jsonl.gz",
+        "resultados.parquet",
+    ]
@@ -0,0 +1,122 @@
+import json
+
+import openai
+import pandas as pd
+import pytest
+
+from codification import Codificacion
+from mock_server import MockBackend
+from telemetry import Telemetry
+
+PRICES = {"modelo": (1.0, 2.0)}
+
+
+def request(telemetry, latency=0.1, batch_size=10, **kwargs):
+    kwargs.setdefault("usage", {"prompt_tokens": 100, "completion_tokens": 50})
+    telemetry.record_request("modelo", batch_size, latency, latency, 0, **kwargs)
+
+
+def test_records_reach_the_hooks_with_their_cost():
+    records = []
+    telemetry = Telemetry(hooks=[records.append], prices=PRICES)
+    telemetry.start_run("sentiment")
+    request(telemetry)
+    telemetry.record_cache(3, 7)
+
+    assert [r["event"] for r in records] == ["request", "cache"]
+    assert records[0]["task"] == "sentiment"
+    assert records[0]["run"] == 1
+    assert records[0]["status"] == "ok"
+    # 100 tokens a $1 y 50 a $2 por cada 1000
+    assert records[0]["cost"] == pytest.approx(0.2)
+    assert records[1]["hits"] == 3
+
+    request(telemetry, price_factor=0.5)
+    assert records[-1]["cost"] == pytest.approx(0.1)
+
+
+def test_summary_aggregates_requests_errors_and_cache():
+    telemetry = Telemetry(prices=PRICES)
+    for latency in [0.1, 0.2, 0.3, 0.4]:
+        request(telemetry, latency=latency)
+    request(telemetry, latency=None, usage={}, error="RateLimitError")
+    telemetry.record_cache(5, 5)
+
+    summary = telemetry.summary()
+    assert summary["requests"] == 5
+    assert summary["errors"] == 1
+    assert summary["latency_p50"] == pytest.approx(0.25)
+    assert summary["latency_max"] == pytest.approx(0.4)
+    assert summary["phrases_sent"] == 40
+    assert summary["mean_batch_size"] == 10
+    assert summary["prompt_tokens"] == 400
+    assert summary["prompt_tokens_per_phrase"] == 10
+    assert summary["completion_tokens_per_phrase"] == 5
+    assert summary["cost"] == pytest.approx(0.8)
+    assert (summary["cache_hits"], summary["cache_misses"]) == (5, 5)
+
+
+def test_summary_by_run():
+    telemetry = Telemetry(prices=PRICES)
+    telemetry.start_run("sentiment")
+    request(telemetry)
+    telemetry.start_run("topics")
+    request(telemetry)
+    request(telemetry)
+
+    assert telemetry.summary(1)["requests"] == 1
+    assert telemetry.summary(2)["requests"] == 2
+    assert telemetry.summary()["requests"] == 3
+    assert telemetry.print_summary()["requests"] == 2
+
+
+def test_exports(tmp_path):
+    telemetry = Telemetry(prices=PRICES)
+    request(telemetry, latency=0.5)
+    request(telemetry, latency=None, usage={}, error="APIError")
+
+    path = tmp_path / "telemetry.json"
+    payload = json.loads(telemetry.to_json(str(path)))
+    assert payload == json.loads(path.read_text(encoding="utf-8"))
+    assert payload["summary"]["requests"] == 2
+    assert len(payload["records"]) == 2
+
+    text = telemetry.to_prometheus(prefix="cod")
+    lines = text.splitlines()
+    assert "# TYPE cod_requests_total counter" in lines
+    assert 'cod_requests_total{status="ok"} 1' in lines
+    assert 'cod_requests_total{status="error"} 1' in lines
+    assert 'cod_tokens_total{type="prompt"} 100' in lines
+    assert 'cod_request_latency_seconds{quantile="0.5"} 0.5' in lines
+    assert "cod_request_latency_seconds_count 1" in lines
+
+
+class FailingBackend(MockBackend):
+
+    """
+    Rechaza todas las solicitudes.
+    """
+
+    def complete(self, messages: list, model: str, temperature: float) -> dict:
+        raise openai.error.InvalidRequestError("prompt inválido", None)
+
+
+def test_codificacion_records_each_request():
+    df = pd.DataFrame({"ID": range(10), "text": [f"frase {n}" for n in range(10)]})
+    codificacion = Codificacion("x", backend=MockBackend())
+    codificacion.get_sentiment(df, 4, "text", "ID")
+
+    summary = codificacion.report["telemetry"]
+    assert summary["requests"] == 3
+    assert summary["errors"] == 0
+    assert summary["phrases_sent"] == 10
+    assert summary["prompt_tokens"] > 0
+    assert summary["completion_tokens"] > 0
+    records = codificacion.telemetry.records
+    assert [r["batch_size"] for r in records] == [4, 4, 2]
+    assert all(r["task"] == "sentiment" for r in records)
+
+    failing = Codificacion("x", backend=FailingBackend(), max_requeue=0)
+    failing.get_sentiment(df.iloc[:2], 4, "text", "ID")
+    assert failing.report["telemetry"]["errors"] == 1
+    assert failing.telemetry.records[0]["error"] == "InvalidRequestError"
@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+from codification import Codificacion
+from mock_server import MockBackend
+from topics import TopicClusterer
+
+THEMES = {
+    "energia": ["luz", "factura", "energia", "corte"],
+    "agua": ["agua", "acueducto", "tuberia", "presion"],
+    "transporte": ["bus", "ruta", "estacion", "pasaje"],
+}
+
+
+def themed_texts(per_theme: int = 20) -> tuple:
+    texts, themes = [], []
+    for n in range(per_theme):
+        for theme, words in THEMES.items():
+            rotated = words[n % len(words) :] + words[: n % len(words)]
+            texts.append(" ".join(rotated[:3]) + f" usuario{len(texts)}")
+            themes.append(theme)
+    return texts, themes
+
+
+def test_clusters_follow_the_themes():
+    texts, themes = themed_texts()
+    clusterer = TopicClusterer(n_clusters=3, min_df=2, dimensions=64)
+    labels = clusterer.fit_predict(texts)
+
+    report = clusterer.report()
+    assert report["clusters"] == 3
+    assert report["unclustered"] == 0
+    assert report["phrases"] == len(texts)
+    # Cada tema queda completo en un solo grupo
+    grouping = pd.Series(labels).groupby(pd.Series(themes)).nunique()
+    assert (grouping == 1).all()
+    assert len(set(labels)) == 3
+
+    theme_of = {label: theme for label, theme in zip(labels, themes)}
+    exemplars = clusterer.exemplars(texts, n_exemplars=4)
+    assert sorted(exemplars) == [0, 1, 2]
+    for cluster, examples in exemplars.items():
+        assert len(examples) == 4
+        assert len(set(examples)) == 4
+        assert all(
+            texts.index(text) % 3 == texts.index(examples[0]) % 3 for text in examples
+        )
+
+    for cluster, terms in clusterer.top_terms(n_terms=4).items():
+        assert set(terms) == set(THEMES[theme_of[cluster]])
+
+
+def test_phrases_without_vocabulary_terms_stay_unclustered():
+    texts, _ = themed_texts()
+    clusterer = TopicClusterer(n_clusters=3, min_df=2, dimensions=64)
+    labels = clusterer.fit_predict(texts + ["palabras únicas sueltas"])
+    assert labels[-1] == -1
+    assert clusterer.report()["unclustered"] == 1
+
+
+def test_too_few_phrases_for_the_vocabulary_raise():
+    with pytest.raises(ValueError):
+        TopicClusterer(n_clusters=2).fit_predict(["uno dos", "tres cuatro", "cinco"])
+
+
+def test_cluster_topics_groups_large_inputs():
+    texts, _ = themed_texts()
+    df = pd.DataFrame({"ID": range(len(texts)), "text": texts})
+    backend = MockBackend()
+    codificacion = Codificacion("x", backend=backend)
+
+    responses = codificacion.get_cluster_topics(
+        df, None, "text", "ID", 2, TopicClusterer(n_clusters=3, min_df=2)
+    )
+    topics = codificacion.from_json_list_to_df(responses)
+    assert len(topics) == len(texts)
+    assert len(codificacion.cluster_topics) == 3
+    assert codificacion.clusters.nunique() == 3
+
+
+@pytest.mark.parametrize("n_phrases", [1, 4, 8])
+def test_cluster_topics_codes_small_inputs_directly(n_phrases):
+    texts = [f"frase corta número {n}" for n in range(n_phrases)]
+    df = pd.DataFrame({"ID": range(n_phrases), "text": texts})
+    codificacion = Codificacion("x", backend=MockBackend())
+
+    responses = codificacion.get_cluster_topics(
+        df, None, "text", "ID", 2, TopicClusterer(n_clusters=4)
+    )
+    topics = codificacion.from_json_list_to_df(responses)
+    assert len(topics) == n_phrases
+    assert list(codificacion.clusters) == list(range(n_phrases))
+    assert codificacion.cluster_topics["0"] == ["frase corta", "0"]